@@ -0,0 +1,119 @@
+from abc import ABC, abstractmethod
+import numpy as np
+from market_data import MarketDataStore, iter_yfinance_csv
+
+class BarFeed(ABC):
+    """
+    Represents a forward-only source of the bars of a single ticker.
+
+    A feed is iterated once and yields the bars in chunks, each chunk being
+    a dictionary (column -> numpy.ndarray) with the timestamp, open, high,
+    low, close and volume columns (see get_bar_arrays). Only one chunk is
+    held in memory at a time, so the dataset does not have to fit in memory.
+    Subclasses implement __iter__.
+
+    Attributes
+    ----------
+    chunk_size : int
+        The number of bars per chunk.
+    """
+    def __init__(self, chunk_size : int = 1 << 16):
+        """
+        Initializes the feed.
+
+        Parameters
+        ----------
+        chunk_size : int
+            The number of bars per chunk.
+
+        Raises
+        ------
+        ValueError
+            If the chunk size is not positive.
+        """
+        if chunk_size <= 0:
+            raise ValueError("The chunk size of a bar feed must be positive")
+        self.chunk_size = chunk_size
+
+    @abstractmethod
+    def __iter__(self):
+        """
+        Yields the chunks of bars in time order.
+        """
+
+class ArrayFeed(BarFeed):
+    """
+    Feeds bars from arrays, e.g. the memory mapped columns of MarketDataStore.read.
+
+    Attributes
+    ----------
+    bars : dict
+        Contains pairs (column -> numpy.ndarray) with the bars.
+    """
+    def __init__(self, bars : dict, chunk_size : int = 1 << 16):
+        super().__init__(chunk_size)
+        self.bars = bars
+
+    def __iter__(self):
+        number_of_bars = len(self.bars["close"])
+        for start in range(0, number_of_bars, self.chunk_size):
+            yield {column : values[start:start + self.chunk_size] for column, values in self.bars.items()}
+
+class CSVFeed(BarFeed):
+    """
+    Feeds the bars of a ticker from a yfinance CSV file, read in chunks.
+
+    Rows in which the close price of the ticker is missing are skipped.
+
+    Attributes
+    ----------
+    path : str
+        The path of the CSV file.
+    ticker : str
+        The ticker symbol of the asset.
+    """
+    def __init__(self, path : str, ticker : str, chunk_size : int = 1 << 16):
+        super().__init__(chunk_size)
+        self.path = path
+        self.ticker = ticker
+
+    def __iter__(self):
+        for chunk in iter_yfinance_csv(self.path, self.chunk_size):
+            bars = chunk[self.ticker]
+            present = ~np.isnan(bars["close"])
+            if not present.all():
+                bars = {column : values[present] for column, values in bars.items()}
+            if len(bars["close"]) > 0:
+                yield bars
+
+class StoreFeed(BarFeed):
+    """
+    Feeds the stored bars of a ticker from a MarketDataStore without fetching.
+
+    Every chunk is memory mapped on its own, so only one chunk of the
+    files is resident in memory at a time.
+
+    Attributes
+    ----------
+    store : MarketDataStore
+        The store with the bars.
+    ticker : str
+        The ticker symbol of the asset.
+    interval : str
+        The length of a bar.
+    start : datetime-like or None
+        The first fed time (inclusive). If None, from the first bar.
+    end : datetime-like or None
+        The last fed time (exclusive). If None, up to the last bar.
+    """
+    def __init__(self, store : MarketDataStore, ticker : str, interval : str = "1d",
+                 start = None, end = None, chunk_size : int = 1 << 16):
+        super().__init__(chunk_size)
+        self.store = store
+        self.ticker = ticker
+        self.interval = interval
+        self.start = start
+        self.end = end
+
+    def __iter__(self):
+        return self.store.iter_chunks(self.ticker, self.interval, self.start, self.end, self.chunk_size)
@@ -0,0 +1,66 @@
+"""
+Measures the import time of the headless engine path against a budget.
+
+Usage:
+    python -m benchmarks.bench_import --budget 0.8
+
+Every module is imported in a fresh interpreter, which reports the time of
+the import and whether a plotting, network or pretty-printing dependency
+was loaded. The fastest of the repeated imports is compared with the
+budget, and the script exits with an error if it is exceeded or if one of
+these dependencies is imported eagerly. The remaining time is dominated by
+numpy and pandas.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ("engine", "sweep", "strategies", "bar_feed", "market_data", "runtime", "indicator_cache")
+LAZY_DEPENDENCIES = ("matplotlib", "mplfinance", "yfinance", "rich")
+SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps([elapsed, [name for name in {lazy!r} if name in sys.modules]]))
+"""
+
+def measure_import(module : str, repeat : int = 5):
+    """
+    Imports a module in fresh interpreters.
+
+    Returns
+    -------
+    tuple
+        The fastest import time in seconds and the eagerly imported lazy dependencies.
+    """
+    best = float("inf")
+    loaded = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", SCRIPT.format(module=module, lazy=LAZY_DEPENDENCIES)],
+                                capture_output=True, text=True, check=True, cwd=ROOT).stdout
+        elapsed, loaded = json.loads(output)
+        best = min(best, elapsed)
+    return best, loaded
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=float, default=0.8, help="The allowed import time in seconds.")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'module':<16}{'seconds':>10}  eagerly imported")
+    for module in MODULES:
+        elapsed, loaded = measure_import(module, args.repeat)
+        status = "" if elapsed <= args.budget and not loaded else "  FAILED"
+        failed = failed or bool(status)
+        print(f"{module:<16}{elapsed:>10.3f}  {', '.join(loaded) or '-'}{status}")
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
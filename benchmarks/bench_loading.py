@@ -0,0 +1,92 @@
+"""
+Compares loading a yfinance CSV file with loading its converted binary layout.
+
+Usage:
+    python -m benchmarks.bench_loading --bars 2000000
+
+A synthetic minute-bar CSV is written in the layout of save_data and
+converted once into a MarketDataStore. Every loading path then runs in a
+fresh process, which reports its load time and peak RSS:
+    1. read_csv - pandas.read_csv with the three-row header and type inference.
+    2. loader - read_yfinance_csv with fixed dtypes.
+    3. streamed - iter_yfinance_csv, one chunk in memory at a time.
+    4. store - MarketDataStore.read, touching every value once.
+The peak RSS is the high-water mark of the process (VmHWM), the load RSS
+is its increase during the load.
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from market_data import MarketDataStore, read_yfinance_csv, iter_yfinance_csv, convert_csv_directory
+from benchmarks.synthetic import generate_ohlcv
+
+def load(mode, path, root):
+    if mode == "read_csv":
+        data = pd.read_csv(path, header=[0, 1], index_col=0, parse_dates=True)
+        return len(data)
+    if mode == "loader":
+        return len(read_yfinance_csv(path))
+    if mode == "streamed":
+        return sum(len(chunk["SYN"]["close"]) for chunk in iter_yfinance_csv(path, chunk_size=1 << 16))
+    bars = MarketDataStore(root).read("SYN", "1m")
+    for values in bars.values():
+        np.asarray(values).view(np.uint8).sum()
+    return len(bars["close"])
+
+def get_memory(field):
+    """
+    Reads a memory field of the current process in MB (Linux only).
+    """
+    with open("/proc/self/status") as file:
+        for line in file:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+def run(mode, path, root, queue):
+    before = get_memory("VmRSS")
+    start = time.perf_counter()
+    number_of_bars = load(mode, path, root)
+    elapsed = time.perf_counter() - start
+    peak = get_memory("VmHWM")
+    queue.put((number_of_bars, elapsed, peak, peak - before))
+
+def measure(mode, path, root):
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=run, args=(mode, path, root, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--bars", type=int, default=2000000)
+    parser.add_argument("--directory", default=None,
+                        help="Where the CSV file and the store are written (default: a temporary directory).")
+    args = parser.parse_args()
+
+    directory = args.directory or tempfile.mkdtemp()
+    csv_directory = os.path.join(directory, "csv")
+    root = os.path.join(directory, "store")
+    os.makedirs(csv_directory, exist_ok=True)
+    path = os.path.join(csv_directory, "SYN_data")
+
+    generate_ohlcv(args.bars).to_csv(path)
+    start = time.perf_counter()
+    convert_csv_directory(csv_directory, MarketDataStore(root), interval="1m")
+    print(f"CSV size: {os.path.getsize(path) / 2 ** 20:,.0f} MB, "
+          f"one-time conversion: {time.perf_counter() - start:.2f} s")
+
+    print(f"{'path':<10}{'bars':>12}{'load (s)':>12}{'peak RSS (MB)':>16}{'load RSS (MB)':>16}")
+    for mode in ("read_csv", "loader", "streamed", "store"):
+        number_of_bars, elapsed, peak, increase = measure(mode, path, root)
+        print(f"{mode:<10}{number_of_bars:>12,}{elapsed:>12.3f}{peak:>16,.0f}{increase:>16,.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""
+Runs the benchmark suite and compares the results with a stored baseline.
+
+Usage:
+    python -m benchmarks.suite
+    python -m benchmarks.suite --bars 1000 10000 100000 1000000 10000000
+    python -m benchmarks.suite --update-baseline
+
+The data is generated by generate_ohlcv with a fixed seed and a volatility
+of 0.1% per bar, so the prices stay in a realistic range up to 1e7 bars.
+The suite times:
+    1. indicator:<name> - the update of every indicator, bar by bar.
+    2. execute_orders[book=<size>] - execute_orders over bars which trigger
+    a single market order while <size> resting orders stay pending.
+    3. simulate - the full simulation loop.
+    4. get_stats - Portfolio.get_stats without plotting, over a history of
+    the given number of bars and a tenth as many fills.
+Every benchmark is repeated (short ones until 0.5 s were timed) and its
+fastest run is kept. The results are written as JSON. Every result with a
+baseline for the same benchmark and size is compared with it, and the
+suite exits with an error if any result is slower than the baseline by
+more than the threshold. The default threshold of 50% is above the noise
+of the short benchmarks on a shared machine. The baseline depends on the
+machine and should be regenerated with --update-baseline when it changes.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import time
+import numpy as np
+from engine import simulate, execute_orders
+from strategies.indicators.bar_buffer import BarBuffer
+from strategies.indicators.ema_indicator import ExponentialMovingAverage
+from strategies.indicators.rsi_indicator import RelativeStrengthIndex
+from strategies.indicators.sma_indicator import SimpleMovingAverage
+from strategies.indicators.force_index import ForceIndex
+from strategies.indicators.order_book import OrderBook
+from strategies.indicators.portfolio import Portfolio
+from strategies.indicators.utils import Candle, Order
+from benchmarks.synthetic import generate_ohlcv
+
+DIRECTORY = os.path.dirname(__file__)
+BASELINE = os.path.join(DIRECTORY, "baseline.json")
+VOLATILITY = 0.001
+# Pairs (name -> (lookback of the bar buffer, indicator on the buffer)).
+# The long periods check that an update does not depend on the period.
+INDICATORS = {
+    "ema" : (32, lambda bars: ExponentialMovingAverage([14], max_history=32, bars=bars)),
+    "rsi" : (32, lambda bars: RelativeStrengthIndex([7], max_history=32, bars=bars)),
+    "rsi[period=5000]" : (5002, lambda bars: RelativeStrengthIndex([5000], max_history=32, bars=bars)),
+    "sma[period=10000]" : (10001, lambda bars: SimpleMovingAverage([10000], max_history=32, bars=bars)),
+    "force_index" : (32, lambda bars: ForceIndex(bars=bars)),
+}
+
+def get_candles(number_of_bars : int):
+    data = generate_ohlcv(number_of_bars, volatility=VOLATILITY).xs("SYN", level=1, axis=1)
+    return [Candle(timestamp=timestamp, open_price=row[3], high_price=row[1], low_price=row[2],
+                   close_price=row[0], volume=row[4])
+            for timestamp, row in zip(data.index.tolist(), data.to_numpy().tolist())]
+
+def setup_indicator(name : str, candles : list[Candle]):
+    lookback, create = INDICATORS[name]
+    bars = BarBuffer(max_lookback=lookback)
+    indicator = create(bars)
+
+    def run():
+        for candle in candles:
+            bars.append_candle(candle)
+            indicator.update()
+    return run
+
+def setup_execute_orders(book_size : int, number_of_bars : int = 5000):
+    """
+    Fills a book with resting orders far from the price and adds one market order per bar.
+    """
+    order_book = OrderBook()
+    for i in range(book_size):
+        if i % 3 == 0:
+            order = Order("buy", "limit", 1, price=50 - i / book_size, order_index=i, blocking_index=[i])
+        elif i % 3 == 1:
+            order = Order("sell", "limit", 1, price=150 + i / book_size, order_index=i, blocking_index=[i])
+        else:
+            order = Order("sell", "stop", 1, stop_price=10 + i / book_size, order_index=i,
+                          blocking_index=[i])
+        order_book.add(order)
+    portfolio = Portfolio()
+    candles = [Candle(timestamp=i, open_price=100, high_price=101, low_price=99,
+                      close_price=100 + (i % 2), volume=1) for i in range(number_of_bars + 1)]
+
+    def run():
+        for i in range(1, len(candles)):
+            index = book_size + i
+            order_book.add(Order("buy", "market", 1e-3, order_index=index, blocking_index=[index]))
+            execute_orders("SYN", candles[i - 1], candles[i], order_book, portfolio)
+    return run
+
+def setup_simulate(data):
+    return lambda: simulate(data, "SYN", quiet=True)
+
+def setup_get_stats(number_of_bars : int):
+    rng = np.random.default_rng(0)
+    portfolio = Portfolio(capacity=number_of_bars)
+    values = 100000 * np.exp(np.cumsum(rng.normal(0, VOLATILITY, number_of_bars)))
+    timestamps = generate_ohlcv(number_of_bars, volatility=VOLATILITY).index.tolist()
+    for value, timestamp in zip(values.tolist(), timestamps):
+        portfolio.cash = value
+        portfolio.update_market_prices({}, timestamp)
+    for i in range(number_of_bars // 10):
+        portfolio.trades.record("SYN", Order("buy" if i % 2 == 0 else "sell", "market", 1, order_index=i),
+                                100 + rng.normal(), timestamps[i], i)
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            portfolio.get_stats(plot=False)
+    return run
+
+def measure(setup, repeat : int, min_seconds : float = 0.5, max_repeat : int = 100):
+    """
+    Returns the fastest of the timed runs, each with its own setup.
+
+    Short benchmarks are repeated until min_seconds were timed, so that
+    their fastest run is not dominated by noise.
+    """
+    best = float("inf")
+    total = 0.0
+    runs = 0
+    while runs < repeat or (total < min_seconds and runs < max_repeat):
+        run = setup()
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+        total += elapsed
+        runs += 1
+    return best
+
+def run_suite(scales : list[int], book_sizes : list[int], repeat : int, only : str = None):
+    """
+    Runs all benchmarks.
+
+    Returns
+    -------
+    results : list of dict
+        One result (benchmark, size, seconds, us_per_bar) per benchmark and size.
+    """
+    results = []
+
+    def wanted(name):
+        return only is None or only in name
+
+    def record(name, size, number_of_bars, setup):
+        if not wanted(name):
+            return
+        # The large sizes are run once, they are slow enough to be stable.
+        seconds = measure(setup, repeat if number_of_bars <= 100000 else 1)
+        results.append({"benchmark" : name, "size" : size, "seconds" : seconds,
+                        "us_per_bar" : seconds / number_of_bars * 1e6})
+        print(f"{name:<32}{size:>12,}{seconds:>12.4f}{seconds / number_of_bars * 1e6:>12.2f}", flush=True)
+
+    print(f"{'benchmark':<32}{'size':>12}{'seconds':>12}{'us/bar':>12}")
+    for size in book_sizes:
+        record(f"execute_orders[book={size}]", size, 5000, lambda: setup_execute_orders(size, 5000))
+    for number_of_bars in scales:
+        if any(wanted("indicator:" + name) for name in INDICATORS):
+            candles = get_candles(number_of_bars)
+            for name in INDICATORS:
+                record("indicator:" + name, number_of_bars, number_of_bars,
+                       lambda: setup_indicator(name, candles))
+            del candles
+        if wanted("simulate"):
+            data = generate_ohlcv(number_of_bars, volatility=VOLATILITY)
+            record("simulate", number_of_bars, number_of_bars, lambda: setup_simulate(data))
+            del data
+        record("get_stats", number_of_bars, number_of_bars, lambda: setup_get_stats(number_of_bars))
+    return results
+
+def compare(results : list[dict], baseline : list[dict], threshold : float):
+    """
+    Compares the results with the baseline.
+
+    Returns
+    -------
+    regressions : list of dict
+        The results slower than the baseline by more than the threshold,
+        each with its baseline seconds and the ratio to them.
+    """
+    expected = {(result["benchmark"], result["size"]) : result["seconds"] for result in baseline}
+    regressions = []
+    print(f"{'benchmark':<32}{'size':>12}{'seconds':>12}{'baseline':>12}{'ratio':>8}")
+    for result in results:
+        key = (result["benchmark"], result["size"])
+        if key not in expected:
+            continue
+        ratio = result["seconds"] / expected[key]
+        status = ""
+        if ratio > 1 + threshold:
+            regressions.append(dict(result, baseline=expected[key], ratio=ratio))
+            status = "  REGRESSION"
+        print(f"{key[0]:<32}{key[1]:>12,}{result['seconds']:>12.4f}{expected[key]:>12.4f}{ratio:>8.2f}{status}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bars", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--book-sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", default=None, help="Runs only the benchmarks whose name contains it.")
+    parser.add_argument("--output", default=os.path.join(DIRECTORY, "results.json"))
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--threshold", type=float, default=0.5,
+                        help="The allowed relative slowdown against the baseline.")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="Writes the results as the new baseline instead of comparing.")
+    args = parser.parse_args()
+
+    results = run_suite(args.bars, args.book_sizes, args.repeat, args.only)
+    report = {"python" : platform.python_version(), "numpy" : np.__version__,
+              "machine" : platform.machine(), "results" : results}
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(report, file, indent=2)
+        print("Baseline written to " + args.baseline)
+        return
+    if not os.path.exists(args.baseline):
+        print("No baseline at " + args.baseline + ", run with --update-baseline first")
+        return
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)["results"]
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) slower than the baseline by more than {args.threshold:.0%}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
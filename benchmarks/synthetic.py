@@ -0,0 +1,126 @@
+import math
+import threading
+import time
+import zlib
+import numpy as np
+import pandas as pd
+from market_data import DataProvider
+
+def generate_ohlcv(number_of_bars : int, ticker : str = "SYN", seed : int = 0,
+                   volatility : float = 0.02, start_price : float = 100.0):
+    """
+    Generates synthetic OHLCV data.
+
+    The close prices follow a geometric Brownian motion. The open price is
+    the previous close, the high and low prices extend the open-close range
+    by a random amount and the volume is log-normal.
+
+    Parameters
+    ----------
+    number_of_bars : int
+        The number of generated bars.
+    ticker : str
+        The ticker symbol used in the columns.
+    seed : int
+        The seed of the random generator.
+    volatility : float
+        The standard deviation of the log returns per bar.
+    start_price : float
+        The open price of the first bar.
+
+    Returns
+    -------
+    data : pandas.DataFrame
+        A dataframe with the same (Price, Ticker) columns as the one
+        returned by fetch_data, indexed by minute timestamps.
+    """
+    rng = np.random.default_rng(seed)
+    log_returns = rng.normal(-0.5 * volatility ** 2, volatility, number_of_bars)
+    closes = start_price * np.exp(np.cumsum(log_returns))
+    opens = np.concatenate(([start_price], closes[:-1]))
+    spread = np.abs(rng.normal(0, volatility / 2, (2, number_of_bars)))
+    highs = np.maximum(opens, closes) * (1 + spread[0])
+    lows = np.minimum(opens, closes) * (1 - spread[1])
+    volumes = np.round(rng.lognormal(13, 0.5, number_of_bars))
+
+    index = pd.date_range("2000-01-03", periods=number_of_bars, freq="min", name="Date")
+    columns = pd.MultiIndex.from_product([["Close", "High", "Low", "Open", "Volume"], [ticker]],
+                                         names=["Price", "Ticker"])
+    return pd.DataFrame(np.column_stack([closes, highs, lows, opens, volumes]),
+                        index=index, columns=columns)
+
+def generate_panel(number_of_bars : int, tickers : list[str], seed : int = 0,
+                   volatility : float = 0.02):
+    """
+    Generates synthetic OHLCV data for a set of tickers on a shared time axis.
+
+    Parameters
+    ----------
+    number_of_bars : int
+        The number of generated bars per ticker.
+    tickers : list of str
+        The ticker symbols.
+    seed : int
+        The seed of the first ticker. The following tickers use the next seeds.
+    volatility : float
+        The standard deviation of the log returns per bar.
+
+    Returns
+    -------
+    data : pandas.DataFrame
+        A dataframe with (Price, Ticker) columns for all tickers.
+    """
+    frames = [generate_ohlcv(number_of_bars, ticker, seed + i, volatility)
+              for i, ticker in enumerate(tickers)]
+    return pd.concat(frames, axis=1).sort_index(axis=1, level=0, sort_remaining=False)
+
+class SyntheticProvider(DataProvider):
+    """
+    Serves synthetic bars in place of a remote provider, fully offline.
+
+    Every ticker has its own deterministic series (see generate_ohlcv) on a
+    fixed time grid of its interval, which starts at the origin. The
+    requested range is cut from it, so overlapping requests return the same
+    bars. The latency and transient failures of a remote source can be injected.
+
+    Attributes
+    ----------
+    origin : pandas.Timestamp
+        The time of the first bar of every series. There are no earlier bars.
+    latency : float
+        The time in seconds every request waits before it is served.
+    failures : int
+        The number of first requests of every ticker which fail.
+    volatility : float
+        The standard deviation of the log returns per bar.
+    requests : list of tuples
+        The (ticker, start, end, interval) of every request, including failed ones.
+    """
+    FREQUENCIES = {"1m" : "1min", "5m" : "5min", "15m" : "15min", "30m" : "30min", "1h" : "1h", "1d" : "1D"}
+
+    def __init__(self, latency : float = 0.0, failures : int = 0, volatility : float = 0.01,
+                 origin = "2020-01-01"):
+        self.origin = pd.Timestamp(origin)
+        self.latency = latency
+        self.failures = failures
+        self.volatility = volatility
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def fetch(self, ticker : str, start : pd.Timestamp, end : pd.Timestamp, interval : str = "1d"):
+        with self._lock:
+            self.requests.append((ticker, start, end, interval))
+            number_of_requests = sum(1 for request in self.requests if request[0] == ticker)
+        if self.latency > 0:
+            time.sleep(self.latency)
+        if number_of_requests <= self.failures:
+            raise ConnectionError(f"Injected failure of request {number_of_requests} for {ticker}")
+
+        frequency = pd.Timedelta(self.FREQUENCIES[interval])
+        first = max(0, math.ceil((start - self.origin) / frequency))
+        last = max(first, math.ceil((end - self.origin) / frequency))
+        data = generate_ohlcv(last, ticker=ticker, seed=zlib.crc32(ticker.encode()),
+                              volatility=self.volatility).xs(ticker, level=1, axis=1)
+        data.index = self.origin + frequency * np.arange(last)
+        data.index.name = "Date"
+        return data.iloc[first:]
@@ -1,26 +1,47 @@
-import yfinance as yf
 import os
+import time
+import contextlib
 import datetime
 import pandas as pd
-from visualizer import Visualizer
-def fetch_data(ticker):
+import numpy as np
+from market_data import MarketDataStore
+def fetch_data(ticker, start_date = None, end_date = None, interval = "1d",
+               store : MarketDataStore = None, workers : int = 8):
     """
     Fetches the historic data.
 
+    The data is served by a local market data store, which downloads only
+    the bars it does not have yet.
+
     Parameters
     ----------
-    ticker : str
+    ticker : str or list of str
         Indicates the ticker symbol of the traded asset.
+    start_date : datetime-like or None
+        The first requested day. If None, 52 weeks before the end date.
+    end_date : datetime-like or None
+        The last requested day (exclusive). If None, today.
+    interval : str
+        The length of a bar.
+    store : MarketDataStore or None
+        The store which serves the data. If None, the store in data/store is used.
+    workers : int
+        The maximal number of tickers fetched concurrently.
 
     Returns
     -------
     data : Dataframe
         A multicolumn dataframe containing the historical data of the asset.
     """
-    end_date = datetime.datetime.today()
-    start_date = end_date - datetime.timedelta(weeks=52)
+    if end_date is None:
+        end_date = datetime.date.today()
+    end_date = pd.Timestamp(end_date)
+    if start_date is None:
+        start_date = end_date - datetime.timedelta(weeks=52)
+    if store is None:
+        store = MarketDataStore()
 
-    data = yf.download(ticker, start=start_date.strftime('%Y-%m-%d'), end=end_date.strftime('%Y-%m-%d'), interval='1d')
+    data = store.load(ticker, start=start_date, end=end_date, interval=interval, workers=workers)
     return data
 
 def save_data(df, filename):
@@ -36,107 +57,251 @@ from strategies.strategy1 import Strategy
 from strategies.indicators.utils import Order
 from strategies.indicators.portfolio import Portfolio
 from strategies.indicators.utils import Candle
+from strategies.indicators.order_book import OrderBook
+from strategies.indicators.registry import IndicatorRegistry
+from bar_feed import BarFeed
+from profiler import Profiler
 
 def execute_orders(ticker, previous_candle, current_candle, 
-                   orders_stack: list[Order], portfolio: Portfolio, executed_orders: set[int]):
+                   order_book: OrderBook, portfolio: Portfolio, quiet : bool = True):
     """
     Simulates exectution of the orders.
 
     The execution of an order depends on which other orders have been executed.
     If multiple orders are executed at the same time and they are cyclic dependent
     it is not clear which one to execute. Thus, all orders are assigned a priority.
-    The orders come in a decreasing priority in the list.
+    The orders are added to the order book in a decreasing priority.
 
-    Once an order is executed, its index is added to the list of executed orders.
+    Only the orders triggered by the current bar are visited. Once an order is
+    executed, the orders which it blocks (its group) are cancelled by the order book.
     This is a simple model, which assumes that the market orders are executed at the
     start of the period and that stop/limit orders are executed at their respective price.
+    A buy order which cannot be paid for with the available cash is rejected and cancelled
+    together with the orders it blocks (e.g. its stop loss and take profit). The rejections
+    are counted in portfolio.number_of_rejected.
+    Every executed order is recorded in the trade ledger of the portfolio.
 
     Parameters
     ----------
     ticker : str
         The ticker symbol of the traded asset.
-    previous_candle : pandas.Series
+    previous_candle : Candle
         The information for the previous candle.
-    current_candle : pandas.Series
+    current_candle : Candle
         The information for the current candle.
-    orders_stack : list of Order
-        A list with all orders which have not been yet executed.
+    order_book : OrderBook
+        The book with all orders which have not been yet executed.
     portfolio : Portfolio
         An object containing the information for the portfolio.
-    executed_orders : set of integers
-        A set containing the indexes of all executed orders.
+    quiet : bool
+        If False, every rejected buy order is printed.
     
     Returns
     -------
-    remaining_orders : list of Order
-        A list with all remaining orders, which are not executed.
-    executed_orders : set of integers
-        An updated set with the integers of executed orders.
-    """
-  
-    for order in orders_stack:
-        depedency_executed = False
-        for index in order.blocking_index:
-            if index in executed_orders:
-                depedency_executed = True
-                break
-        
-        if depedency_executed:
-            executed_orders.add(order.order_index)
+    executed_orders : list of tuples
+        Pairs (order, execution price) of the orders executed on this bar.
+    """
+    executed_orders = []
+    for priority, order, execution_price in order_book.get_triggered(previous_candle, current_candle):
+        # An order executed earlier on this bar might have cancelled this one.
+        if not order_book.is_pending(priority):
             continue
 
-        executed = False
-        execution_price = 0.0
-        if order.order_type == "market":
-            execution_price = current_candle['Open']
-            executed = True
-
-        if order.order_type == "limit":
-            if order.side == "buy" and current_candle['Low'] < order.price:
-                execution_price = order.price
-                executed = True
-            if order.side == "sell" and current_candle['High'] > order.price:
-                execution_price = order.price
-                executed = True
-        
-        if order.order_type == "stop":
-            if (previous_candle['Low'] < order.stop_price and 
-                current_candle['High'] > order.stop_price):
-                executed = True
-                execution_price = order.stop_price
-            if (previous_candle['High'] > order.stop_price and 
-                current_candle['Low'] < order.stop_price):
-                executed = True
-                execution_price = order.stop_price
-
-        if executed == True: 
-            if order.side == "buy":
+        if order.side == "buy":
+            try:
                 portfolio.buy(ticker, execution_price, order.quantity)
-            if order.side == "sell":
-                portfolio.sell(ticker, execution_price, order.quantity)
-            executed_orders.add(order.order_index)
-
-    remaining_orders = [order for order in orders_stack 
-                        if order.order_index not in executed_orders]
+            except ValueError:
+                order_book.cancel(priority)
+                portfolio.number_of_rejected += 1
+                if not quiet:
+                    print(f"Rejected buy of {order.quantity} {ticker} at {execution_price}: not enough cash")
+                continue
+        if order.side == "sell":
+            portfolio.sell(ticker, execution_price, order.quantity)
+        # The bar index is the number of values the portfolio recorded before this bar.
+        portfolio.trades.record(ticker, order, execution_price, current_candle.timestamp,
+                                portfolio.values.number_of_bars,
+                                order_book.get_group_id(order.order_index))
+        order_book.fill(priority)
+        executed_orders.append((order, execution_price))
 
-    return remaining_orders, executed_orders
+    return executed_orders
         
 
 
-def simulate(full_data, ticker):
+def get_bar_arrays(data):
+    """
+    Converts a single-ticker dataframe into contiguous arrays.
+
+    The conversion is done once, so that the simulation loop does not
+    access the rows of the dataframe.
+
+    Parameters
+    ----------
+    data : pandas.DataFrame
+        A dataframe with Open, High, Low, Close and Volume columns.
+
+    Returns
+    -------
+    bars : dict
+        Contains pairs (column -> numpy.ndarray) for the timestamp, open,
+        high, low, close and volume columns.
+    """
+    return {
+        "timestamp" : data.index.to_numpy(),
+        "open" : data["Open"].to_numpy(dtype="float64"),
+        "high" : data["High"].to_numpy(dtype="float64"),
+        "low" : data["Low"].to_numpy(dtype="float64"),
+        "close" : data["Close"].to_numpy(dtype="float64"),
+        "volume" : data["Volume"].to_numpy(dtype="float64"),
+    }
+
+def run_bars(ticker, timestamps, opens, highs, lows, closes, volumes,
+             strategy : Strategy, portfolio : Portfolio, order_book : OrderBook, quiet = False,
+             previous_candle : Candle = None, profiler : Profiler = None):
+    """
+    Runs the simulation loop over the bars of a single ticker.
+
+    The loop can be continued over the next bars by passing in the last
+    candle of the previous run.
+
+    The calls of the loop are bound to local names once. If a profiler is
+    passed in, they are replaced by timed ones (see Profiler.timed) for the
+    phases "candle", "execute_orders", "strategy.update" (with its
+    "indicator:<attribute>" parts), "get_orders", "order_book.extend",
+    "update_market_prices" and "print". The bars and the placed, filled and
+    cancelled (including rejected) orders are counted. Without a profiler
+    the same loop runs with the plain calls.
+
+    Parameters
+    ----------
+    ticker : str
+        A string containing the ticker symbol for a specific stock.
+    timestamps : sequence
+        The timestamps of the bars.
+    opens, highs, lows, closes, volumes : sequence of floats
+        The OHLCV values of the bars.
+    strategy : Strategy
+        The strategy which places the orders.
+    portfolio : Portfolio
+        The portfolio in which the orders are executed.
+    order_book : OrderBook
+        The book in which the orders are placed.
+    quiet : bool
+        If True, nothing is printed during the simulation.
+    previous_candle : Candle or None
+        The candle before the first bar, or None at the start of the simulation.
+    profiler : Profiler or None
+        The profiler which collects the time per phase. If None, the loop
+        is not instrumented.
+
+    Returns
+    -------
+    portfolio : Portfolio
+        A class containing the performance history of the portfolio.
+    """
+    make_candle = Candle
+    execute = execute_orders
+    update = strategy.update
+    get_orders = strategy.get_orders
+    extend = order_book.extend
+    update_market_prices = portfolio.update_market_prices
+    output = print
+    instrumentation = contextlib.nullcontext()
+    if profiler is not None:
+        make_candle = profiler.timed(make_candle, "candle")
+        execute = profiler.timed(execute, "execute_orders", counter="orders_filled")
+        update = profiler.timed(update, "strategy.update")
+        get_orders = profiler.timed(get_orders, "get_orders", counter="orders_placed")
+        extend = profiler.timed(extend, "order_book.extend")
+        update_market_prices = profiler.timed(update_market_prices, "update_market_prices")
+        output = profiler.timed(output, "print")
+        instrumentation = profiler.instrument(strategy)
+        counters = profiler.counters
+        number_of_placed = counters.get("orders_placed", 0)
+        number_of_filled = counters.get("orders_filled", 0)
+        number_of_pending = len(order_book)
+
+    with instrumentation:
+        for i in range(0, len(closes)):
+
+            current_candle = make_candle(
+                timestamp=timestamps[i],
+                open_price=opens[i],
+                high_price=highs[i],
+                low_price=lows[i],
+                close_price=closes[i],
+                volume=volumes[i]
+            )
+
+            if not quiet:
+                output("Processing day " + str(i))
+            if previous_candle is not None:
+                execute(
+                    ticker=ticker,
+                    previous_candle=previous_candle,
+                    current_candle=current_candle,
+                    order_book=order_book,
+                    portfolio=portfolio,
+                    quiet=quiet
+                )
+
+            update(current_candle)
+            extend(get_orders(portfolio))
+
+            update_market_prices({ticker : closes[i]}, timestamps[i])
+            if not quiet:
+                output("Portfolio value: " + str(portfolio.get_portfolio_value()))
+            previous_candle = current_candle
+
+    if profiler is not None:
+        number_of_placed = counters.get("orders_placed", 0) - number_of_placed
+        number_of_filled = counters.get("orders_filled", 0) - number_of_filled
+        profiler.count("bars", len(closes))
+        # The placed and filled orders are counted by the timed calls. The
+        # counters are also reported if there were no calls.
+        profiler.count("orders_placed", 0)
+        profiler.count("orders_filled", 0)
+        profiler.count("orders_cancelled", number_of_pending + number_of_placed - number_of_filled
+                       - len(order_book))
+    return portfolio
+
+def simulate(full_data, ticker, quiet = False, order_book : OrderBook = None,
+             strategy : Strategy = None, portfolio : Portfolio = None, profiler : Profiler = None):
     """
     Simulates trading process.
 
     Each day previously placed orders are checked for execution.
     After that based on indicators we place the new orders.
     They will be executed from the next day.
+
+    The dataframe is converted once into arrays and the loop runs over them.
+    The arrays can also be passed in directly, e.g. the memory mapped
+    columns returned by MarketDataStore.read.
     
     Parameters
     ----------
-    full_data : pandas.DataFrame
-        Multilevel dataframe containing the OPHC candles for multiple stocks.
+    full_data : pandas.DataFrame or dict
+        Multilevel dataframe containing the OPHC candles for multiple stocks,
+        or pairs (column -> numpy.ndarray) with the bars of the ticker
+        (see get_bar_arrays).
     ticker : str
         A string containing the ticker symbol for a specific stock.
+    quiet : bool
+        If True, nothing is printed during the simulation.
+    order_book : OrderBook or None
+        The book in which the orders are placed. It can be passed in to
+        inspect the pending orders and its registry of open order groups
+        after the simulation. If None, a new book is used.
+    strategy : Strategy or None
+        The strategy which places the orders. If None, a Strategy with the
+        default parameters is used.
+    portfolio : Portfolio or None
+        The portfolio in which the orders are executed. If None, a new
+        Portfolio with the default parameters is used.
+    profiler : Profiler or None
+        The profiler which collects the time per phase of the run, including
+        the conversion of the data ("prepare"). If None, nothing is timed.
     
     Returns
     -------
@@ -144,46 +309,303 @@ def simulate(full_data, ticker):
         A class containing the performance history of the portfolio. 
     """
 
-    data = full_data.xs(ticker, level=1, axis=1)
-    orders_stack = []
-    executed_orders = set()
-    portfolio = Portfolio()
-    strategy = Strategy()
+    if profiler is not None:
+        profiler.start()
+        start = time.perf_counter()
+    if isinstance(full_data, dict):
+        bars = full_data
+        timestamps = pd.DatetimeIndex(bars["timestamp"]).tolist()
+    else:
+        data = full_data.xs(ticker, level=1, axis=1)
+        bars = get_bar_arrays(data)
+        timestamps = data.index.tolist()
 
-    for i in range(0, len(data)):
+    if order_book is None:
+        order_book = OrderBook()
+    if portfolio is None:
+        portfolio = Portfolio()
+    if strategy is None:
+        strategy = Strategy(quiet=quiet)
+    portfolio.reserve(len(timestamps))
+    opens, highs, lows = bars["open"].tolist(), bars["high"].tolist(), bars["low"].tolist()
+    closes, volumes = bars["close"].tolist(), bars["volume"].tolist()
+    if profiler is not None:
+        profiler.add("prepare", time.perf_counter() - start)
 
-        print("Processing day " + str(i))
-        if i != 0:
-            orders_stack, executed_orders = execute_orders(
-                ticker=ticker,
-                previous_candle=data.iloc[i - 1],
-                current_candle=data.iloc[i],
-                orders_stack=orders_stack, 
-                portfolio=portfolio,
-                executed_orders=executed_orders
-            )
+    run_bars(ticker, timestamps, opens, highs, lows, closes, volumes,
+             strategy, portfolio, order_book, quiet, profiler=profiler)
+    if profiler is not None:
+        profiler.stop()
+
+    #vs = Visualizer(data, ticker)
+    #vs.plot()
+    
+    return portfolio
+        
+def simulate_feed(feed : BarFeed, ticker, quiet = False, order_book : OrderBook = None,
+                  strategy : Strategy = None, portfolio : Portfolio = None,
+                  profiler : Profiler = None):
+    """
+    Simulates trading process over a bar feed in one forward pass.
+
+    The bars are read chunk by chunk, so only one chunk is held in memory.
+    The strategy keeps only its lookback and, unless a portfolio is passed
+    in, the portfolio keeps the last 10000 values (as PaperTradingRuntime
+    does). The memory therefore depends on the lookback and the chunk size,
+    not on the length of the dataset. The metrics of the portfolio are
+    accumulated online and cover the whole run.
+
+    Parameters
+    ----------
+    feed : BarFeed
+        The source of the bars of the ticker.
+    ticker : str
+        A string containing the ticker symbol for a specific stock.
+    quiet : bool
+        If True, nothing is printed during the simulation.
+    order_book : OrderBook or None
+        The book in which the orders are placed. If None, a new book is used.
+    strategy : Strategy or None
+        The strategy which places the orders. If None, a Strategy with the
+        default parameters is used.
+    portfolio : Portfolio or None
+        The portfolio in which the orders are executed. If None, a new
+        Portfolio with a history of the last 10000 values is used.
+    profiler : Profiler or None
+        The profiler which collects the time per phase of the run, including
+        the reading of the chunks ("feed"). If None, nothing is timed.
+
+    Returns
+    -------
+    portfolio : Portfolio
+        A class containing the performance history of the portfolio.
+    """
+    if order_book is None:
+        order_book = OrderBook()
+    if strategy is None:
+        strategy = Strategy(quiet=quiet)
+    if portfolio is None:
+        portfolio = Portfolio(max_history=10000)
 
+    if profiler is not None:
+        profiler.start()
+        start = time.perf_counter()
+    previous_candle = None
+    for bars in feed:
+        timestamps = pd.DatetimeIndex(bars["timestamp"]).tolist()
+        opens, highs, lows = bars["open"].tolist(), bars["high"].tolist(), bars["low"].tolist()
+        closes, volumes = bars["close"].tolist(), bars["volume"].tolist()
+        if profiler is not None:
+            profiler.add("feed", time.perf_counter() - start)
+        run_bars(ticker, timestamps, opens, highs, lows, closes, volumes,
+                 strategy, portfolio, order_book, quiet, previous_candle, profiler)
+        previous_candle = Candle(timestamp=timestamps[-1], open_price=opens[-1], high_price=highs[-1],
+                                 low_price=lows[-1], close_price=closes[-1], volume=volumes[-1])
+        if profiler is not None:
+            start = time.perf_counter()
+    if profiler is not None:
+        profiler.add("feed", time.perf_counter() - start)
+        profiler.stop()
+
+    return portfolio
+
+def simulate_strategies(full_data, ticker, strategies : dict, quiet = False,
+                        portfolios : dict = None, max_history : int = 100):
+    """
+    Simulates trading a single stock with several strategies in one pass.
 
+    Every bar is converted into a Candle once and appended once to a shared
+    IndicatorRegistry, which updates every distinct indicator once, however
+    many strategies use it (e.g. several strategies on the same EMA(14)).
+    Then each strategy trades its own portfolio and order book in the same
+    steps as run_bars, so every portfolio matches the one of simulate()
+    with the same strategy.
+
+    Parameters
+    ----------
+    full_data : pandas.DataFrame or dict
+        Multilevel dataframe containing the OPHC candles for multiple stocks,
+        or pairs (column -> numpy.ndarray) with the bars of the ticker
+        (see get_bar_arrays).
+    ticker : str
+        A string containing the ticker symbol for a specific stock.
+    strategies : dict
+        Contains pairs (name -> factory). Each factory is called with the
+        shared registry and returns a strategy which takes its indicators
+        from it, e.g. lambda registry: Strategy(ema_period=20, registry=registry).
+    quiet : bool
+        If True, nothing is printed during the simulation.
+    portfolios : dict or None
+        Contains pairs (name -> Portfolio) for some of the strategies. The
+        other strategies get a new Portfolio with the default parameters.
+    max_history : int or None
+        The maximal number of values kept in the history of every shared
+        indicator. It has to cover the values read by the strategies.
+
+    Returns
+    -------
+    portfolios : dict
+        Contains pairs (name -> Portfolio) with the performance history of each strategy.
+    """
+    if isinstance(full_data, dict):
+        bars = full_data
+        timestamps = pd.DatetimeIndex(bars["timestamp"]).tolist()
+    else:
+        data = full_data.xs(ticker, level=1, axis=1)
+        bars = get_bar_arrays(data)
+        timestamps = data.index.tolist()
+
+    registry = IndicatorRegistry(max_history=max_history)
+    names = list(strategies)
+    instances = [strategies[name](registry) for name in names]
+    portfolios = dict(portfolios or {})
+    for name in names:
+        if name not in portfolios:
+            portfolios[name] = Portfolio()
+        portfolios[name].reserve(len(timestamps))
+    runs = [(instances[k], portfolios[name], OrderBook()) for k, name in enumerate(names)]
+
+    opens, highs, lows = bars["open"].tolist(), bars["high"].tolist(), bars["low"].tolist()
+    closes, volumes = bars["close"].tolist(), bars["volume"].tolist()
+    previous_candle = None
+    for i in range(0, len(closes)):
         current_candle = Candle(
-            timestamp=data.index[i],
-            open_price=data.iloc[i]['Open'],
-            high_price=data.iloc[i]['High'],
-            low_price=data.iloc[i]['Low'],
-            close_price=data.iloc[i]['Close'],
-            volume=data.iloc[i]['Volume']
+            timestamp=timestamps[i],
+            open_price=opens[i],
+            high_price=highs[i],
+            low_price=lows[i],
+            close_price=closes[i],
+            volume=volumes[i]
         )
 
-        strategy.update(current_candle)
-        orders_stack.extend(strategy.get_orders(portfolio))
+        if not quiet:
+            print("Processing day " + str(i))
+        registry.append_candle(current_candle)
+        prices = {ticker : closes[i]}
+        for strategy, portfolio, order_book in runs:
+            if previous_candle is not None:
+                execute_orders(
+                    ticker=ticker,
+                    previous_candle=previous_candle,
+                    current_candle=current_candle,
+                    order_book=order_book,
+                    portfolio=portfolio,
+                    quiet=quiet
+                )
 
-        portfolio.update_market_prices({ticker : data.iloc[i]['Close']}, data.index[i])
-        print("Portfolio value: " + str(portfolio.get_portfolio_value()))
+            strategy.update(current_candle)
+            order_book.extend(strategy.get_orders(portfolio))
+            portfolio.update_market_prices(prices, timestamps[i])
+        previous_candle = current_candle
+
+    return portfolios
+
+def get_panel_arrays(full_data, tickers):
+    """
+    Converts a multi-ticker dataframe into 2D arrays with a shared time axis.
+
+    Parameters
+    ----------
+    full_data : pandas.DataFrame
+        Multilevel dataframe containing the OPHC candles for multiple stocks.
+    tickers : list of str
+        The ticker symbols, in the order of the columns of the arrays.
+
+    Returns
+    -------
+    bars : dict
+        Contains pairs (column -> numpy.ndarray of shape (bars, tickers)) for
+        the open, high, low, close and volume columns. Missing bars are NaN.
+        The "mark" column contains the close prices forward filled (and 0
+        before the first bar of a ticker), which are used for marking to market.
+    """
+    bars = {}
+    for column in ["Open", "High", "Low", "Close", "Volume"]:
+        bars[column.lower()] = full_data[column][tickers].to_numpy(dtype="float64")
+    bars["mark"] = np.nan_to_num(full_data["Close"][tickers].ffill().to_numpy(dtype="float64"))
+    return bars
+
+def simulate_panel(full_data, tickers = None, quiet = False, strategy_factory = None):
+    """
+    Simulates trading a set of stocks in a single pass.
+
+    All tickers share one time axis and one portfolio. Each ticker has its own
+    strategy and order book. On each bar the orders and the strategies of the
+    tickers with data are updated and then the whole portfolio is marked to
+    market with a single dot product of the quantities and the prices.
+
+    Parameters
+    ----------
+    full_data : pandas.DataFrame
+        Multilevel dataframe containing the OPHC candles for multiple stocks.
+    tickers : list of str or None
+        The ticker symbols to be traded. If None, all tickers in the dataframe.
+    quiet : bool
+        If True, nothing is printed during the simulation.
+    strategy_factory : callable or None
+        Creates the strategy of a ticker, called with the ticker. If None,
+        a Strategy with the default parameters is used for every ticker.
+
+    Returns
+    -------
+    portfolio : Portfolio
+        A class containing the performance history of the portfolio.
+    """
+    if strategy_factory is None:
+        strategy_factory = lambda ticker: Strategy(quiet=quiet)
+    if tickers is None:
+        tickers = list(full_data["Close"].columns)
+    bars = get_panel_arrays(full_data, tickers)
+    timestamps = full_data.index.tolist()
+    has_data = ~np.isnan(bars["close"])
+
+    portfolio = Portfolio(capacity=len(timestamps))
+    portfolio.set_universe(tickers)
+    strategies = [strategy_factory(ticker) for ticker in tickers]
+    order_books = [OrderBook() for _ in tickers]
+    previous_candles = [None] * len(tickers)
+
+    for i in range(0, len(timestamps)):
+        if not quiet:
+            print("Processing day " + str(i))
+
+        columns = np.flatnonzero(has_data[i])
+        opens = bars["open"][i, columns].tolist()
+        highs = bars["high"][i, columns].tolist()
+        lows = bars["low"][i, columns].tolist()
+        closes = bars["close"][i, columns].tolist()
+        volumes = bars["volume"][i, columns].tolist()
+
+        for k, j in enumerate(columns.tolist()):
+            current_candle = Candle(
+                timestamp=timestamps[i],
+                open_price=opens[k],
+                high_price=highs[k],
+                low_price=lows[k],
+                close_price=closes[k],
+                volume=volumes[k]
+            )
+
+            if previous_candles[j] is not None:
+                execute_orders(
+                    ticker=tickers[j],
+                    previous_candle=previous_candles[j],
+                    current_candle=current_candle,
+                    order_book=order_books[j],
+                    portfolio=portfolio,
+                    quiet=quiet
+                )
+
+            strategies[j].update(current_candle)
+            order_books[j].extend(strategies[j].get_orders(portfolio))
+            previous_candles[j] = current_candle
+
+        portfolio.update_market_values(bars["mark"][i], timestamps[i])
+        if not quiet:
+            print("Portfolio value: " + str(portfolio.get_portfolio_value()))
 
-    #vs = Visualizer(data, ticker)
-    #vs.plot()
-    
     return portfolio
-        
+
 def analyze(portfolio : Portfolio):
     portfolio.get_stats()
 
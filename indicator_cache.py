@@ -0,0 +1,355 @@
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+
+DEFAULT_ROOT = os.path.join(os.path.dirname(__file__), "data", "indicators")
+COLUMNS = ("open", "high", "low", "close", "volume")
+
+def _freeze(value):
+    """
+    Converts the lists in the arguments into tuples, so that equal arguments have the same key.
+    """
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+class IndicatorCache:
+    """
+    Represents an on-disk cache of indicator series calculated in batch.
+
+    An entry is identified by a content hash of the OHLCV columns of the
+    input and by the indicator class with the arguments of its batch
+    method. Its values are stored as a .npy file (one row per output of
+    the indicator, e.g. per period) and are returned as read-only memory
+    mapped views, so a hit only maps the file. The entries are listed in
+    index.json with the number of bars, the size and the time of the last
+    use, and the least recently used entries are evicted once the total
+    size exceeds max_bytes. A hit only updates the time of its last use in
+    memory: the index is written on the next miss, after hits_per_write
+    hits or by flush().
+
+    If there is no entry for the input, but one of the same indicator for
+    a prefix of it (e.g. the same ticker before new bars were appended),
+    only the tail is calculated: batch is run over the new bars and the
+    preceding batch_lookback bars of the indicator class, and the values
+    are appended to the stored ones. The extended entry replaces the
+    shorter one.
+
+    The values of a new entry are written before the index, and the files
+    of removed entries are deleted after it, so an interrupted write leaves
+    at most an unlisted file. An entry whose file is missing anyway (e.g.
+    deleted by hand) is dropped and calculated again.
+
+    The cache is meant for a single writer at a time.
+
+    Attributes
+    ----------
+    root : str
+        The directory of the cache.
+    max_bytes : int
+        The maximal total size of the stored values.
+    hits_per_write : int
+        The maximal number of hits between two writes of the index.
+    index : dict
+        Contains the entries (id -> metadata) and the clock of the last use.
+    """
+    def __init__(self, root : str = DEFAULT_ROOT, max_bytes : int = 1 << 30, hits_per_write : int = 100):
+        """
+        Initializes the cache and reads its index.
+
+        Parameters
+        ----------
+        root : str
+            The directory of the cache. It is created when the first entry is written.
+        max_bytes : int
+            The maximal total size of the stored values in bytes.
+        hits_per_write : int
+            The maximal number of hits between two writes of the index.
+            Until it is written, the times of the last use are only kept
+            in memory, which affects the order of the eviction alone.
+
+        Raises
+        ------
+        ValueError
+            If max_bytes or hits_per_write is not positive.
+        """
+        if max_bytes <= 0:
+            raise ValueError("The size of the indicator cache must be positive")
+        if hits_per_write <= 0:
+            raise ValueError("The number of hits between writes of the index must be positive")
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits_per_write = hits_per_write
+        self.index = {"clock" : 0, "entries" : {}}
+        # The number of hits since the index was written.
+        self._unsaved_hits = 0
+        # The files of the removed entries, deleted once the index is written.
+        self._removed_paths = []
+        # Pairs ((fingerprint, number of bars) -> fingerprint of the prefix)
+        # of the last input, so its prefixes are hashed once for all indicators.
+        self._prefixes = {}
+        path = os.path.join(root, "index.json")
+        if os.path.exists(path):
+            with open(path) as file:
+                self.index = json.load(file)
+
+    def __len__(self):
+        """
+        Returns the number of entries.
+        """
+        return len(self.index["entries"])
+
+    def get_size(self):
+        """
+        Returns the total size of the stored values in bytes.
+        """
+        return sum(entry["bytes"] for entry in self.index["entries"].values())
+
+    def _write_index(self):
+        """
+        Replaces the index and then deletes the files of the removed entries.
+
+        The values of new entries are written before and the files of the
+        removed entries are deleted after it, so it never lists missing files.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, "index.json")
+        with open(path + ".tmp", "w") as file:
+            json.dump(self.index, file)
+        os.replace(path + ".tmp", path)
+        self._unsaved_hits = 0
+
+        for removed_path in self._removed_paths:
+            if os.path.exists(removed_path):
+                os.remove(removed_path)
+        self._removed_paths = []
+
+    def flush(self):
+        """
+        Writes the times of the last use of the hits since the last write of the index.
+
+        Returns
+        -------
+        None
+        """
+        if self._unsaved_hits > 0:
+            self._write_index()
+
+    @staticmethod
+    def _to_columns(bars):
+        """
+        Converts the input into contiguous float64 arrays of the OHLCV columns.
+        """
+        if hasattr(bars, "columns"):
+            return {column : bars[column.capitalize()].to_numpy(dtype="float64") for column in COLUMNS
+                    if column.capitalize() in bars.columns}
+        return {column : np.ascontiguousarray(bars[column], dtype=np.float64) for column in COLUMNS
+                if column in bars}
+
+    @staticmethod
+    def _to_frame(columns : dict, start : int, end : int):
+        """
+        Builds the dataframe of a range of bars for the batch methods.
+        """
+        return pd.DataFrame({column.capitalize() : values[start:end] for column, values in columns.items()},
+                            copy=False)
+
+    @staticmethod
+    def _extend(stored, tail, number_of_new : int):
+        """
+        Appends the values of the new bars, which are the last ones of the tail.
+        """
+        return np.concatenate((stored, tail[len(tail) - number_of_new:]))
+
+    @staticmethod
+    def get_fingerprint(columns : dict, number_of_bars : int = None):
+        """
+        Hashes the content of the first bars of the columns.
+
+        Parameters
+        ----------
+        columns : dict
+            Contains pairs (column -> numpy.ndarray of float64).
+        number_of_bars : int or None
+            The number of hashed bars. If None, all bars are hashed.
+
+        Returns
+        -------
+        str
+            The hexadecimal SHA-256 digest.
+        """
+        digest = hashlib.sha256()
+        for column in COLUMNS:
+            if column in columns:
+                digest.update(column.encode())
+                digest.update(memoryview(columns[column][:number_of_bars]))
+        return digest.hexdigest()
+
+    @staticmethod
+    def _get_family(indicator_class : type, args : tuple, kwargs : dict):
+        """
+        Builds the key of an indicator class with the arguments of its batch method.
+        """
+        arguments = (_freeze(args), tuple(sorted((name, _freeze(value)) for name, value in kwargs.items())))
+        return f"{indicator_class.__module__}.{indicator_class.__qualname__}{arguments!r}"
+
+    def _read(self, entry_id : str):
+        """
+        Maps the values of an entry and splits them into the outputs of the indicator.
+
+        If the file of the entry is missing, the entry is dropped and None is returned.
+        """
+        entry = self.index["entries"][entry_id]
+        try:
+            values = np.load(os.path.join(self.root, entry_id + ".npy"), mmap_mode="r")
+        except FileNotFoundError:
+            del self.index["entries"][entry_id]
+            return None
+        if entry["keys"] is None:
+            return values[0]
+        return {key : values[row] for row, key in enumerate(entry["keys"])}
+
+    def _write(self, entry_id : str, entry : dict, result):
+        """
+        Stores the values of an entry, or nothing if they exceed the size of the cache.
+        """
+        if isinstance(result, dict):
+            entry["keys"] = list(result)
+            values = np.vstack([np.asarray(series, dtype=np.float64) for series in result.values()])
+        else:
+            entry["keys"] = None
+            values = np.asarray(result, dtype=np.float64)[np.newaxis]
+        entry["bytes"] = values.nbytes
+        if values.nbytes > self.max_bytes:
+            return False
+
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, entry_id + ".npy")
+        with open(path + ".tmp", "wb") as file:
+            np.save(file, values)
+        os.replace(path + ".tmp", path)
+        self.index["entries"][entry_id] = entry
+        return True
+
+    def _remove(self, entry_id : str):
+        """
+        Removes an entry from the index. Its file is deleted once the index is written.
+        """
+        del self.index["entries"][entry_id]
+        self._removed_paths.append(os.path.join(self.root, entry_id + ".npy"))
+
+    def _evict(self, keep : str):
+        """
+        Removes the least recently used entries until the size limit holds.
+        """
+        size = self.get_size()
+        for entry_id, entry in sorted(self.index["entries"].items(), key=lambda item: item[1]["last_used"]):
+            if size <= self.max_bytes:
+                break
+            if entry_id != keep:
+                size -= entry["bytes"]
+                self._remove(entry_id)
+
+    def _find_prefix(self, family : str, columns : dict, number_of_bars : int, fingerprint : str):
+        """
+        Finds the longest entry of the family whose input is a prefix of the columns.
+        """
+        candidates = sorted(((entry["number_of_bars"], entry_id) for entry_id, entry in self.index["entries"].items()
+                             if entry["family"] == family and 0 < entry["number_of_bars"] < number_of_bars),
+                            reverse=True)
+        for length, entry_id in candidates:
+            if (fingerprint, length) not in self._prefixes:
+                if next(iter(self._prefixes), (fingerprint,))[0] != fingerprint:
+                    self._prefixes = {}
+                self._prefixes[(fingerprint, length)] = self.get_fingerprint(columns, length)
+            if self._prefixes[(fingerprint, length)] == self.index["entries"][entry_id]["fingerprint"]:
+                return entry_id
+        return None
+
+    def get(self, indicator_class : type, bars, *args, fingerprint : str = None, **kwargs):
+        """
+        Returns the batch values of an indicator, from the cache if possible.
+
+        Parameters
+        ----------
+        indicator_class : type
+            The class of the indicator, e.g. ExponentialMovingAverage. Its
+            static batch method is called with a dataframe of the bars and
+            the arguments. If it has a batch_lookback method with the same
+            arguments, stored values of a prefix of the bars are extended.
+        bars : dict or pandas.DataFrame
+            Contains pairs (column -> numpy.ndarray) for the OHLCV columns
+            (see get_bar_arrays), or a dataframe with Open, High, Low, Close
+            and Volume columns.
+        *args, **kwargs
+            The arguments of batch after the data, e.g. the periods.
+        fingerprint : str or None
+            The content hash of the bars (see get_fingerprint). It can be
+            passed in to hash the bars once for many indicators.
+
+        Returns
+        -------
+        dict or numpy.ndarray
+            The result of batch: pairs (key -> values) or a single array.
+            Stored values are read-only memory mapped arrays.
+        """
+        columns = self._to_columns(bars)
+        number_of_bars = len(next(iter(columns.values())))
+        if fingerprint is None:
+            fingerprint = self.get_fingerprint(columns)
+        family = self._get_family(indicator_class, args, kwargs)
+        entry_id = hashlib.sha256((family + fingerprint).encode()).hexdigest()[:32]
+
+        self.index["clock"] += 1
+        entries = self.index["entries"]
+        if entry_id in entries:
+            result = self._read(entry_id)
+            if result is not None:
+                entries[entry_id]["last_used"] = self.index["clock"]
+                self._unsaved_hits += 1
+                if self._unsaved_hits >= self.hits_per_write:
+                    self._write_index()
+                return result
+
+        prefix_id = None
+        if hasattr(indicator_class, "batch_lookback"):
+            prefix_id = self._find_prefix(family, columns, number_of_bars, fingerprint)
+        if prefix_id is not None:
+            length = entries[prefix_id]["number_of_bars"]
+            stored = self._read(prefix_id)
+            if stored is None:
+                prefix_id = None
+        if prefix_id is None:
+            result = indicator_class.batch(self._to_frame(columns, 0, number_of_bars), *args, **kwargs)
+        else:
+            start = max(0, length - indicator_class.batch_lookback(*args, **kwargs))
+            tail = indicator_class.batch(self._to_frame(columns, start, number_of_bars), *args, **kwargs)
+            if isinstance(tail, dict):
+                result = {key : self._extend(stored[key], tail[key], number_of_bars - length) for key in tail}
+            else:
+                result = self._extend(stored, tail, number_of_bars - length)
+
+        entry = {"family" : family, "fingerprint" : fingerprint, "number_of_bars" : number_of_bars,
+                 "last_used" : self.index["clock"]}
+        written = self._write(entry_id, entry, result)
+        if prefix_id is not None:
+            self._remove(prefix_id)
+        if written:
+            self._evict(keep=entry_id)
+            self._write_index()
+            return self._read(entry_id)
+        self._write_index()
+        return result
+
+    def clear(self):
+        """
+        Removes all entries, including the unlisted files of interrupted writes.
+        """
+        for entry_id in list(self.index["entries"]):
+            self._remove(entry_id)
+        if os.path.isdir(self.root):
+            self._removed_paths += [os.path.join(self.root, name) for name in os.listdir(self.root)
+                                    if name.endswith((".npy", ".npy.tmp"))]
+        self._write_index()
@@ -0,0 +1,667 @@
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+
+COLUMNS = ("timestamp", "open", "high", "low", "close", "volume")
+PRICE_COLUMNS = {"open" : "Open", "high" : "High", "low" : "Low", "close" : "Close", "volume" : "Volume"}
+DEFAULT_ROOT = os.path.join(os.path.dirname(__file__), "data", "store")
+
+class DataProvider(ABC):
+    """
+    Represents a source of historical bars for the MarketDataStore.
+
+    A provider implements fetch(ticker, start, end, interval), so the
+    remote source can be replaced, e.g. by an offline one in tests (see
+    benchmarks.synthetic.SyntheticProvider). The store may call fetch from
+    several threads at once for different tickers.
+    """
+    @abstractmethod
+    def fetch(self, ticker : str, start : pd.Timestamp, end : pd.Timestamp, interval : str = "1d"):
+        """
+        Fetches the bars of a ticker.
+
+        Parameters
+        ----------
+        ticker : str
+            The ticker symbol of the asset.
+        start : pandas.Timestamp
+            The first requested time (inclusive).
+        end : pandas.Timestamp
+            The last requested time (exclusive).
+        interval : str
+            The length of a bar, e.g. "1d" or "1h".
+
+        Returns
+        -------
+        data : pandas.DataFrame
+            A dataframe with Open, High, Low, Close and Volume columns,
+            indexed by the timestamps of the bars.
+        """
+
+class YahooProvider(DataProvider):
+    """
+    Downloads historical bars from Yahoo Finance.
+    """
+    def fetch(self, ticker : str, start : pd.Timestamp, end : pd.Timestamp, interval : str = "1d"):
+        """
+        Downloads the bars of a ticker.
+
+        Parameters
+        ----------
+        ticker : str
+            The ticker symbol of the asset.
+        start : pandas.Timestamp
+            The first requested time (inclusive).
+        end : pandas.Timestamp
+            The last requested time (exclusive).
+        interval : str
+            The length of a bar, e.g. "1d" or "1h".
+
+        Returns
+        -------
+        data : pandas.DataFrame
+            A dataframe with Open, High, Low, Close and Volume columns,
+            indexed by the timestamps of the bars.
+        """
+        # yfinance is imported only when bars are downloaded.
+        import yfinance as yf
+
+        data = yf.download(ticker, start=start.strftime('%Y-%m-%d'), end=end.strftime('%Y-%m-%d'),
+                           interval=interval, progress=False)
+        if isinstance(data.columns, pd.MultiIndex):
+            data = data.xs(ticker, level=1, axis=1)
+        return data
+
+class MarketDataStore:
+    """
+    Represents a local columnar store of OHLCV bars.
+
+    The bars are kept per interval and ticker in root/interval/ticker:
+        1. one raw binary file per column - the timestamps as int64
+        nanoseconds (UTC) and the prices and volumes as float64.
+        2. meta.json - the number of stored bars and the requested time
+        range which is covered by them.
+    The columns are read with memory mapping, so a load only maps the files
+    and the pages are read from disk when they are accessed.
+
+    A request for a time range is served from disk. Only the parts of the
+    range which are not covered yet are fetched from the provider: the
+    missing tail is appended to the files and a missing head is merged in
+    front of them. The last stored bar is fetched again together with the
+    tail, since it may have been incomplete when it was stored.
+
+    Attributes
+    ----------
+    root : str
+        The directory of the store.
+    provider : object
+        The source of the bars, with a fetch(ticker, start, end, interval) method.
+    """
+    def __init__(self, root : str = DEFAULT_ROOT, provider = None):
+        """
+        Initializes the store.
+
+        Parameters
+        ----------
+        root : str
+            The directory of the store. It is created when the first bars are written.
+        provider : object or None
+            The source of the bars. If None, a YahooProvider is used.
+        """
+        self.root = root
+        self.provider = provider if provider is not None else YahooProvider()
+
+    def _get_directory(self, ticker : str, interval : str):
+        return os.path.join(self.root, interval, ticker)
+
+    def _read_meta(self, ticker : str, interval : str):
+        """
+        Reads the metadata of a ticker, or returns None if nothing is stored.
+        """
+        path = os.path.join(self._get_directory(ticker, interval), "meta.json")
+        if not os.path.exists(path):
+            return None
+        with open(path) as file:
+            return json.load(file)
+
+    def _write_meta(self, ticker : str, interval : str, meta : dict):
+        """
+        Replaces the metadata of a ticker. The metadata is written after the
+        columns, so a reader never sees more bars than are in the files.
+        """
+        directory = self._get_directory(ticker, interval)
+        path = os.path.join(directory, "meta.json")
+        with open(path + ".tmp", "w") as file:
+            json.dump(meta, file)
+        os.replace(path + ".tmp", path)
+
+    @staticmethod
+    def _to_timestamp(value):
+        """
+        Converts a time to a timezone-naive UTC pandas.Timestamp.
+        """
+        timestamp = pd.Timestamp(value)
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.tz_convert("UTC").tz_localize(None)
+        return timestamp
+
+    @staticmethod
+    def _to_columns(data):
+        """
+        Converts the bars returned by a provider into column arrays.
+        """
+        index = pd.DatetimeIndex(data.index)
+        if index.tz is not None:
+            index = index.tz_convert("UTC").tz_localize(None)
+        columns = {"timestamp" : index.to_numpy(dtype="datetime64[ns]").view(np.int64)}
+        for column, name in PRICE_COLUMNS.items():
+            columns[column] = data[name].to_numpy(dtype=np.float64)
+        return columns
+
+    def _write_columns(self, ticker : str, interval : str, columns : dict, keep : int):
+        """
+        Keeps the first keep stored bars of a ticker and writes new bars after them.
+
+        If nothing is kept, the files are replaced, so the arrays which are
+        already mapped by readers stay valid. Otherwise the new bars are
+        written in place after the kept ones.
+
+        Returns
+        -------
+        int
+            The number of stored bars.
+        """
+        directory = self._get_directory(ticker, interval)
+        os.makedirs(directory, exist_ok=True)
+        for column in COLUMNS:
+            path = os.path.join(directory, column + ".bin")
+            values = np.ascontiguousarray(columns[column]).tobytes()
+            if keep == 0:
+                with open(path + ".tmp", "wb") as file:
+                    file.write(values)
+                os.replace(path + ".tmp", path)
+            else:
+                with open(path, "r+b") as file:
+                    file.seek(8 * keep)
+                    file.write(values)
+        return keep + len(columns["timestamp"])
+
+    def _find_range(self, timestamps, start, end):
+        """
+        Finds the indexes of the first bar at or after start and the first bar at or after end.
+        """
+        first = 0
+        last = len(timestamps)
+        if start is not None:
+            first = int(np.searchsorted(timestamps, np.datetime64(self._to_timestamp(start), "ns")))
+        if end is not None:
+            last = int(np.searchsorted(timestamps, np.datetime64(self._to_timestamp(end), "ns")))
+        return first, last
+
+    def read(self, ticker : str, interval : str = "1d", start = None, end = None):
+        """
+        Reads stored bars of a ticker without fetching.
+
+        Parameters
+        ----------
+        ticker : str
+            The ticker symbol of the asset.
+        interval : str
+            The length of a bar.
+        start : datetime-like or None
+            The first returned time (inclusive). If None, from the first bar.
+        end : datetime-like or None
+            The last returned time (exclusive). If None, up to the last bar.
+
+        Returns
+        -------
+        bars : dict
+            Contains pairs (column -> read-only memory mapped numpy.ndarray).
+            The timestamps are datetime64[ns] in UTC. Nothing is copied.
+        """
+        meta = self._read_meta(ticker, interval)
+        number_of_bars = 0 if meta is None else meta["number_of_bars"]
+        if number_of_bars == 0:
+            return {column : np.empty(0, dtype="datetime64[ns]" if column == "timestamp" else np.float64)
+                    for column in COLUMNS}
+
+        directory = self._get_directory(ticker, interval)
+        bars = {}
+        for column in COLUMNS:
+            dtype = np.int64 if column == "timestamp" else np.float64
+            bars[column] = np.memmap(os.path.join(directory, column + ".bin"), dtype=dtype,
+                                     mode="r", shape=(number_of_bars,))
+        bars["timestamp"] = bars["timestamp"].view("datetime64[ns]")
+
+        first, last = self._find_range(bars["timestamp"], start, end)
+        return {column : values[first:last] for column, values in bars.items()}
+
+    def iter_chunks(self, ticker : str, interval : str = "1d", start = None, end = None,
+                    chunk_size : int = 1 << 16):
+        """
+        Reads stored bars of a ticker in chunks without fetching.
+
+        Every chunk is mapped on its own and copied, so only one chunk of
+        the files is resident in memory at a time.
+
+        Parameters
+        ----------
+        ticker : str
+            The ticker symbol of the asset.
+        interval : str
+            The length of a bar.
+        start : datetime-like or None
+            The first returned time (inclusive). If None, from the first bar.
+        end : datetime-like or None
+            The last returned time (exclusive). If None, up to the last bar.
+        chunk_size : int
+            The number of bars per chunk.
+
+        Yields
+        ------
+        bars : dict
+            Contains pairs (column -> numpy.ndarray) for all COLUMNS.
+        """
+        first, last = self._find_range(self.read(ticker, interval)["timestamp"], start, end)
+
+        directory = self._get_directory(ticker, interval)
+        for offset in range(first, last, chunk_size):
+            count = min(chunk_size, last - offset)
+            chunk = {}
+            for column in COLUMNS:
+                dtype = np.int64 if column == "timestamp" else np.float64
+                mapped = np.memmap(os.path.join(directory, column + ".bin"), dtype=dtype, mode="r",
+                                   offset=8 * offset, shape=(count,))
+                chunk[column] = np.array(mapped)
+                del mapped
+            chunk["timestamp"] = chunk["timestamp"].view("datetime64[ns]")
+            yield chunk
+
+    def write(self, ticker : str, bars : dict, interval : str = "1d", append : bool = False):
+        """
+        Writes bars of a ticker into the store without fetching.
+
+        The written range counts as covered, from the first to the last bar.
+
+        Parameters
+        ----------
+        ticker : str
+            The ticker symbol of the asset.
+        bars : dict
+            Contains pairs (column -> numpy.ndarray) for all COLUMNS, sorted by time.
+            The timestamps are datetime64 in UTC.
+        interval : str
+            The length of a bar.
+        append : bool
+            If True, the bars are appended after the stored ones.
+            Otherwise they replace them.
+
+        Raises
+        ------
+        ValueError
+            If the appended bars are not after the stored ones.
+
+        Returns
+        -------
+        int
+            The number of stored bars.
+        """
+        columns = {column : np.asarray(bars[column], dtype=np.float64) for column in PRICE_COLUMNS}
+        columns["timestamp"] = np.asarray(bars["timestamp"], dtype="datetime64[ns]").view(np.int64)
+        meta = self._read_meta(ticker, interval) if append else None
+        if meta is not None and meta["number_of_bars"] == 0:
+            meta = None
+        keep = 0 if meta is None else meta["number_of_bars"]
+        if len(columns["timestamp"]) == 0 and meta is not None:
+            return keep
+
+        if keep > 0:
+            last_timestamp = self.read(ticker, interval)["timestamp"][-1].astype(np.int64)
+            if columns["timestamp"][0] <= last_timestamp:
+                raise ValueError("The appended bars must be after the stored bars of " + ticker)
+
+        number_of_bars = self._write_columns(ticker, interval, columns, keep=keep)
+        if len(columns["timestamp"]) > 0:
+            end = pd.Timestamp(int(columns["timestamp"][-1]) + 1)
+            start = pd.Timestamp(int(columns["timestamp"][0]))
+        else:
+            start = end = pd.Timestamp(0)
+        if meta is not None:
+            start = min(start, pd.Timestamp(meta["start"]))
+        self._write_meta(ticker, interval, {"number_of_bars" : number_of_bars,
+                                            "start" : start.isoformat(), "end" : end.isoformat()})
+        return number_of_bars
+
+    def update(self, ticker : str, start, end, interval : str = "1d"):
+        """
+        Makes sure that the store covers a time range of a ticker.
+
+        Only the head before and the tail after the covered range are fetched.
+
+        Parameters
+        ----------
+        ticker : str
+            The ticker symbol of the asset.
+        start : datetime-like
+            The first requested time (inclusive).
+        end : datetime-like
+            The last requested time (exclusive).
+        interval : str
+            The length of a bar.
+
+        Returns
+        -------
+        int
+            The number of fetched bars.
+        """
+        start = self._to_timestamp(start)
+        end = self._to_timestamp(end)
+        meta = self._read_meta(ticker, interval)
+        number_of_fetched = 0
+
+        if meta is None:
+            columns = self._to_columns(self.provider.fetch(ticker, start, end, interval))
+            number_of_bars = self._write_columns(ticker, interval, columns, keep=0)
+            self._write_meta(ticker, interval, {"number_of_bars" : number_of_bars,
+                                                "start" : start.isoformat(), "end" : end.isoformat()})
+            return number_of_bars
+
+        covered_start = pd.Timestamp(meta["start"])
+        covered_end = pd.Timestamp(meta["end"])
+
+        if start < covered_start:
+            head = self._to_columns(self.provider.fetch(ticker, start, covered_start, interval))
+            stored = {column : np.array(values) for column, values in self.read(ticker, interval).items()}
+            stored["timestamp"] = stored["timestamp"].view(np.int64)
+            if len(stored["timestamp"]) > 0:
+                head = {column : values[head["timestamp"] < stored["timestamp"][0]]
+                        for column, values in head.items()}
+            columns = {column : np.concatenate((head[column], stored[column])) for column in COLUMNS}
+            meta["number_of_bars"] = self._write_columns(ticker, interval, columns, keep=0)
+            meta["start"] = start.isoformat()
+            number_of_fetched += len(head["timestamp"])
+            self._write_meta(ticker, interval, meta)
+
+        if end > covered_end:
+            keep = meta["number_of_bars"]
+            tail_start = covered_end
+            if keep > 0:
+                # The last stored bar is fetched again, it may have been incomplete.
+                last_timestamp = self.read(ticker, interval)["timestamp"][-1].astype(np.int64)
+                tail_start = min(covered_end, pd.Timestamp(last_timestamp))
+            tail = self._to_columns(self.provider.fetch(ticker, tail_start, end, interval))
+            if keep > 0:
+                tail = {column : values[tail["timestamp"] >= last_timestamp]
+                        for column, values in tail.items()}
+                if len(tail["timestamp"]) > 0 and tail["timestamp"][0] == last_timestamp:
+                    keep -= 1
+            meta["number_of_bars"] = self._write_columns(ticker, interval, tail, keep=keep)
+            meta["end"] = end.isoformat()
+            number_of_fetched += len(tail["timestamp"])
+            self._write_meta(ticker, interval, meta)
+
+        return number_of_fetched
+
+    def update_many(self, tickers : list[str], start, end, interval : str = "1d", workers : int = 8,
+                    retries : int = 3, backoff : float = 1.0):
+        """
+        Makes sure that the store covers a time range of many tickers, fetching them concurrently.
+
+        Every ticker is updated (see update) by one of a bounded number of
+        threads, so at most `workers` requests are in flight at once and the
+        bars of a ticker are written into the store as soon as they arrive.
+        A failed update is retried after a backoff which doubles with every
+        attempt. The tickers are stored in separate directories, so the
+        threads never write the same files.
+
+        Parameters
+        ----------
+        tickers : list of str
+            The ticker symbols.
+        start : datetime-like
+            The first requested time (inclusive).
+        end : datetime-like
+            The last requested time (exclusive).
+        interval : str
+            The length of a bar.
+        workers : int
+            The maximal number of concurrent updates.
+        retries : int
+            The number of attempts after the first failed one.
+        backoff : float
+            The wait in seconds before the first retry.
+
+        Raises
+        ------
+        ValueError
+            If the number of workers is not positive.
+
+        Returns
+        -------
+        fetched : dict
+            Contains pairs (ticker -> number of fetched bars) of the updated tickers.
+        failed : dict
+            Contains pairs (ticker -> last exception) of the tickers whose
+            update failed in every attempt.
+        """
+        if workers <= 0:
+            raise ValueError("The number of workers must be positive")
+
+        def update(ticker):
+            for attempt in range(retries + 1):
+                try:
+                    return self.update(ticker, start, end, interval)
+                except Exception:
+                    if attempt == retries:
+                        raise
+                    time.sleep(backoff * 2 ** attempt)
+
+        fetched = {}
+        failed = {}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(update, ticker) : ticker for ticker in dict.fromkeys(tickers)}
+            for future in as_completed(futures):
+                try:
+                    fetched[futures[future]] = future.result()
+                except Exception as error:
+                    failed[futures[future]] = error
+        return fetched, failed
+
+    def load(self, tickers, start, end, interval : str = "1d", workers : int = 8):
+        """
+        Loads the bars of one or more tickers, fetching only what is missing.
+
+        The missing bars of the tickers are fetched concurrently (see update_many).
+
+        Parameters
+        ----------
+        tickers : str or list of str
+            The ticker symbols.
+        start : datetime-like
+            The first requested time (inclusive).
+        end : datetime-like
+            The last requested time (exclusive).
+        interval : str
+            The length of a bar.
+        workers : int
+            The maximal number of concurrent updates.
+
+        Raises
+        ------
+        ValueError
+            If the bars of a ticker could not be fetched.
+
+        Returns
+        -------
+        data : pandas.DataFrame
+            A dataframe with the same (Price, Ticker) columns as the one
+            returned by yfinance, indexed by the timestamps of the bars.
+            Missing bars of a ticker are NaN.
+        """
+        if isinstance(tickers, str):
+            tickers = [tickers]
+
+        _, failed = self.update_many(tickers, start, end, interval, workers=workers, retries=0)
+        if failed:
+            ticker, error = next(iter(failed.items()))
+            raise ValueError(f"Could not fetch the bars of {ticker}: {error}") from error
+
+        frames = []
+        for ticker in tickers:
+            bars = self.read(ticker, interval, start, end)
+            index = pd.DatetimeIndex(bars["timestamp"], name="Date")
+            frames.append(pd.DataFrame({name : bars[column] for column, name in PRICE_COLUMNS.items()},
+                                       index=index))
+
+        data = pd.concat(frames, axis=1, keys=tickers, names=["Ticker", "Price"])
+        data = data.swaplevel(axis=1)
+        return data[["Close", "High", "Low", "Open", "Volume"]]
+
+def _read_csv_header(path : str):
+    """
+    Reads the three header rows of a CSV file saved from a yfinance dataframe:
+        Price,Close,High,Low,Open,Volume
+        Ticker,AAPL,AAPL,AAPL,AAPL,AAPL
+        Date,,,,,
+
+    Raises
+    ------
+    ValueError
+        If the file does not have this header.
+
+    Returns
+    -------
+    columns : list of tuples
+        The pairs (price, ticker) of the data columns.
+    """
+    with open(path) as file:
+        rows = [file.readline().rstrip("\r\n").split(",") for _ in range(0, 3)]
+    if [row[0] for row in rows] != ["Price", "Ticker", "Date"] or len(rows[0]) != len(rows[1]):
+        raise ValueError("Not a yfinance CSV file: " + str(path))
+    return list(zip(rows[0][1:], rows[1][1:]))
+
+def iter_yfinance_csv(path : str, chunk_size : int = 1 << 20):
+    """
+    Reads a CSV file saved from a yfinance dataframe in chunks.
+
+    The header is parsed once and the rows are read with fixed dtypes
+    (the dates as strings, all other columns as float64), so there is no
+    type inference. The dates are parsed as ISO 8601 and converted to UTC.
+
+    Parameters
+    ----------
+    path : str
+        The path of the CSV file.
+    chunk_size : int
+        The number of rows per chunk.
+
+    Raises
+    ------
+    ValueError
+        If the file does not have the yfinance header.
+
+    Yields
+    ------
+    chunk : dict
+        Contains pairs (ticker -> bars), where the bars are pairs
+        (column -> numpy.ndarray) for all COLUMNS.
+    """
+    columns = _read_csv_header(path)
+    dtypes = {0 : str}
+    dtypes.update({i : np.float64 for i in range(1, len(columns) + 1)})
+    tickers = list(dict.fromkeys(ticker for _, ticker in columns))
+
+    for rows in pd.read_csv(path, skiprows=3, header=None, dtype=dtypes, chunksize=chunk_size,
+                            engine="c"):
+        timestamps = pd.to_datetime(rows[0], format="ISO8601", utc=True)
+        timestamps = timestamps.dt.tz_localize(None).to_numpy(dtype="datetime64[ns]")
+        chunk = {ticker : {"timestamp" : timestamps} for ticker in tickers}
+        for i, (price, ticker) in enumerate(columns):
+            column = price.lower()
+            if column in PRICE_COLUMNS:
+                chunk[ticker][column] = rows[i + 1].to_numpy()
+        yield chunk
+
+def read_yfinance_csv(path : str, chunk_size : int = 1 << 20):
+    """
+    Loads a CSV file saved from a yfinance dataframe (see save_data).
+
+    Parameters
+    ----------
+    path : str
+        The path of the CSV file.
+    chunk_size : int
+        The number of rows read at once.
+
+    Returns
+    -------
+    data : pandas.DataFrame
+        A dataframe with (Price, Ticker) columns of float64 values,
+        indexed by the timestamps of the bars.
+    """
+    columns = _read_csv_header(path)
+    chunks = list(iter_yfinance_csv(path, chunk_size))
+    if not chunks:
+        return pd.DataFrame(columns=pd.MultiIndex.from_tuples(columns, names=["Price", "Ticker"]))
+
+    first = chunks[0][columns[0][1]]
+    index = pd.DatetimeIndex(np.concatenate([chunk[columns[0][1]]["timestamp"] for chunk in chunks]),
+                             name="Date")
+    values = {(price, ticker) : np.concatenate([chunk[ticker][price.lower()] for chunk in chunks])
+              for price, ticker in columns if price.lower() in first}
+    data = pd.DataFrame(values, index=index)
+    data.columns.names = ["Price", "Ticker"]
+    return data
+
+def convert_csv_directory(directory : str, store : MarketDataStore, interval : str = "1d",
+                          chunk_size : int = 1 << 20):
+    """
+    Converts all yfinance CSV files of a directory into the binary layout of a store.
+
+    This is meant to be done once. Afterwards the bars are loaded with
+    MarketDataStore.read, which only maps the files, and the result can be
+    passed to simulate() directly. The files are streamed in chunks, so a
+    file does not have to fit in memory. Rows in which the close price of
+    a ticker is missing are skipped for that ticker. Other files are ignored.
+
+    Parameters
+    ----------
+    directory : str
+        The directory with the CSV files.
+    store : MarketDataStore
+        The store into which the bars are written. The stored bars of the
+        converted tickers are replaced.
+    interval : str
+        The length of a bar in the files.
+    chunk_size : int
+        The number of rows read at once.
+
+    Returns
+    -------
+    tickers : list of str
+        The converted tickers.
+    """
+    converted = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if not os.path.isfile(path):
+            continue
+        try:
+            _read_csv_header(path)
+        except (ValueError, UnicodeDecodeError):
+            continue
+
+        started = []
+        for chunk in iter_yfinance_csv(path, chunk_size):
+            for ticker, bars in chunk.items():
+                present = ~np.isnan(bars["close"])
+                store.write(ticker, {column : values[present] for column, values in bars.items()},
+                            interval, append=ticker in started)
+                if ticker not in started:
+                    started.append(ticker)
+        converted.extend(ticker for ticker in started if ticker not in converted)
+    return converted
@@ -0,0 +1,266 @@
+import json
+import time
+import tracemalloc
+try:
+    import resource
+except ImportError: # not available on Windows
+    resource = None
+
+class Profiler:
+    """
+    Collects the time spent per phase of a simulation and counts its events.
+
+    The profiler is opt-in: the simulation functions of the engine take it
+    as an argument and only then replace the calls of their loop with timed
+    ones (see timed), so a run without a profiler has no per-bar overhead.
+
+    A phase is timed with time.perf_counter around a call of the loop, e.g.
+    "execute_orders" or "get_orders". The update methods of the indicators
+    of a strategy are wrapped while the loop runs (see instrument), so they
+    are reported as "indicator:<attribute>" phases, which are part of the
+    "strategy.update" phase.
+
+    Attributes
+    ----------
+    trace_memory : bool
+        If True, the peak of the memory allocated by Python objects is traced
+        with tracemalloc. This slows down the run considerably.
+    phases : dict
+        Contains pairs (phase -> [seconds, calls]).
+    counters : dict
+        Contains pairs (event -> count), e.g. the number of bars and of the
+        placed, filled and cancelled orders.
+    total_seconds : float
+        The time between start and stop.
+    peak_traced : int or None
+        The peak of the traced memory in bytes, if trace_memory is set.
+    """
+    def __init__(self, trace_memory : bool = False):
+        """
+        Initializes an empty profiler.
+
+        Parameters
+        ----------
+        trace_memory : bool
+            If True, the peak of the memory allocated by Python objects is traced.
+        """
+        self.trace_memory = trace_memory
+        self.phases = {}
+        self.counters = {}
+        self.total_seconds = 0.0
+        self.peak_traced = None
+        self._started = None
+
+    def start(self):
+        """
+        Starts the total timer (and the memory tracing).
+        """
+        if self.trace_memory:
+            tracemalloc.start()
+        self._started = time.perf_counter()
+
+    def stop(self):
+        """
+        Stops the total timer (and the memory tracing).
+        """
+        self.total_seconds += time.perf_counter() - self._started
+        if self.trace_memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            self.peak_traced = max(self.peak_traced or 0, peak)
+            tracemalloc.stop()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exception):
+        self.stop()
+
+    def add(self, phase : str, seconds : float, calls : int = 1):
+        """
+        Adds the time of calls of a phase.
+
+        Parameters
+        ----------
+        phase : str
+            The name of the phase.
+        seconds : float
+            The elapsed time.
+        calls : int
+            The number of timed calls.
+
+        Returns
+        -------
+        None
+        """
+        totals = self.phases.get(phase)
+        if totals is None:
+            totals = self.phases[phase] = [0.0, 0]
+        totals[0] += seconds
+        totals[1] += calls
+
+    def count(self, event : str, number : int = 1):
+        """
+        Increases the counter of an event.
+        """
+        self.counters[event] = self.counters.get(event, 0) + number
+
+    def timed(self, method, phase : str, counter : str = None):
+        """
+        Wraps a callable, so that every call is added to a phase.
+
+        Parameters
+        ----------
+        method : callable
+            The timed function or bound method.
+        phase : str
+            The name of the phase.
+        counter : str or None
+            If given, the length of every result is added to this counter,
+            e.g. the number of returned orders.
+
+        Returns
+        -------
+        callable
+            The timed callable with the same arguments and result.
+        """
+        clock = time.perf_counter
+        add = self.add
+
+        if counter is None:
+            def timed(*args, **kwargs):
+                start = clock()
+                result = method(*args, **kwargs)
+                add(phase, clock() - start)
+                return result
+        else:
+            count = self.count
+
+            def timed(*args, **kwargs):
+                start = clock()
+                result = method(*args, **kwargs)
+                add(phase, clock() - start)
+                count(counter, len(result))
+                return result
+        return timed
+
+    def instrument(self, strategy):
+        """
+        Times the update method of every indicator of a strategy.
+
+        Every attribute of the strategy with an update method is treated as
+        an indicator. Its bound method is replaced by a timed one on the
+        instance and restored when the returned context is left.
+
+        Parameters
+        ----------
+        strategy : object
+            The strategy whose indicators are timed.
+
+        Returns
+        -------
+        context manager
+            The context in which the indicators are timed.
+        """
+        return _Instrumentation(self, strategy)
+
+    @staticmethod
+    def get_peak_rss():
+        """
+        Returns the peak resident memory of the process in bytes, or None if unknown.
+        """
+        if resource is None:
+            return None
+        # ru_maxrss is in kilobytes on Linux.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def get_report(self):
+        """
+        Builds the summary of the run.
+
+        Returns
+        -------
+        report : dict
+            The total time, the throughput in bars per second, the phases
+            (seconds, calls, share of the total time and mean time per call
+            in microseconds), the counters and the peak memory in MB.
+        """
+        total = self.total_seconds or sum(seconds for seconds, _ in self.phases.values())
+        bars = self.counters.get("bars", 0)
+        peak_rss = self.get_peak_rss()
+        return {
+            "total_seconds" : total,
+            "bars_per_second" : bars / total if total > 0 else 0.0,
+            "phases" : {phase : {"seconds" : seconds, "calls" : calls,
+                                 "share" : seconds / total if total > 0 else 0.0,
+                                 "mean_us" : seconds / calls * 1e6 if calls else 0.0}
+                        for phase, (seconds, calls) in sorted(self.phases.items(),
+                                                              key=lambda item: -item[1][0])},
+            "counters" : dict(self.counters),
+            "peak_rss_mb" : peak_rss / 2 ** 20 if peak_rss is not None else None,
+            "peak_traced_mb" : self.peak_traced / 2 ** 20 if self.peak_traced is not None else None,
+        }
+
+    def to_json(self, path : str = None):
+        """
+        Serializes the report to JSON.
+
+        Parameters
+        ----------
+        path : str or None
+            The file to which the report is written. If None, it is only returned.
+
+        Returns
+        -------
+        str
+            The report as JSON.
+        """
+        text = json.dumps(self.get_report(), indent=2)
+        if path is not None:
+            with open(path, "w") as file:
+                file.write(text)
+        return text
+
+    def print_summary(self):
+        """
+        Prints the report as a table.
+
+        Returns
+        -------
+        None
+        """
+        report = self.get_report()
+        print(f"{'phase':<40}{'seconds':>10}{'share':>8}{'calls':>12}{'mean (us)':>12}")
+        for phase, stats in report["phases"].items():
+            print(f"{phase:<40}{stats['seconds']:>10.3f}{stats['share']:>8.1%}"
+                  f"{stats['calls']:>12,}{stats['mean_us']:>12.2f}")
+        print(f"{'total':<40}{report['total_seconds']:>10.3f}")
+        for event, number in report["counters"].items():
+            print(f"{event + ':':<40}{number:>10,}")
+        print(f"{'bars per second:':<40}{report['bars_per_second']:>10,.0f}")
+        if report["peak_rss_mb"] is not None:
+            print(f"{'peak RSS (MB):':<40}{report['peak_rss_mb']:>10,.1f}")
+        if report["peak_traced_mb"] is not None:
+            print(f"{'peak traced memory (MB):':<40}{report['peak_traced_mb']:>10,.1f}")
+
+class _Instrumentation:
+    """
+    Wraps the update methods of the indicators of a strategy (see Profiler.instrument).
+    """
+    def __init__(self, profiler : Profiler, strategy):
+        self.profiler = profiler
+        self.strategy = strategy
+        self.indicators = []
+
+    def __enter__(self):
+        for name, value in vars(self.strategy).items():
+            if (hasattr(value, "__dict__") and callable(getattr(type(value), "update", None))
+                    and "update" not in vars(value)):
+                value.update = self.profiler.timed(value.update, "indicator:" + name)
+                self.indicators.append(value)
+        return self
+
+    def __exit__(self, *exception):
+        for indicator in self.indicators:
+            del indicator.update
+        self.indicators = []
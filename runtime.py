@@ -0,0 +1,387 @@
+import asyncio
+import sys
+import time
+from collections import deque
+import numpy as np
+import pandas as pd
+from engine import execute_orders
+from strategies.strategy1 import Strategy
+from strategies.indicators.portfolio import Portfolio
+from strategies.indicators.order_book import OrderBook
+from strategies.indicators.utils import Candle
+
+def merge_bars(bars_by_ticker : dict):
+    """
+    Merges the bars of several tickers into one stream in time order.
+
+    Parameters
+    ----------
+    bars_by_ticker : dict
+        Contains pairs (ticker -> dict of arrays, see engine.get_bar_arrays).
+
+    Returns
+    -------
+    list of tuples
+        The bars (ticker, timestamp in ns, open, high, low, close, volume).
+        Bars with the same timestamp are ordered as the tickers.
+    """
+    tickers = list(bars_by_ticker)
+    timestamps = np.concatenate([np.asarray(bars["timestamp"], dtype="datetime64[ns]").view(np.int64)
+                                 for bars in bars_by_ticker.values()])
+    ticker_ids = np.concatenate([np.full(len(bars["close"]), i) for i, bars in enumerate(bars_by_ticker.values())])
+    values = {column : np.concatenate([np.asarray(bars[column], dtype=np.float64)
+                                       for bars in bars_by_ticker.values()]).tolist()
+              for column in ("open", "high", "low", "close", "volume")}
+    order = np.lexsort((ticker_ids, timestamps)).tolist()
+    timestamps, ticker_ids = timestamps.tolist(), ticker_ids.tolist()
+    return [(tickers[ticker_ids[i]], timestamps[i], values["open"][i], values["high"][i], values["low"][i],
+             values["close"][i], values["volume"][i]) for i in order]
+
+def encode_bar(bar : tuple):
+    """
+    Encodes a bar as a line of the replay protocol:
+        ticker,timestamp in ns,open,high,low,close,volume
+    The floats are written with repr, so they are decoded exactly.
+    """
+    return ",".join(map(repr, bar[1:])).join((bar[0] + ",", "\n")).encode()
+
+def decode_bar(line : bytes):
+    """
+    Decodes a line of the replay protocol into (ticker, Candle).
+    """
+    ticker, timestamp, open_price, high_price, low_price, close_price, volume = line.decode().split(",")
+    return ticker, Candle(timestamp=pd.Timestamp(int(timestamp)), open_price=float(open_price),
+                          high_price=float(high_price), low_price=float(low_price),
+                          close_price=float(close_price), volume=float(volume))
+
+class ReplayFeed:
+    """
+    Replays bars in process as an asynchronous stream.
+
+    Iterating the feed yields (ticker, Candle, receive time) tuples, the
+    receive time being time.perf_counter_ns when the bar was handed out.
+
+    Attributes
+    ----------
+    bars : list of tuples
+        The merged bars (see merge_bars).
+    rate : float or None
+        The number of bars per second. If None, as fast as they are consumed.
+    """
+    def __init__(self, bars_by_ticker : dict, rate : float = None):
+        self.bars = merge_bars(bars_by_ticker)
+        self.rate = rate
+
+    async def __aiter__(self):
+        start = time.perf_counter()
+        for i, (ticker, timestamp, open_price, high_price, low_price, close_price, volume) in enumerate(self.bars):
+            if self.rate is not None:
+                delay = start + i / self.rate - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            elif i % 256 == 0:
+                # Lets other tasks (e.g. other feeds) run.
+                await asyncio.sleep(0)
+            candle = Candle(timestamp=pd.Timestamp(timestamp), open_price=open_price, high_price=high_price,
+                            low_price=low_price, close_price=close_price, volume=volume)
+            yield ticker, candle, time.perf_counter_ns()
+
+class ReplayServer:
+    """
+    Serves bars over TCP in the replay protocol (see encode_bar).
+
+    It is a local stand-in for a market data socket: every client which
+    connects receives all bars in time order and then the connection is closed.
+
+    Attributes
+    ----------
+    bars : list of tuples
+        The merged bars (see merge_bars).
+    rate : float or None
+        The number of bars per second. If None, as fast as possible.
+    server : asyncio.Server or None
+        The running server.
+    """
+    def __init__(self, bars_by_ticker : dict, rate : float = None):
+        self.bars = merge_bars(bars_by_ticker)
+        self.rate = rate
+        self.server = None
+
+    async def start(self, host : str = "127.0.0.1", port : int = 0):
+        """
+        Starts listening.
+
+        Returns
+        -------
+        tuple
+            The host and the port of the server.
+        """
+        self.server = await asyncio.start_server(self._serve, host, port)
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def stop(self):
+        """
+        Stops listening.
+        """
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _serve(self, reader : asyncio.StreamReader, writer : asyncio.StreamWriter):
+        start = time.perf_counter()
+        batch = 1 if self.rate is not None else 1024
+        for i in range(0, len(self.bars), batch):
+            if self.rate is not None:
+                delay = start + i / self.rate - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            writer.write(b"".join(encode_bar(bar) for bar in self.bars[i:i + batch]))
+            await writer.drain()
+        writer.close()
+        await writer.wait_closed()
+
+class SocketFeed:
+    """
+    Reads bars in the replay protocol from a TCP connection.
+
+    Iterating the feed yields (ticker, Candle, receive time) tuples, the
+    receive time being time.perf_counter_ns when the line was read.
+
+    Attributes
+    ----------
+    host : str
+        The host of the server.
+    port : int
+        The port of the server.
+    """
+    def __init__(self, host : str, port : int):
+        self.host = host
+        self.port = port
+
+    async def __aiter__(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                received = time.perf_counter_ns()
+                ticker, candle = decode_bar(line)
+                yield ticker, candle, received
+        finally:
+            writer.close()
+            await writer.wait_closed()
+
+class PaperTradingRuntime:
+    """
+    Trades the bars of asynchronous feeds live against a paper portfolio.
+
+    Every bar is handled as soon as it arrives, in the same steps as the
+    simulation loop (see engine.run_bars): the pending orders of its ticker
+    are executed, the strategy of the ticker is updated, its orders are
+    placed and the portfolio is marked to market with the last price of
+    every ticker. Every ticker has its own strategy and order book, created
+    on its first bar, and all tickers share one portfolio.
+
+    As in simulate_panel, the portfolio records one value per time step: it
+    is marked to market with the last prices once the first bar of a later
+    time arrives (and when the feeds are exhausted), before the orders of
+    that bar are executed. So the cost of a bar does not grow with the
+    number of tickers.
+
+    The bar-to-order latency is the time from receiving a bar to having its
+    orders in the book. Only the latencies of the last max_latencies bars
+    are kept, so a long session does not grow without limit. Messages are not printed by the handler, they are
+    queued and written by a separate task, so printing never delays a bar.
+
+    Attributes
+    ----------
+    strategy_factory : callable
+        Creates the strategy of a ticker, called with the ticker.
+    portfolio : Portfolio
+        The live portfolio shared by all tickers.
+    strategies : dict
+        Contains pairs (ticker -> strategy).
+    order_books : dict
+        Contains pairs (ticker -> OrderBook).
+    previous_candles : dict
+        Contains pairs (ticker -> last Candle).
+    last_prices : dict
+        Contains pairs (ticker -> last close price).
+    current_timestamp : pandas.Timestamp or None
+        The latest time of a handled bar.
+    marked_timestamp : pandas.Timestamp or None
+        The time of the last value of the portfolio.
+    latencies : deque of int
+        The bar-to-order latencies of the last handled bars in ns.
+    number_of_bars : int
+        The total number of handled bars.
+    quiet : bool
+        If True, no messages are written.
+    messages : asyncio.Queue or None
+        The queue of the messages to be written while running.
+    """
+    def __init__(self, strategy_factory = None, portfolio : Portfolio = None, quiet : bool = True,
+                 max_latencies : int = 10000):
+        """
+        Initializes the runtime.
+
+        Parameters
+        ----------
+        strategy_factory : callable or None
+            Creates the strategy of a ticker, called with the ticker. If
+            None, a quiet Strategy with the default parameters is used.
+        portfolio : Portfolio or None
+            The live portfolio. If None, a Portfolio which keeps the last
+            10000 values is used. Its metrics cover all values.
+        quiet : bool
+            If True, no messages are written.
+        max_latencies : int
+            The number of the last latencies kept for the latency report.
+        """
+        if strategy_factory is None:
+            strategy_factory = lambda ticker: Strategy(quiet=True)
+        self.strategy_factory = strategy_factory
+        self.portfolio = portfolio if portfolio is not None else Portfolio(max_history=10000)
+        self.strategies = {}
+        self.order_books = {}
+        self.previous_candles = {}
+        self.last_prices = {}
+        self.current_timestamp = None
+        self.marked_timestamp = None
+        self.latencies = deque(maxlen=max_latencies)
+        self.number_of_bars = 0
+        self.quiet = quiet
+        self.messages = None
+        self._elapsed = 0.0
+
+    def handle_bar(self, ticker : str, candle : Candle, received : int = None):
+        """
+        Handles a single bar of a ticker.
+
+        Parameters
+        ----------
+        ticker : str
+            The ticker symbol of the bar.
+        candle : Candle
+            The bar.
+        received : int or None
+            The time.perf_counter_ns at which the bar was received. If None, now.
+
+        Returns
+        -------
+        orders : list of Order
+            The orders placed for the bar.
+        """
+        if received is None:
+            received = time.perf_counter_ns()
+        if self.current_timestamp is None or candle.timestamp > self.current_timestamp:
+            self.mark_to_market()
+            self.current_timestamp = candle.timestamp
+        strategy = self.strategies.get(ticker)
+        if strategy is None:
+            strategy = self.strategies[ticker] = self.strategy_factory(ticker)
+            self.order_books[ticker] = OrderBook()
+        order_book = self.order_books[ticker]
+
+        previous_candle = self.previous_candles.get(ticker)
+        if previous_candle is not None:
+            number_of_rejected = self.portfolio.number_of_rejected
+            executed_orders = execute_orders(ticker, previous_candle, candle, order_book, self.portfolio)
+            if self.messages is not None:
+                for order, price in executed_orders:
+                    self.messages.put_nowait(f"{candle.timestamp} {ticker}: {order.side} {order.quantity:.4f} "
+                                             f"({order.order_type}) at {price:.4f}")
+                if self.portfolio.number_of_rejected > number_of_rejected:
+                    self.messages.put_nowait(f"{candle.timestamp} {ticker}: "
+                                             f"{self.portfolio.number_of_rejected - number_of_rejected} "
+                                             f"buy order(s) rejected, not enough cash")
+
+        strategy.update(candle)
+        orders = strategy.get_orders(self.portfolio)
+        order_book.extend(orders)
+        self.latencies.append(time.perf_counter_ns() - received)
+        self.number_of_bars += 1
+
+        self.last_prices[ticker] = candle.close_price
+        self.previous_candles[ticker] = candle
+        return orders
+
+    def mark_to_market(self):
+        """
+        Records the value of the portfolio at the latest time, unless it was already recorded.
+        """
+        if self.current_timestamp is not None and self.marked_timestamp != self.current_timestamp:
+            self.portfolio.update_market_prices(self.last_prices, self.current_timestamp)
+            self.marked_timestamp = self.current_timestamp
+
+    async def _consume(self, feed):
+        async for ticker, candle, received in feed:
+            self.handle_bar(ticker, candle, received)
+
+    async def _write_messages(self):
+        """
+        Writes the queued messages in batches until cancelled.
+        """
+        while True:
+            lines = [await self.messages.get()]
+            while not self.messages.empty():
+                lines.append(self.messages.get_nowait())
+            sys.stdout.write("\n".join(lines) + "\n")
+
+    async def run(self, *feeds):
+        """
+        Trades the bars of all feeds until they are exhausted.
+
+        The feeds are consumed concurrently, each by its own task.
+
+        Parameters
+        ----------
+        *feeds : asynchronous iterables
+            The sources of (ticker, Candle, receive time) tuples, e.g.
+            ReplayFeed or SocketFeed.
+
+        Returns
+        -------
+        portfolio : Portfolio
+            The live portfolio.
+        """
+        writer = None
+        if not self.quiet:
+            self.messages = asyncio.Queue()
+            writer = asyncio.create_task(self._write_messages())
+        start = time.perf_counter()
+        try:
+            await asyncio.gather(*(self._consume(feed) for feed in feeds))
+        finally:
+            self.mark_to_market()
+            self._elapsed += time.perf_counter() - start
+            if writer is not None:
+                while not self.messages.empty():
+                    await asyncio.sleep(0)
+                writer.cancel()
+                self.messages = None
+        return self.portfolio
+
+    def get_latency_report(self):
+        """
+        Summarizes the bar-to-order latencies of the handled bars.
+
+        Returns
+        -------
+        report : dict
+            The number of all bars, the bars per second of the runs and the
+            p50, p99 and maximal latency of the last max_latencies bars in
+            microseconds.
+        """
+        if not self.latencies:
+            return {"bars" : self.number_of_bars, "bars_per_second" : 0.0,
+                    "p50_us" : 0.0, "p99_us" : 0.0, "max_us" : 0.0}
+        latencies = np.fromiter(self.latencies, dtype=np.float64, count=len(self.latencies)) / 1000
+        p50, p99 = np.percentile(latencies, [50, 99])
+        return {
+            "bars" : self.number_of_bars,
+            "bars_per_second" : self.number_of_bars / self._elapsed if self._elapsed > 0 else 0.0,
+            "p50_us" : float(p50),
+            "p99_us" : float(p99),
+            "max_us" : float(latencies.max()),
+        }
@@ -1,4 +1,9 @@
 from .ema_indicator import ExponentialMovingAverage
+from .sma_indicator import SimpleMovingAverage
+from .bar_buffer import BarBuffer
 from .utils import *
 from .portfolio import *
-from .force_index import *
\ No newline at end of file
+from .metrics import PerformanceMetrics
+from .trade_ledger import TradeLedger
+from .force_index import *
+from .order_book import OrderBook
\ No newline at end of file
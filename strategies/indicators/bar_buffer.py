@@ -0,0 +1,291 @@
+import numpy as np
+from .utils import Candle
+
+class BarBuffer:
+    """
+    Represents a columnar buffer of trading bars.
+
+    Every column (timestamp, open, high, low, close, volume) is kept in its
+    own NumPy array, so a strategy and all of its indicators can share a
+    single copy of the history and read it through zero-copy views.
+
+    If max_lookback is given, the columns are preallocated rings which hold
+    only the last max_lookback bars. Every value is written twice (at i and
+    at i + max_lookback), so the most recent bars are always a contiguous
+    slice of the array and can be returned as a view without copying.
+    Otherwise the columns are growable arrays with amortized doubling.
+
+    The views stay valid until the next append.
+
+    Attributes
+    ----------
+    COLUMNS : tuple of str
+        All supported columns.
+    columns : tuple of str
+        The tracked columns.
+    max_lookback : int or None
+        The maximal number of bars kept in the buffer.
+    number_of_bars : int
+        The total number of bars appended so far.
+    arrays : dict
+        Contains pairs (column -> underlying array).
+    """
+    COLUMNS = ("timestamp", "open", "high", "low", "close", "volume")
+
+    def __init__(self, max_lookback : int = None, columns : tuple[str] = COLUMNS,
+                 capacity : int = 1024):
+        """
+        Initializes the buffer.
+
+        Parameters
+        ----------
+        max_lookback : int or None
+            The maximal number of bars kept in the buffer.
+            If None, all bars are kept.
+        columns : tuple of str
+            The columns to be tracked.
+        capacity : int
+            The initial capacity of the growable arrays.
+
+        Raises
+        ------
+        ValueError
+            If the lookback is not positive or a column is not supported.
+        """
+        if max_lookback is not None and max_lookback <= 0:
+            raise ValueError("The lookback of the bar buffer must be positive")
+        for column in columns:
+            if column not in self.COLUMNS:
+                raise ValueError("Unsupported bar column: " + str(column))
+
+        self.columns = tuple(columns)
+        # Pairs (column, position of its value in the arguments of append).
+        self._fields = tuple((column, self.COLUMNS.index(column)) for column in self.columns)
+        self.max_lookback = max_lookback
+        self.number_of_bars = 0
+
+        size = 2 * max_lookback if max_lookback is not None else capacity
+        self.arrays = {column : np.empty(size, dtype=self._get_dtype(column))
+                       for column in self.columns}
+
+    @staticmethod
+    def _get_dtype(column : str):
+        if column == "timestamp":
+            return "datetime64[ns]"
+        return np.float64
+
+    @staticmethod
+    def _to_datetime64(timestamp):
+        """
+        Converts a timestamp once, so that it is cheap to write into the arrays.
+        """
+        if timestamp is None:
+            return np.datetime64("NaT")
+        if hasattr(timestamp, "value"): # pandas.Timestamp
+            return np.datetime64(timestamp.value, "ns")
+        return np.datetime64(timestamp, "ns")
+
+    def __len__(self):
+        """
+        Returns the number of bars available in the buffer.
+        """
+        if self.max_lookback is None:
+            return self.number_of_bars
+        return min(self.number_of_bars, self.max_lookback)
+
+    def _grow(self, capacity : int = None):
+        """
+        Doubles the capacity of the growable arrays, or grows them to the given capacity.
+        """
+        for column in self.columns:
+            array = self.arrays[column]
+            new_array = np.empty(capacity if capacity is not None else max(1, 2 * len(array)),
+                                 dtype=array.dtype)
+            new_array[:self.number_of_bars] = array[:self.number_of_bars]
+            self.arrays[column] = new_array
+
+    def reserve(self, capacity : int):
+        """
+        Preallocates the growable arrays for a known number of bars.
+
+        Parameters
+        ----------
+        capacity : int
+            The total number of bars the arrays should hold without growing.
+            It has no effect on a buffer with a max_lookback.
+
+        Returns
+        -------
+        None
+        """
+        if self.max_lookback is None and capacity > len(self.arrays[self.columns[0]]):
+            self._grow(capacity)
+
+    def set_max_lookback(self, max_lookback : int):
+        """
+        Changes the number of bars kept by an empty ring buffer.
+
+        Parameters
+        ----------
+        max_lookback : int
+            The new maximal number of bars kept in the buffer.
+
+        Raises
+        ------
+        ValueError
+            If the lookback is not positive, the buffer is growable or bars
+            were already appended.
+
+        Returns
+        -------
+        None
+        """
+        if max_lookback <= 0:
+            raise ValueError("The lookback of the bar buffer must be positive")
+        if self.max_lookback is None or self.number_of_bars > 0:
+            raise ValueError("The lookback can only be changed for an empty ring buffer")
+        self.max_lookback = max_lookback
+        self.arrays = {column : np.empty(2 * max_lookback, dtype=self._get_dtype(column))
+                       for column in self.columns}
+
+    def append(self, timestamp = None, open_price : float = None, high_price : float = None,
+               low_price : float = None, close_price : float = None, volume : float = None):
+        """
+        Appends a single bar to the buffer.
+
+        Only the values of the tracked columns are used.
+
+        Parameters
+        ----------
+        timestamp : datetime
+            The time at which the bar is recorded.
+        open_price : float
+            The opening price of the bar.
+        high_price : float
+            The highest price of the bar.
+        low_price : float
+            The lowest price of the bar.
+        close_price : float
+            The closing price of the bar.
+        volume : float
+            The trading volume of the bar.
+
+        Returns
+        -------
+        None
+        """
+        values = (timestamp, open_price, high_price, low_price, close_price, volume)
+
+        if self.max_lookback is None:
+            if self.number_of_bars == len(self.arrays[self.columns[0]]):
+                self._grow()
+            position = self.number_of_bars
+            mirror = None
+        else:
+            position = self.number_of_bars % self.max_lookback
+            mirror = position + self.max_lookback
+
+        arrays = self.arrays
+        for column, field in self._fields:
+            value = values[field]
+            if field == 0:
+                value = self._to_datetime64(value)
+            array = arrays[column]
+            array[position] = value
+            if mirror is not None:
+                array[mirror] = value
+
+        self.number_of_bars += 1
+
+    def append_candle(self, candle : Candle):
+        """
+        Appends the data of a candlestick to the buffer.
+
+        Parameters
+        ----------
+        candle : Candle
+            The latest candlestick.
+
+        Returns
+        -------
+        None
+        """
+        self.append(candle.timestamp if "timestamp" in self.columns else None,
+                    candle.open_price, candle.high_price, candle.low_price,
+                    candle.close_price, candle.volume)
+
+    def get(self, column : str, n : int = None):
+        """
+        Returns a zero-copy view of the last n values of a column.
+
+        Parameters
+        ----------
+        column : str
+            The requested column.
+        n : int or None
+            The number of bars. If None, all available bars are returned.
+
+        Raises
+        ------
+        ValueError
+            If more bars are requested than available.
+
+        Returns
+        -------
+        numpy.ndarray
+            A view of the values, the last one being the most recent.
+        """
+        available = len(self)
+        if n is None:
+            n = available
+        elif n > available:
+            raise ValueError(f"Requested {n} bars, but only {available} are available")
+
+        if self.max_lookback is None:
+            end = self.number_of_bars
+        else:
+            end = (self.number_of_bars - 1) % self.max_lookback + 1 + self.max_lookback
+        return self.arrays[column][end - n:end]
+
+    @property
+    def timestamp(self):
+        return self.get("timestamp")
+
+    @property
+    def open(self):
+        return self.get("open")
+
+    @property
+    def high(self):
+        return self.get("high")
+
+    @property
+    def low(self):
+        return self.get("low")
+
+    @property
+    def close(self):
+        return self.get("close")
+
+    @property
+    def volume(self):
+        return self.get("volume")
+
+    def get_candle(self, index : int = -1):
+        """
+        Builds a Candle from a bar in the buffer.
+
+        Parameters
+        ----------
+        index : int
+            The index of the bar among the available bars.
+
+        Returns
+        -------
+        Candle
+            The requested candlestick.
+        """
+        values = {column : self.get(column)[index] for column in self.columns}
+        return Candle(timestamp=values.get("timestamp"), open_price=values.get("open"),
+                      high_price=values.get("high"), low_price=values.get("low"),
+                      close_price=values.get("close"), volume=values.get("volume"))
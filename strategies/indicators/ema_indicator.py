@@ -1,20 +1,53 @@
+from collections import deque
+import numpy as np
 from .utils import Candle
 from .utils import newton_raphson
+from .utils import to_array, exponential_filter, decay_length
+from .bar_buffer import BarBuffer
 
 class ExponentialMovingAverage:
     """
     Represents an Exponential Moving Average Indicator.
 
+    Two modes of calculation are supported:
+        1. "recursive" - the true EMA, which keeps a single value per period:
+            EMA_t = EMA_(t-1) + alpha * (x_t - EMA_(t-1))
+        Each update costs O(number of periods) regardless of their lengths.
+        2. "window" - the original calculation, which folds the last N values
+        on every bar and normalizes by (1 - (1 - alpha) ** N).
+        Each update costs O(sum of periods).
+
+    The update is meant for streaming the bars one by one. The whole series
+    can be calculated at once with ExponentialMovingAverage.batch.
+
     Attributes
     ----------
-    values : list of floats
-        Contains the values tracked by the EMA.
+    bars : BarBuffer
+        The buffer from which the close prices are read. It is either shared
+        with the strategy or owned by the indicator.
+    owns_bars : bool
+        Whether the buffer is owned by the indicator.
+    lookback : int
+        The number of bars needed by the indicator. In the recursive mode
+        with warm-up they are only needed during the first max(periods) bars.
     periods : list of integers
         A list containing the periods to be tracked.
+    mode : str
+        Either "recursive" or "window".
+    warm_up : bool
+        If True, the recursive EMA reproduces the window calculation for the
+        first N bars (bias correction) and is seeded by it.
+        If False, the recursive EMA is seeded with the first value.
+    max_history : int or None
+        The maximal number of values kept in ema_history per period.
+        If None, the whole history is kept.
+    ema : dict
+        Contains pairs with tracked period and the latest ema (period -> float).
     ema_history : dict
-        Contains pairs with tracked period and ema history (period -> list of ema-s)
+        Contains pairs with tracked period and ema history (period -> deque of ema-s)
     """
-    def __init__(self, periods : list[int]):
+    def __init__(self, periods : list[int], mode : str = "recursive",
+                 warm_up : bool = True, max_history : int = None, bars : BarBuffer = None):
         """
         Initializes the EMA.
 
@@ -22,13 +55,66 @@ class ExponentialMovingAverage:
         ----------
         periods : list of integers
             A list containing the periods of EMA to be tracked.
+        mode : str
+            Either "recursive" (constant state per period) or "window".
+        warm_up : bool
+            Whether the recursive EMA is bias corrected for the first N bars.
+        max_history : int or None
+            The maximal number of values kept in ema_history per period.
+        bars : BarBuffer or None
+            A shared buffer with the bars. If None, the indicator keeps
+            its own buffer with the last lookback close prices.
+
+        Raises
+        ------
+        ValueError
+            If the mode is not supported or the shared buffer is too short.
         """
-        self.values = []
+        if mode not in ("recursive", "window"):
+            raise ValueError("Unsupported EMA mode: " + str(mode))
+
         self.periods = periods
+        self.mode = mode
+        self.warm_up = warm_up
+        self.max_history = max_history
+        self.number_of_values = 0
+
+        self.lookback = max(periods) if mode == "window" or warm_up else 1
+        self.owns_bars = bars is None
+        if self.owns_bars:
+            bars = BarBuffer(max_lookback=self.lookback, columns=("close",))
+        elif bars.max_lookback is not None and bars.max_lookback < self.lookback:
+            raise ValueError(f"The EMA needs a lookback of at least {self.lookback} bars")
+        self.bars = bars
+
+        self.ema = {period : None for period in self.periods}
+        self.ema_history = {period : deque(maxlen=max_history) for period in self.periods}
+
+    @staticmethod
+    def _window_ema(values, window : int):
+        """
+        Calculates the normalized EMA over the last window values.
 
-        self.ema_history = {period : [] for period in self.periods}
+        Parameters
+        ----------
+        values : numpy.ndarray
+            The last window values, the last one being the most recent.
+        window : int
+            The number of values to be folded.
 
-    def update(self, value : float):
+        Returns
+        -------
+        float
+            The value of the EMA.
+        """
+        alpha = 2.0 / (window + 1)
+        new_ema = 0
+        for value in values:
+            new_ema = new_ema * (1 - alpha) + alpha * value
+
+        return float(new_ema / (1 - (1 - alpha) ** (window)))
+
+    def update(self, candlestick : Candle = None):
         """
         Updates the EMA-s for all tracked periods.
 
@@ -38,22 +124,148 @@ class ExponentialMovingAverage:
 
         Parameters
         ----------
-        candlestick : Candle
-            The latest added candlestick.
-            
+        candlestick : Candle or None
+            The latest added candlestick. It is appended to the buffer.
+            If the buffer is shared, its owner appends the bar and
+            the update is called without a candlestick.
+
         Returns
         -------
         None
         """
-        
-        self.values.append(value)
+        if candlestick is not None:
+            self.bars.append_candle(candlestick)
+        closes = self.bars.get("close", min(self.lookback, self.number_of_values + 1))
+        value = float(closes[-1])
+        self.number_of_values += 1
+
         for period in self.periods:
-            window = min(period, len(self.values))
-            alpha =  2.0 / (window + 1)
-            new_ema = 0
-            for i in range(-window, 0):               
-                new_ema = new_ema * (1 - alpha) + alpha * self.values[i]
-            
-            new_ema = new_ema / (1 - (1 - alpha) ** (window))
+            if self.mode == "window":
+                window = min(period, self.number_of_values)
+                new_ema = self._window_ema(closes[-window:], window)
+            elif self.ema[period] is None:
+                new_ema = value
+            elif self.warm_up and self.number_of_values <= period:
+                new_ema = self._window_ema(closes[-self.number_of_values:], self.number_of_values)
+            else:
+                alpha = 2.0 / (period + 1)
+                new_ema = self.ema[period] + alpha * (value - self.ema[period])
+
+            self.ema[period] = new_ema
             self.ema_history[period].append(new_ema)
-        
+
+    @staticmethod
+    def _window_ema_batch(values, length : int, block : int = 256):
+        """
+        Calculates the normalized EMA-s over the first 1, 2, ..., length values.
+
+        The EMA over the first w values uses alpha = 2 / (w + 1), as in
+        _window_ema. The EMA-s of a block of windows are the rows of one
+        triangular matrix product.
+
+        Parameters
+        ----------
+        values : numpy.ndarray
+            The values, the first one being the oldest.
+        length : int
+            The number of EMA-s to be calculated.
+        block : int
+            The number of EMA-s calculated from one matrix.
+
+        Returns
+        -------
+        numpy.ndarray
+            The value of the EMA over the first w values at index w - 1.
+        """
+        result = np.empty(length, dtype=np.float64)
+        for start in range(0, length, block):
+            windows = np.arange(start + 1, min(start + block, length) + 1)
+            decays = 1 - 2.0 / (windows + 1)
+            ages = windows[:, None] - np.arange(1, windows[-1] + 1)[None, :]
+            weights = np.where(ages >= 0, decays[:, None] ** np.maximum(ages, 0), 0.0)
+            result[start:start + len(windows)] = ((1 - decays) * (weights @ values[:windows[-1]]) /
+                                                  (1 - decays ** windows))
+        return result
+
+    @staticmethod
+    def batch(data, periods : list[int], mode : str = "recursive", warm_up : bool = True):
+        """
+        Calculates the EMA-s for the whole series in one vectorized pass.
+
+        The result matches the one of feeding the bars to update() one by one
+        up to a relative tolerance of 1e-9.
+
+        Parameters
+        ----------
+        data : numpy.ndarray or pandas.DataFrame
+            Either the close prices or an OHLCV dataframe with a Close column.
+        periods : list of integers
+            A list containing the periods of EMA to be calculated.
+        mode : str
+            Either "recursive" or "window".
+        warm_up : bool
+            Whether the recursive EMA is bias corrected for the first N bars.
+
+        Raises
+        ------
+        ValueError
+            If the mode is not supported.
+
+        Returns
+        -------
+        ema_history : dict
+            Contains pairs (period -> numpy.ndarray of ema-s).
+        """
+        if mode not in ("recursive", "window"):
+            raise ValueError("Unsupported EMA mode: " + str(mode))
+
+        closes = to_array(data, "Close")
+        ema_history = {}
+        for period in periods:
+            ema = np.empty(len(closes), dtype=np.float64)
+            if len(closes) == 0:
+                ema_history[period] = ema
+                continue
+
+            warm_up_length = min(period, len(closes)) if mode == "window" or warm_up else 1
+            ema[:warm_up_length] = ExponentialMovingAverage._window_ema_batch(closes, warm_up_length)
+
+            alpha = 2.0 / (period + 1)
+            if mode == "window":
+                if len(closes) > period:
+                    kernel = alpha * (1 - alpha) ** np.arange(0, period) / (1 - (1 - alpha) ** period)
+                    ema[period:] = np.convolve(closes, kernel, mode="valid")[1:]
+            else:
+                ema[warm_up_length:] = exponential_filter(closes[warm_up_length:], alpha,
+                                                          ema[warm_up_length - 1])
+            ema_history[period] = ema
+
+        return ema_history
+
+    @staticmethod
+    def batch_lookback(periods : list[int], mode : str = "recursive", warm_up : bool = True,
+                       tolerance : float = 1e-12):
+        """
+        Returns the number of bars before a position which batch needs to
+        calculate the values from that position on.
+
+        The window mode only reads the last N bars, so the values are
+        exact. In the recursive mode the influence of the skipped bars
+        decays by (1 - alpha) per bar, so the values match up to the
+        relative tolerance.
+
+        Parameters
+        ----------
+        periods, mode, warm_up
+            The arguments of batch.
+        tolerance : float
+            The tolerated relative error of the recursive mode.
+
+        Returns
+        -------
+        int
+            The number of preceding bars.
+        """
+        if mode == "window":
+            return max(periods)
+        return max(period + decay_length(2.0 / (period + 1), tolerance) for period in periods)
@@ -1,4 +1,7 @@
+import numpy as np
 from .utils import Candle
+from .utils import to_array
+from .bar_buffer import BarBuffer
 
 class ForceIndex:
     """
@@ -10,22 +13,46 @@ class ForceIndex:
     and the volume (which represents the behaviour of the masses and their
     sentiment to the stock).
 
+    The whole series can be calculated at once with ForceIndex.batch.
+
     Attributes
     ----------
-    self.candlesticks : list of Candles
-        Contains the historical data of a stock.
+    self.bars : BarBuffer
+        The buffer from which the close prices and volumes are read. It is
+        either shared with the strategy or owned by the indicator.
+    self.owns_bars : bool
+        Whether the buffer is owned by the indicator.
+    self.lookback : int
+        The number of bars needed by the indicator.
     self.fi_history : list of double
         Contains the values of the Force Index for each trading bar.
     """
-    def __init__(self):
+    def __init__(self, bars : BarBuffer = None):
         """
         Initializes the class.
+
+        Parameters
+        ----------
+        bars : BarBuffer or None
+            A shared buffer with the bars. If None, the indicator keeps
+            its own buffer with the last two bars.
+
+        Raises
+        ------
+        ValueError
+            If the shared buffer is too short.
         """
 
-        self.candlesticks = []
+        self.lookback = 2
+        self.owns_bars = bars is None
+        if self.owns_bars:
+            bars = BarBuffer(max_lookback=self.lookback, columns=("close", "volume"))
+        elif bars.max_lookback is not None and bars.max_lookback < self.lookback:
+            raise ValueError(f"The Force Index needs a lookback of at least {self.lookback} bars")
+        self.bars = bars
         self.fi_history = []
 
-    def update(self, candle : Candle):
+    def update(self, candle : Candle = None):
         """
         Updates the Force Index.
 
@@ -34,15 +61,47 @@ class ForceIndex:
 
         Parameters
         ----------
-        candle : Candle
+        candle : Candle or None
             An object containing the data for the most recent trading bar.
+            It is appended to the buffer. If the buffer is shared, its owner
+            appends the bar and the update is called without a candle.
         """
-        
-        if self.candlesticks:
-            delta_price = candle.close_price - self.candlesticks[-1].close_price
-            self.fi_history.append(delta_price * candle.volume) # Appends Force Index Value
+        if candle is not None:
+            self.bars.append_candle(candle)
 
-        self.candlesticks.append(candle)
+        if len(self.bars) >= 2:
+            closes = self.bars.get("close", 2)
+            delta_price = closes[1] - closes[0]
+            self.fi_history.append(float(delta_price * self.bars.get("volume", 1)[0])) # Appends Force Index Value
 
+    @staticmethod
+    def batch(data, volume = None):
+        """
+        Calculates the Force Index for the whole series in one vectorized pass.
 
+        The result matches the one of feeding the bars to update() one by one
+        up to a relative tolerance of 1e-9.
 
+        Parameters
+        ----------
+        data : numpy.ndarray or pandas.DataFrame
+            Either the close prices or an OHLCV dataframe with Close and Volume columns.
+        volume : numpy.ndarray or None
+            The volumes. Required if data contains only the close prices.
+
+        Returns
+        -------
+        fi_history : numpy.ndarray
+            The values of the Force Index starting from the second bar.
+        """
+        closes = to_array(data, "Close")
+        volumes = to_array(data if volume is None else volume, "Volume")
+        return np.diff(closes) * volumes[1:]
+
+    @staticmethod
+    def batch_lookback():
+        """
+        Returns the number of bars before a position which batch needs to
+        calculate the values from that position on: the previous close price.
+        """
+        return 1
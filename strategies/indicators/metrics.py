@@ -0,0 +1,178 @@
+import math
+import pandas as pd
+
+class PerformanceMetrics:
+    """
+    Accumulates the performance metrics of an equity curve online.
+
+    Every recorded value updates O(1) state, so all metrics can be read at
+    any time during a run without keeping the equity curve:
+        1. the mean and variance of the returns (Welford's algorithm).
+        2. the downside variance - the mean of min(return, 0) ** 2.
+        3. the running peak and the maximal drawdown from it.
+    The returns are the relative changes between consecutive values. The
+    ratios are annualized with periods_per_year and a zero risk-free rate.
+
+    Attributes
+    ----------
+    initial_value : float
+        The value before the first recorded one (e.g. the initial cash).
+    periods_per_year : float
+        The number of returns per year used for annualization.
+    number_of_values : int
+        The number of recorded values.
+    number_of_returns : int
+        The number of recorded returns.
+    mean_return : float
+        The mean of the returns.
+    squared_deviations : float
+        The sum of squared deviations of the returns from their mean.
+    downside_squares : float
+        The sum of the squares of the negative returns.
+    last_value : float or None
+        The last recorded value.
+    peak : float or None
+        The highest recorded value.
+    max_drawdown : float
+        The largest relative drop from a peak, as a fraction.
+    start_date : datetime or None
+        The date of the first recorded value.
+    last_date : datetime or None
+        The date of the last recorded value.
+    """
+    def __init__(self, initial_value : float, periods_per_year : float = 252):
+        """
+        Initializes the metrics.
+
+        Parameters
+        ----------
+        initial_value : float
+            The value before the first recorded one (e.g. the initial cash).
+        periods_per_year : float
+            The number of returns per year used for annualization.
+        """
+        self.initial_value = initial_value
+        self.periods_per_year = periods_per_year
+        self.number_of_values = 0
+        self.number_of_returns = 0
+        self.mean_return = 0.0
+        self.squared_deviations = 0.0
+        self.downside_squares = 0.0
+        self.last_value = None
+        self.peak = None
+        self.max_drawdown = 0.0
+        self.start_date = None
+        self.last_date = None
+
+    def update(self, value : float, timestamp = None):
+        """
+        Records the next value of the equity curve.
+
+        Parameters
+        ----------
+        value : float
+            The total value of the portfolio.
+        timestamp : datetime or None
+            The time of the value.
+
+        Returns
+        -------
+        None
+        """
+        if self.last_value is not None:
+            current_return = value / self.last_value - 1.0
+            self.number_of_returns += 1
+            delta = current_return - self.mean_return
+            self.mean_return += delta / self.number_of_returns
+            self.squared_deviations += delta * (current_return - self.mean_return)
+            if current_return < 0:
+                self.downside_squares += current_return * current_return
+
+        if self.peak is None or value > self.peak:
+            self.peak = value
+        elif self.peak > 0:
+            self.max_drawdown = max(self.max_drawdown, 1.0 - value / self.peak)
+
+        if self.start_date is None:
+            self.start_date = timestamp
+        self.last_date = timestamp
+        self.last_value = value
+        self.number_of_values += 1
+
+    def get_total_return(self):
+        """
+        Returns the total return in percent.
+        """
+        if self.last_value is None:
+            return 0.0
+        return (self.last_value / self.initial_value - 1) * 100
+
+    def get_cagr(self):
+        """
+        Returns the compound annual growth rate in percent (see Portfolio.get_cagr).
+        """
+        if self.last_value is None:
+            return 0.0
+        number_of_days = (pd.Timestamp(self.last_date) - pd.Timestamp(self.start_date)).days + 1
+        number_of_years = number_of_days / 365.25
+        return ((self.last_value / self.initial_value) ** (1.0 / number_of_years) - 1) * 100
+
+    def get_volatility(self):
+        """
+        Returns the annualized standard deviation of the returns in percent.
+        """
+        if self.number_of_returns < 2:
+            return 0.0
+        variance = self.squared_deviations / (self.number_of_returns - 1)
+        return math.sqrt(variance * self.periods_per_year) * 100
+
+    def get_sharpe_ratio(self):
+        """
+        Returns the annualized Sharpe ratio (mean return / standard deviation).
+        """
+        if self.number_of_returns < 2 or self.squared_deviations <= 0:
+            return 0.0
+        std = math.sqrt(self.squared_deviations / (self.number_of_returns - 1))
+        return self.mean_return / std * math.sqrt(self.periods_per_year)
+
+    def get_sortino_ratio(self):
+        """
+        Returns the annualized Sortino ratio (mean return / downside deviation).
+        """
+        if self.number_of_returns == 0 or self.downside_squares <= 0:
+            return 0.0
+        downside_deviation = math.sqrt(self.downside_squares / self.number_of_returns)
+        return self.mean_return / downside_deviation * math.sqrt(self.periods_per_year)
+
+    def get_max_drawdown(self):
+        """
+        Returns the maximal drawdown in percent.
+        """
+        return self.max_drawdown * 100
+
+    def get_calmar_ratio(self):
+        """
+        Returns the Calmar ratio (CAGR / maximal drawdown).
+        """
+        if self.max_drawdown <= 0:
+            return 0.0
+        return self.get_cagr() / self.get_max_drawdown()
+
+    def get_metrics(self):
+        """
+        Returns all metrics.
+
+        Returns
+        -------
+        metrics : dict
+            Contains pairs (metric name -> value).
+        """
+        return {
+            "total_return" : self.get_total_return(),
+            "cagr" : self.get_cagr(),
+            "volatility" : self.get_volatility(),
+            "sharpe_ratio" : self.get_sharpe_ratio(),
+            "sortino_ratio" : self.get_sortino_ratio(),
+            "max_drawdown" : self.get_max_drawdown(),
+            "calmar_ratio" : self.get_calmar_ratio(),
+        }
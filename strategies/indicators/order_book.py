@@ -0,0 +1,472 @@
+from bisect import bisect_left, bisect_right, insort
+from .utils import Order, Candle
+
+class OrderGroup:
+    """
+    Represents a group of orders which block each other (e.g. an OCO pair).
+
+    Lifecycle of a group:
+        1. "open" - none of its orders is resolved.
+        2. "resolving" - some of its orders are resolved, others are pending.
+        3. "filled" or "cancelled" - all of its orders are resolved and at
+        least one / none of them was executed. The group is then freed.
+
+    Attributes
+    ----------
+    group_id : int
+        The unique id of the group.
+    indexes : set of int
+        The indexes of the orders in the group, including indexes which are
+        referenced in a blocking_index but not yet added.
+    resolved_indexes : set of int
+        The indexes of the executed or cancelled orders of the group.
+    number_of_pending : int
+        The number of pending orders in the group.
+    state : str
+        The state of the group.
+    filled : bool
+        Whether an order of the group was executed.
+    """
+    def __init__(self, group_id : int):
+        self.group_id = group_id
+        self.indexes = set()
+        self.resolved_indexes = set()
+        self.number_of_pending = 0
+        self.state = "open"
+        self.filled = False
+
+class OrderGroupRegistry:
+    """
+    Keeps track of the open order groups.
+
+    An order joins the group of the indexes in its blocking_index. If they
+    belong to different groups, the groups are merged. A group is freed once
+    all of its orders are resolved, so the memory is O(open groups) instead
+    of O(all orders ever placed).
+
+    Since freed groups are forgotten, a blocking_index should only refer to
+    orders of the same group or of groups which are still open. The index of
+    a freed group is treated as not resolved.
+
+    Attributes
+    ----------
+    number_of_groups : int
+        The number of groups created so far. It is used as the group id.
+    groups : dict
+        Contains pairs (group id -> open OrderGroup).
+    index_to_group : dict
+        Contains pairs (order index -> group id) for the open groups.
+    number_of_filled : int
+        The number of freed groups with an executed order.
+    number_of_cancelled : int
+        The number of freed groups without an executed order.
+    """
+    def __init__(self):
+        self.number_of_groups = 0
+        self.groups = {}
+        self.index_to_group = {}
+        self.number_of_filled = 0
+        self.number_of_cancelled = 0
+
+    def __len__(self):
+        """
+        Returns the number of open groups.
+        """
+        return len(self.groups)
+
+    def _merge(self, group : OrderGroup, other : OrderGroup):
+        """
+        Moves all orders of the other group into the group.
+        """
+        for index in other.indexes:
+            self.index_to_group[index] = group.group_id
+        group.indexes |= other.indexes
+        group.resolved_indexes |= other.resolved_indexes
+        group.number_of_pending += other.number_of_pending
+        group.filled = group.filled or other.filled
+        if group.resolved_indexes:
+            group.state = "resolving"
+        del self.groups[other.group_id]
+
+    def register(self, order : Order):
+        """
+        Adds a pending order to its group.
+
+        Parameters
+        ----------
+        order : Order
+            The added order.
+
+        Returns
+        -------
+        OrderGroup
+            The group of the order.
+        """
+        group = None
+        for index in [order.order_index] + list(order.blocking_index):
+            group_id = self.index_to_group.get(index)
+            if group_id is None:
+                continue
+            if group is None:
+                group = self.groups[group_id]
+            elif group_id != group.group_id:
+                self._merge(group, self.groups[group_id])
+
+        if group is None:
+            group = OrderGroup(self.number_of_groups)
+            self.number_of_groups += 1
+            self.groups[group.group_id] = group
+
+        for index in [order.order_index] + list(order.blocking_index):
+            if index not in group.indexes:
+                group.indexes.add(index)
+                self.index_to_group[index] = group.group_id
+        group.number_of_pending += 1
+        return group
+
+    def get_group_id(self, index : int):
+        """
+        Returns the id of the open group of the order with the given index, or -1 if there is none.
+        """
+        return self.index_to_group.get(index, -1)
+
+    def is_resolved(self, index : int):
+        """
+        Checks whether the order with the given index is resolved.
+        """
+        group_id = self.index_to_group.get(index)
+        return group_id is not None and index in self.groups[group_id].resolved_indexes
+
+    def resolve(self, order : Order, filled : bool):
+        """
+        Marks a pending order as executed or cancelled.
+
+        The group is freed once all of its orders are resolved.
+
+        Parameters
+        ----------
+        order : Order
+            The resolved order.
+        filled : bool
+            Whether the order was executed.
+
+        Returns
+        -------
+        None
+        """
+        group = self.groups[self.index_to_group[order.order_index]]
+        group.resolved_indexes.add(order.order_index)
+        group.number_of_pending -= 1
+        group.filled = group.filled or filled
+        group.state = "resolving"
+
+        if group.number_of_pending == 0:
+            group.state = "filled" if group.filled else "cancelled"
+            if group.filled:
+                self.number_of_filled += 1
+            else:
+                self.number_of_cancelled += 1
+            for index in group.indexes:
+                del self.index_to_group[index]
+            del self.groups[group.group_id]
+
+class OrderBook:
+    """
+    Represents the book of pending orders.
+
+    The resting orders are indexed by type, side and price, so that on each
+    bar only the orders whose trigger price is inside the range of the bar
+    are visited:
+        1. market orders - always triggered at the open of the next bar.
+        2. buy limit orders - sorted by price, triggered if Low < price.
+        3. sell limit orders - sorted by price, triggered if High > price.
+        4. stop orders - sorted by stop price, triggered if the stop price
+        was crossed between the previous and the current bar.
+
+    The priority of an order is the order in which it was added. Triggered
+    orders are executed in a decreasing priority.
+
+    An order is cancelled once any order in its blocking_index is resolved
+    (executed or cancelled). The orders which block each other form a group
+    (e.g. the stop loss and the take profit of a position). When an order is
+    resolved, the orders it blocks are cancelled at once through a reverse
+    index, instead of checking every order on every bar. The groups are kept
+    in a registry, which frees them once all of their orders are resolved.
+
+    A cancelled order counts as resolved, so the orders blocked by it are
+    cancelled right away as well. The stop loss and take profit of an entry
+    (the orders with its index as parent_index) are cancelled with it, e.g.
+    when the entry is rejected for lack of cash.
+
+    Attributes
+    ----------
+    number_of_added : int
+        The number of orders added so far. It is used as the priority.
+    pending : dict
+        Contains pairs (priority -> pending order).
+    market_orders : list of int
+        The priorities of the pending market orders.
+    buy_limits : list of tuples
+        Sorted pairs (price, priority) of the pending buy limit orders.
+    sell_limits : list of tuples
+        Sorted pairs (price, priority) of the pending sell limit orders.
+    stops : list of tuples
+        Sorted pairs (stop price, priority) of the pending stop orders.
+    blocked_by : dict
+        Contains pairs (order index -> set of priorities of the pending orders it blocks).
+    children : dict
+        Contains pairs (order index -> set of priorities of the pending orders
+        with it as parent_index) for the pending entries.
+    groups : OrderGroupRegistry
+        The registry of the open order groups.
+    """
+    def __init__(self):
+        """
+        Initializes an empty order book.
+        """
+        self.number_of_added = 0
+        self.pending = {}
+        self.market_orders = []
+        self.buy_limits = []
+        self.sell_limits = []
+        self.stops = []
+        self.blocked_by = {}
+        self.children = {}
+        self.groups = OrderGroupRegistry()
+
+    def __len__(self):
+        """
+        Returns the number of pending orders.
+        """
+        return len(self.pending)
+
+    def _get_price_level(self, order : Order, priority : int):
+        """
+        Finds the sorted list and the key under which an order is indexed.
+
+        Returns
+        -------
+        tuple
+            The sorted list (None for market orders) and the key.
+
+        Raises
+        ------
+        ValueError
+            If the order type is not supported.
+        """
+        if order.order_type == "market":
+            return None, priority
+        if order.order_type == "limit":
+            if order.side == "buy":
+                return self.buy_limits, (order.price, priority)
+            return self.sell_limits, (order.price, priority)
+        if order.order_type == "stop":
+            return self.stops, (order.stop_price, priority)
+        raise ValueError("Unsupported order type: " + str(order.order_type))
+
+    def add(self, order : Order):
+        """
+        Adds an order to the book.
+
+        If an order in its blocking_index is already resolved, the order
+        is cancelled right away.
+
+        Parameters
+        ----------
+        order : Order
+            The order to be added.
+
+        Returns
+        -------
+        None
+        """
+        priority = self.number_of_added
+        self.number_of_added += 1
+        price_level, key = self._get_price_level(order, priority)
+        self.groups.register(order)
+
+        for index in order.blocking_index:
+            if self.groups.is_resolved(index):
+                self.groups.resolve(order, filled=False)
+                self._cancel_blocked(order.order_index)
+                return
+
+        self.pending[priority] = order
+        if price_level is None:
+            self.market_orders.append(priority)
+        else:
+            insort(price_level, key)
+        for index in order.blocking_index:
+            self.blocked_by.setdefault(index, set()).add(priority)
+        if order.parent_index is not None:
+            self.children.setdefault(order.parent_index, set()).add(priority)
+
+    def extend(self, orders : list[Order]):
+        """
+        Adds orders to the book in a decreasing priority.
+        """
+        for order in orders:
+            self.add(order)
+
+    def get_orders(self):
+        """
+        Returns the pending orders in a decreasing priority.
+        """
+        return [self.pending[priority] for priority in sorted(self.pending)]
+
+    def _remove(self, priority : int):
+        """
+        Removes a pending order from all indexes.
+
+        Returns
+        -------
+        Order
+            The removed order.
+        """
+        order = self.pending.pop(priority)
+        price_level, key = self._get_price_level(order, priority)
+        if price_level is None:
+            self.market_orders.remove(priority)
+        else:
+            del price_level[bisect_left(price_level, key)]
+
+        for index in order.blocking_index:
+            blocked = self.blocked_by.get(index)
+            if blocked is not None:
+                blocked.discard(priority)
+                if not blocked:
+                    del self.blocked_by[index]
+        if order.parent_index is not None:
+            children = self.children.get(order.parent_index)
+            if children is not None:
+                children.discard(priority)
+                if not children:
+                    del self.children[order.parent_index]
+        return order
+
+    def _cancel_blocked(self, index : int):
+        """
+        Cancels the group of pending orders blocked by a resolved order index.
+
+        Cancelled orders are resolved too, so the orders blocked by them are
+        also cancelled.
+        """
+        indexes = [index]
+        while indexes:
+            blocked = self.blocked_by.pop(indexes.pop(), ())
+            for priority in blocked:
+                if priority in self.pending:
+                    order = self._remove(priority)
+                    self.groups.resolve(order, filled=False)
+                    indexes.append(order.order_index)
+
+    def get_group_id(self, order_index : int):
+        """
+        Returns the id of the open order group of an order.
+
+        The group of a pending order is open. It is freed once all of its
+        orders are resolved, so the id should be read before the order is
+        filled or cancelled.
+
+        Parameters
+        ----------
+        order_index : int
+            The index of the order.
+
+        Returns
+        -------
+        int
+            The id of the group, or -1 if the order is not in an open group.
+        """
+        return self.groups.get_group_id(order_index)
+
+    def is_pending(self, priority : int):
+        """
+        Checks whether the order with the given priority is still pending.
+        """
+        return priority in self.pending
+
+    def fill(self, priority : int):
+        """
+        Marks a pending order as executed and cancels the orders it blocks.
+
+        Parameters
+        ----------
+        priority : int
+            The priority of the executed order.
+
+        Returns
+        -------
+        Order
+            The executed order.
+        """
+        order = self._remove(priority)
+        self.groups.resolve(order, filled=True)
+        self._cancel_blocked(order.order_index)
+        # The stop loss and take profit of a filled entry stay pending.
+        self.children.pop(order.order_index, None)
+        return order
+
+    def cancel(self, priority : int):
+        """
+        Cancels a pending order, the orders it blocks and its stop loss and take profit.
+
+        Parameters
+        ----------
+        priority : int
+            The priority of the cancelled order.
+
+        Returns
+        -------
+        Order
+            The cancelled order.
+        """
+        order = self._remove(priority)
+        self.groups.resolve(order, filled=False)
+        self._cancel_blocked(order.order_index)
+        for child in self.children.pop(order.order_index, ()):
+            if child in self.pending:
+                self.cancel(child)
+        return order
+
+    def get_triggered(self, previous_candle : Candle, current_candle : Candle):
+        """
+        Finds the pending orders triggered by the current bar.
+
+        This is a simple model, which assumes that the market orders are
+        executed at the start of the period and that stop/limit orders are
+        executed at their respective price.
+
+        Parameters
+        ----------
+        previous_candle : Candle
+            The information for the previous candle.
+        current_candle : Candle
+            The information for the current candle.
+
+        Returns
+        -------
+        triggered : list of tuples
+            Triples (priority, order, execution price) in a decreasing priority.
+        """
+        triggered = {}
+        for priority in self.market_orders:
+            triggered[priority] = current_candle.open_price
+
+        start = bisect_right(self.buy_limits, (current_candle.low_price, float("inf")))
+        for price, priority in self.buy_limits[start:]:
+            triggered[priority] = price
+
+        end = bisect_left(self.sell_limits, (current_candle.high_price, float("-inf")))
+        for price, priority in self.sell_limits[:end]:
+            triggered[priority] = price
+
+        for low, high in ((previous_candle.low_price, current_candle.high_price),
+                          (current_candle.low_price, previous_candle.high_price)):
+            start = bisect_right(self.stops, (low, float("inf")))
+            end = bisect_left(self.stops, (high, float("-inf")))
+            for stop_price, priority in self.stops[start:end]:
+                triggered[priority] = stop_price
+
+        return [(priority, self.pending[priority], triggered[priority])
+                for priority in sorted(triggered)]
@@ -1,10 +1,18 @@
-from rich import print
-import matplotlib.pyplot as plt
 from datetime import datetime
-import matplotlib.dates as mdates
 import pandas as pd
-import statistics
 import math
+import numpy as np
+from .bar_buffer import BarBuffer
+from .metrics import PerformanceMetrics
+from .trade_ledger import TradeLedger
+
+def print(*objects):
+    """
+    Prints with rich markup. rich is imported on the first call, so that
+    importing the portfolio does not load it.
+    """
+    from rich import print as rich_print
+    rich_print(*objects)
 
 class Portfolio:
     """
@@ -22,22 +30,133 @@ class Portfolio:
         The current market value of all held positions.
     total_value : float
         The current total value of the portfolio (cash + holdings).
-    dates : datetime
-        The dates of trading history.
+    values : BarBuffer
+        The buffer of the recorded total values ("close" column) and
+        their dates ("timestamp" column).
+    history : numpy.ndarray
+        A view of the total values of trading history.
+    dates : numpy.ndarray
+        A view of the dates of trading history.
+    max_history : int or None
+        The maximal number of values kept in history and dates.
+    start_date : datetime or None
+        The date of the first recorded value. It is kept even if the
+        history is bounded.
+    metrics : PerformanceMetrics
+        The metrics of the recorded values, updated online. They can be
+        read at any time and do not depend on the bounded history.
+    trades : TradeLedger
+        The ledger of the executed orders (see engine.execute_orders).
+    number_of_rejected : int
+        The number of buy orders rejected for lack of cash (see engine.execute_orders).
     MAX_RISK : constant float
         The maximal percentage of cash to be used in a trade.
+    symbol_index : dict
+        Contains pairs (symbol -> column) for the symbols of the universe.
+    quantities : numpy.ndarray or None
+        The quantities held per symbol of the universe, aligned with the
+        price arrays passed to update_market_values.
     """
     
-    def __init__(self, initial_cash = 100000):
-        """Initializes the portfolio with empty positions and initial cash."""
+    def __init__(self, initial_cash = 100000, max_risk = 0.02, max_history : int = None,
+                 capacity : int = 1024):
+        """
+        Initializes the portfolio with empty positions and initial cash.
+
+        Parameters
+        ----------
+        initial_cash : float
+            Initial cash in the portfolio.
+        max_risk : float
+            The maximal percentage of cash to be used in a trade.
+        max_history : int or None
+            The maximal number of values kept in history and dates.
+            If None, the whole history is kept.
+        capacity : int
+            The number of values preallocated for the history.
+        """
         self.inital_cash = initial_cash
         self.cash = initial_cash
         self.positions = {}
         self.holdings_value = 0
         self.total_value = initial_cash
-        self.history = []
-        self.dates = []
-        self.MAX_RISK = 0.02
+        self.max_history = max_history
+        self.values = BarBuffer(max_lookback=max_history, columns=("timestamp", "close"),
+                                capacity=capacity)
+        self.start_date = None
+        self.metrics = PerformanceMetrics(initial_cash)
+        self.trades = TradeLedger()
+        self.number_of_rejected = 0
+        self.MAX_RISK = max_risk
+        self.symbol_index = {}
+        self.quantities = None
+
+    def set_universe(self, symbols : list[str]):
+        """
+        Sets the symbols whose positions are also kept in an array.
+
+        This allows marking the portfolio to market with a single dot
+        product of the quantities and the prices of all symbols.
+
+        Parameters
+        ----------
+        symbols : list of str
+            The symbols of the universe, in the order of the price arrays.
+
+        Returns
+        -------
+        None
+        """
+        self.symbol_index = {symbol : i for i, symbol in enumerate(symbols)}
+        self.quantities = np.zeros(len(symbols), dtype=np.float64)
+        for symbol, quantity in self.positions.items():
+            self.quantities[self.symbol_index[symbol]] = quantity
+
+    @property
+    def history(self):
+        return self.values.get("close")
+
+    @property
+    def dates(self):
+        return self.values.get("timestamp")
+
+    def reserve(self, number_of_values : int):
+        """
+        Preallocates the history for a number of additional values, e.g. the number of bars.
+
+        Parameters
+        ----------
+        number_of_values : int
+            The number of values which will be recorded.
+
+        Returns
+        -------
+        None
+        """
+        self.values.reserve(self.values.number_of_bars + number_of_values)
+
+    def update_market_values(self, prices : np.ndarray, timestamp : datetime):
+        """
+        Updates the holdings_value based on an array of market prices.
+        Adds current total value into the history of the portfolio.
+
+        Parameters
+        ---------
+        prices : numpy.ndarray
+            The latest prices of the symbols of the universe (see set_universe).
+        timestamp : datetime
+            The time of the prices.
+
+        Returns
+        -------
+        None
+        """
+        self.holdings_value = float(np.dot(self.quantities, prices))
+        self.total_value = self.cash + self.holdings_value
+        self.values.append(timestamp, close_price=self.total_value)
+        self.metrics.update(self.total_value, timestamp)
+        if self.start_date is None:
+            self.start_date = timestamp
 
     def update_market_prices(self, price_data, timestamp : datetime):
         """
@@ -58,8 +177,10 @@ class Portfolio:
             self.holdings_value += price_data[symbol] * quantity
         
         self.total_value = self.cash + self.holdings_value
-        self.history.append(self.total_value)
-        self.dates.append(timestamp)
+        self.values.append(timestamp, close_price=self.total_value)
+        self.metrics.update(self.total_value, timestamp)
+        if self.start_date is None:
+            self.start_date = timestamp
 
     def buy(self, symbol, price, quantity):
         """
@@ -87,6 +208,8 @@ class Portfolio:
         if self.cash >= cost:
             self.cash -= cost
             self.positions[symbol] = self.positions.get(symbol, 0) + quantity
+            if symbol in self.symbol_index:
+                self.quantities[self.symbol_index[symbol]] += quantity
         else:
             raise ValueError("Not enough cash to execute buy order")
 
@@ -116,6 +239,8 @@ class Portfolio:
         #if self.positions.get(symbol, 0) >= quantity:
         self.positions[symbol] = self.positions.get(symbol, 0) - quantity
         self.cash += price * quantity
+        if symbol in self.symbol_index:
+            self.quantities[self.symbol_index[symbol]] -= quantity
         if self.positions[symbol] == 0:
             del self.positions[symbol]
         #else
@@ -160,8 +285,10 @@ class Portfolio:
         Return the portfolio total value over time.
 
         Returns
-        history : list
-            A list containing all recorded portfolio total values.
+        -------
+        history : numpy.ndarray
+            A zero-copy view of all recorded portfolio total values.
+            It stays valid until the next recorded value.
         """
         return self.history
     
@@ -184,6 +311,19 @@ class Portfolio:
     def print_initial_cash(self):
         print(f"Initial cash: [white]{round(self.inital_cash, 2)}€[/white]")
 
+    def get_cagr(self):
+        """
+        Returns the compound annual grow rate (CAGR).
+
+        Returns
+        -------
+        float
+            The CAGR in percent.
+        """
+        number_of_days = (pd.Timestamp(self.dates[-1]) - pd.Timestamp(self.start_date)).days + 1
+        number_of_years = number_of_days / 365.25
+        return ((self.total_value / self.inital_cash) ** (1.0 / number_of_years) - 1) * 100
+
     def print_cagr(self):
         """
         Print the compound annual grow rate (CAGR).
@@ -192,9 +332,7 @@ class Portfolio:
         -------
         None
         """
-        number_of_days = (self.dates[-1] - self.dates[0]).days + 1
-        number_of_years = number_of_days / 365.25
-        cagr = ((self.total_value / self.inital_cash) ** (1.0 / number_of_years) - 1) * 100
+        cagr = self.get_cagr()
 
         if cagr > 0:
             print(f"CAGR: [green]{round(cagr, 2)}%[/green]")
@@ -211,7 +349,10 @@ class Portfolio:
         Rerturns
         --------
         """
-        history_normalized = [value / self.inital_cash for value in self.history]
+        import matplotlib.pyplot as plt
+        import matplotlib.dates as mdates
+
+        history_normalized = self.history / self.inital_cash
         equity_series = pd.Series(data=history_normalized, index=self.dates)
 
         plt.figure(figsize=(10, 5), dpi=120)
@@ -225,6 +366,28 @@ class Portfolio:
 
         plt.show()
 
+    def get_volatility(self):
+        """
+        Returns the annualized standard deviation of the portfolio.
+
+        If the history is bounded and some values were dropped, the
+        standard deviation of all returns is read from the metrics.
+
+        Returns
+        -------
+        float
+            The annualized standard deviation in percent.
+        """
+        if self.values.number_of_bars > len(self.values):
+            return self.metrics.get_volatility()
+        history = self.history
+        # The standard deviation of (1 + return) is the one of the return.
+        deviations = history[1:] / history[:-1]
+        deviations -= deviations.mean()
+        std_daily = math.sqrt(np.dot(deviations, deviations) / (len(deviations) - 1))
+
+        return (std_daily * math.sqrt(252)) * 100
+
     def print_std(self):
         """
         Prints the annualized standard deviation of the portfolio.
@@ -233,26 +396,57 @@ class Portfolio:
         -------
         None
         """
+        std_yearly_percentage = self.get_volatility()
 
-        returns = []
-        for i in range(1, len(self.history)):
-            returns.append(self.history[i] / self.history[i - 1] - 1.0)
+        print(f"Standard Deviation Yearly: [white]{round(std_yearly_percentage, 2)}%c[/white]")
 
-        std_daily = statistics.stdev(returns)
+    def print_metrics(self):
+        """
+        Prints the risk-adjusted metrics of the portfolio (see PerformanceMetrics).
 
-        std_yearly_percentage = (std_daily * math.sqrt(252)) * 100
+        Returns
+        -------
+        None
+        """
+        print(f"Sharpe ratio: [white]{round(self.metrics.get_sharpe_ratio(), 2)}[/white]")
+        print(f"Sortino ratio: [white]{round(self.metrics.get_sortino_ratio(), 2)}[/white]")
+        print(f"Max drawdown: [red]{round(self.metrics.get_max_drawdown(), 2)}%[/red]")
+        print(f"Calmar ratio: [white]{round(self.metrics.get_calmar_ratio(), 2)}[/white]")
 
-        print(f"Standard Deviation Yearly: [white]{round(std_yearly_percentage, 2)}%c[/white]")
+    def print_trade_stats(self):
+        """
+        Prints the statistics of the closed trades (see TradeLedger.get_stats).
 
-    def get_stats(self):
+        Returns
+        -------
+        None
+        """
+        stats = self.trades.get_stats()
+        print(f"Number of trades: [white]{stats['number_of_trades']}[/white]")
+        print(f"Win rate: [white]{round(stats['win_rate'], 2)}%[/white]")
+        print(f"Profit factor: [white]{round(stats['profit_factor'], 2)}[/white]")
+        print(f"Average trade return: [white]{round(stats['average_trade_return'], 2)}%[/white]")
+        print(f"Expectancy per trade: [white]{round(stats['expectancy'], 2)}€[/white]")
+        if self.number_of_rejected > 0:
+            print(f"Rejected buy orders: [red]{self.number_of_rejected}[/red]")
+
+    def get_stats(self, plot : bool = True):
         """
         Gives statistics about the portfolio.
+
+        Parameters
+        ----------
+        plot : bool
+            If True, the equity curve is plotted after the statistics are printed.
         """
         self.print_initial_cash()
         self.print_total_return()
         self.print_cagr()
         self.print_std()
-        self.plot_equity_curve()
+        self.print_metrics()
+        self.print_trade_stats()
+        if plot:
+            self.plot_equity_curve()
 
 
         
@@ -0,0 +1,135 @@
+import inspect
+from .utils import Candle
+from .bar_buffer import BarBuffer
+
+class IndicatorRegistry:
+    """
+    Represents a set of indicators computed once per bar for many users.
+
+    The registry owns a bar buffer and creates the indicators on it. An
+    indicator is keyed by its class and the arguments of its constructor,
+    bound to their names and completed with the defaults, so every strategy
+    which asks for e.g. an EMA(14) receives the same instance, whether the
+    arguments are passed by position or by name. Each distinct indicator
+    is updated once per bar however many strategies use it.
+
+    The indicators are created with the registry's max_history. The
+    buffer is a ring whose lookback grows to the largest lookback required
+    by the users, which has to be known before the first bar.
+
+    Attributes
+    ----------
+    bars : BarBuffer
+        The buffer shared by all indicators.
+    max_history : int or None
+        The maximal number of values kept in the history of every indicator.
+    indicators : dict
+        Contains pairs (key -> indicator), the key being the class of the
+        indicator and its arguments.
+    """
+    def __init__(self, max_lookback : int = 1, max_history : int = None):
+        """
+        Initializes an empty registry.
+
+        Parameters
+        ----------
+        max_lookback : int
+            The initial number of bars kept in the buffer.
+        max_history : int or None
+            The maximal number of values kept in the history of every
+            indicator. If None, the whole history is kept.
+        """
+        self.bars = BarBuffer(max_lookback=max_lookback)
+        self.max_history = max_history
+        self.indicators = {}
+
+    def __len__(self):
+        """
+        Returns the number of distinct indicators.
+        """
+        return len(self.indicators)
+
+    @staticmethod
+    def _freeze(value):
+        """
+        Converts the lists in the arguments into tuples, so that they can be keys.
+        """
+        if isinstance(value, (list, tuple)):
+            return tuple(IndicatorRegistry._freeze(item) for item in value)
+        return value
+
+    def require_lookback(self, lookback : int):
+        """
+        Makes sure that the buffer keeps at least lookback bars.
+
+        Parameters
+        ----------
+        lookback : int
+            The number of bars needed by a user of the registry.
+
+        Raises
+        ------
+        ValueError
+            If the buffer has to grow after the first bar.
+
+        Returns
+        -------
+        None
+        """
+        if lookback > self.bars.max_lookback:
+            self.bars.set_max_lookback(lookback)
+
+    def get(self, indicator_class : type, *args, **kwargs):
+        """
+        Returns the shared indicator with the given class and arguments.
+
+        The indicator is created on the first request. The bar buffer and
+        the max_history (if the class supports it) are passed by the registry.
+
+        Parameters
+        ----------
+        indicator_class : type
+            The class of the indicator, e.g. ExponentialMovingAverage.
+        *args, **kwargs
+            The other arguments of its constructor.
+
+        Raises
+        ------
+        TypeError
+            If the arguments do not match the constructor of the class.
+
+        Returns
+        -------
+        indicator : object
+            The shared instance.
+        """
+        signature = inspect.signature(indicator_class)
+        arguments = signature.bind(*args, **kwargs)
+        arguments.apply_defaults()
+        # The buffer and the history are set by the registry, not by the users.
+        key = (indicator_class, tuple((name, self._freeze(value)) for name, value in arguments.arguments.items()
+                                      if name not in ("bars", "max_history")))
+        indicator = self.indicators.get(key)
+        if indicator is None:
+            if "max_history" in signature.parameters:
+                kwargs["max_history"] = self.max_history
+            indicator = indicator_class(*args, bars=self.bars, **kwargs)
+            self.indicators[key] = indicator
+        return indicator
+
+    def append_candle(self, candle : Candle):
+        """
+        Appends a bar and updates every indicator once.
+
+        Parameters
+        ----------
+        candle : Candle
+            The latest candlestick.
+
+        Returns
+        -------
+        None
+        """
+        self.bars.append_candle(candle)
+        for indicator in self.indicators.values():
+            indicator.update()
@@ -1,4 +1,8 @@
+from collections import deque
+import numpy as np
 from .utils import Candle
+from .utils import to_array, exponential_filter, rolling_sum, decay_length
+from .bar_buffer import BarBuffer
 
 class RelativeStrengthIndex:
     """
@@ -10,58 +14,303 @@ class RelativeStrengthIndex:
     It has three main use cases:
         1. Whenever the RSI is above a certain threshold, the
         stock is overbought and gives a sell signal. Conversely,
-        when it is the RSI is below a certain threshold, it is 
+        when it is the RSI is below a certain threshold, it is
         oversold and gives a buy signal.
         2. Bullish or bearish divergences.
         3. Charting patterns.
+
+    Two modes of calculation are supported:
+        1. "simple" - the gains and losses are summed over the last N
+        close-to-close deltas. The sums are kept as running sums.
+        2. "wilder" - the average gain and loss are smoothed with
+            avg_t = (avg_(t-1) * (N - 1) + value_t) / N
+        and seeded with the simple average of the first N deltas.
+    In both modes an update costs O(number of periods). The deltas are
+    calculated from the last max(periods) + 2 close prices in the bar buffer.
+    The whole series can be calculated at once with RelativeStrengthIndex.batch.
+
     Attributes
     ----------
     periods : list of integers
         A list containing the periods to be tracked.
+    mode : str
+        Either "simple" or "wilder".
+    bars : BarBuffer
+        The buffer from which the close prices are read. It is either shared
+        with the strategy or owned by the indicator.
+    owns_bars : bool
+        Whether the buffer is owned by the indicator.
+    lookback : int
+        The number of bars needed by the indicator.
+    number_of_deltas : int
+        The number of deltas seen so far.
+    gains : dict
+        Contains pairs (period -> sum or average of the gains).
+    losses : dict
+        Contains pairs (period -> sum or average of the losses).
     rsi_history : dictionary
-        Contains pairs (period -> rsi history). 
+        Contains pairs (period -> deque with the rsi history).
     """
-    def __init__(self, periods : list[int]):
-        self.candlesticks: list[Candle] = list()
+    def __init__(self, periods : list[int], mode : str = "simple",
+                 max_history : int = None, bars : BarBuffer = None):
+        """
+        Initializes the RSI.
+
+        Parameters
+        ----------
+        periods : list of integers
+            A list containing the periods of RSI to be tracked.
+        mode : str
+            Either "simple" (running sums) or "wilder" (Wilder smoothing).
+        max_history : int or None
+            The maximal number of values kept in rsi_history per period.
+            If None, the whole history is kept.
+        bars : BarBuffer or None
+            A shared buffer with the bars. If None, the indicator keeps
+            its own buffer with the last lookback close prices.
+
+        Raises
+        ------
+        ValueError
+            If the mode is not supported or the shared buffer is too short.
+        """
+        if mode not in ("simple", "wilder"):
+            raise ValueError("Unsupported RSI mode: " + str(mode))
+
         self.periods = periods
-        self.rsi_history = {period : [] for period in periods}
+        self.mode = mode
+        self.number_of_deltas = 0
+        self.number_of_bars = 0
+
+        self.lookback = max(periods) + 2
+        self.owns_bars = bars is None
+        if self.owns_bars:
+            bars = BarBuffer(max_lookback=self.lookback, columns=("close",))
+        elif bars.max_lookback is not None and bars.max_lookback < self.lookback:
+            raise ValueError(f"The RSI needs a lookback of at least {self.lookback} bars")
+        self.bars = bars
+
+        self.gains = {period : 0.0 for period in periods}
+        self.losses = {period : 0.0 for period in periods}
+        # Number of strictly positive / negative deltas inside the window.
+        # They keep the "no gains" and "no losses" cases exact for running sums.
+        self.gain_counts = {period : 0 for period in periods}
+        self.loss_counts = {period : 0 for period in periods}
+        self.rsi_history = {period : deque(maxlen=max_history) for period in periods}
+
+    def _resum(self, period : int, closes):
+        """
+        Recalculates the sums for a period from the close prices.
+
+        The sums are accumulated from the oldest to the newest delta, so that
+        the rounding is the same as rescanning the window on every bar. This
+        is done once every N bars and bounds the drift of the running sums.
+
+        Parameters
+        ----------
+        period : int
+            The period whose sums are recalculated.
+        closes : numpy.ndarray
+            The most recent close prices (at least N + 1).
+
+        Returns
+        -------
+        None
+        """
+        closes = closes[-period - 1:].tolist()
+        gains = 0.0
+        losses = 0.0
+        for i in range(-period, 0):
+            delta = closes[i] - closes[i - 1]
+            if delta > 0:
+                gains += delta
+            else:
+                losses -= delta
+
+        self.gains[period] = gains
+        self.losses[period] = losses
 
+    @staticmethod
+    def _get_rsi(gains : float, losses : float, has_gains : bool, has_losses : bool):
+        """
+        Calculates the RSI from the gains and losses.
+
+        Returns
+        -------
+        float
+            The value of the RSI.
+        """
+        if not has_losses and not has_gains:
+            return 50.0
+        elif not has_losses:
+            return 100.0
+        else:
+            return 100 - 100 / (1 + gains / losses)
 
-    def update(self, candlestick : Candle):
+    def update(self, candlestick : Candle = None):
         """
         Updates the RSI index for all tracked periods.
 
         Parameters
         ----------
-        candlestick : Candle
-            The latest added candlestick.
-        
+        candlestick : Candle or None
+            The latest added candlestick. It is appended to the buffer.
+            If the buffer is shared, its owner appends the bar and
+            the update is called without a candlestick.
+
         Returns
         -------
         None
         """
+        if candlestick is not None:
+            self.bars.append_candle(candlestick)
+        self.number_of_bars += 1
+
+        if self.number_of_bars == 1:
+            for period in self.periods:
+                self.rsi_history[period].append(50)
+            return
+
+        # Only the needed values are read from the view, so an update does
+        # not depend on the length of the periods.
+        closes = self.bars.get("close", min(self.lookback, self.number_of_bars))
+        delta = closes.item(-1) - closes.item(-2)
 
-        self.candlesticks.append(candlestick)
         for period in self.periods:
-            if len(self.candlesticks) > period:
-                gains = 0.0
-                losses = 0.0
-                for i in range(-period, 0):
-                    delta = self.candlesticks[i].close_price - self.candlesticks[i - 1].close_price
-                    if delta > 0:
-                        gains += delta
+            if self.mode == "simple":
+                if self.number_of_deltas >= period:
+                    old_delta = closes.item(-period - 1) - closes.item(-period - 2)
+                    if old_delta > 0:
+                        self.gains[period] -= old_delta
+                        self.gain_counts[period] -= 1
                     else:
-                        losses -= delta
+                        self.losses[period] += old_delta
+                        self.loss_counts[period] -= old_delta < 0
+                if delta > 0:
+                    self.gains[period] += delta
+                    self.gain_counts[period] += 1
+                else:
+                    self.losses[period] -= delta
+                    self.loss_counts[period] += delta < 0
+            else:
+                gain = max(delta, 0.0)
+                loss = max(-delta, 0.0)
+                if self.number_of_deltas < period:
+                    self.gains[period] += gain / period
+                    self.losses[period] += loss / period
+                else:
+                    self.gains[period] = (self.gains[period] * (period - 1) + gain) / period
+                    self.losses[period] = (self.losses[period] * (period - 1) + loss) / period
+
+        self.number_of_deltas += 1
 
-                rsi = 0
-                if losses == 0 and gains == 0:
-                    rsi = 50.0
-                elif losses == 0:
-                    rsi = 100.0
+        for period in self.periods:
+            if self.number_of_deltas >= period:
+                if self.mode == "simple":
+                    if self.number_of_deltas % period == 0:
+                        self._resum(period, closes)
+                    rsi = self._get_rsi(self.gains[period], self.losses[period],
+                                        self.gain_counts[period] > 0, self.loss_counts[period] > 0)
                 else:
-                    rsi = 100 - 100 / (1 + gains / losses)
+                    rsi = self._get_rsi(self.gains[period], self.losses[period],
+                                        self.gains[period] > 0, self.losses[period] > 0)
 
                 self.rsi_history[period].append(rsi)
             else:
-                self.rsi_history[period].append(50)                
+                self.rsi_history[period].append(50)
+
+    @staticmethod
+    def batch(data, periods : list[int], mode : str = "simple"):
+        """
+        Calculates the RSI-s for the whole series in one vectorized pass.
+
+        The result matches the one of feeding the bars to update() one by one
+        up to an absolute tolerance of 1e-9 (the RSI is between 0 and 100).
+        The "no gains" and "no losses" cases are decided exactly.
+
+        Parameters
+        ----------
+        data : numpy.ndarray or pandas.DataFrame
+            Either the close prices or an OHLCV dataframe with a Close column.
+        periods : list of integers
+            A list containing the periods of RSI to be calculated.
+        mode : str
+            Either "simple" or "wilder".
+
+        Raises
+        ------
+        ValueError
+            If the mode is not supported.
+
+        Returns
+        -------
+        rsi_history : dict
+            Contains pairs (period -> numpy.ndarray of rsi-s).
+        """
+        if mode not in ("simple", "wilder"):
+            raise ValueError("Unsupported RSI mode: " + str(mode))
 
+        closes = to_array(data, "Close")
+        deltas = np.diff(closes)
+        gains = np.where(deltas > 0, deltas, 0.0)
+        losses = np.where(deltas < 0, -deltas, 0.0)
+        has_gain = (deltas > 0).astype(np.int64)
+        has_loss = (deltas < 0).astype(np.int64)
+
+        rsi_history = {}
+        for period in periods:
+            rsi = np.full(len(closes), 50.0)
+            if len(closes) <= period:
+                rsi_history[period] = rsi
+                continue
+
+            # The window of bar t contains the deltas t - N, ..., t - 1.
+            if mode == "simple":
+                window_gains = rolling_sum(gains, period)
+                window_losses = rolling_sum(losses, period)
+                has_gains = rolling_sum(has_gain, period) > 0
+                has_losses = rolling_sum(has_loss, period) > 0
+            else:
+                window_gains = np.empty(len(closes) - period)
+                window_losses = np.empty(len(closes) - period)
+                window_gains[0] = np.sum(gains[:period]) / period
+                window_losses[0] = np.sum(losses[:period]) / period
+                window_gains[1:] = exponential_filter(gains[period:], 1.0 / period, window_gains[0])
+                window_losses[1:] = exponential_filter(losses[period:], 1.0 / period, window_losses[0])
+                has_gains = window_gains > 0
+                has_losses = window_losses > 0
+
+            with np.errstate(divide="ignore", invalid="ignore"):
+                values = 100 - 100 / (1 + window_gains / window_losses)
+            values = np.where(has_losses, values, np.where(has_gains, 100.0, 50.0))
+            rsi[period:] = values
+            rsi_history[period] = rsi
+
+        return rsi_history
+
+    @staticmethod
+    def batch_lookback(periods : list[int], mode : str = "simple", tolerance : float = 1e-12):
+        """
+        Returns the number of bars before a position which batch needs to
+        calculate the values from that position on.
+
+        The RSI of bar t in the simple mode only reads the close prices
+        t - N, ..., t, so the values are exact. In the wilder mode the
+        influence of the skipped deltas decays by (1 - 1 / N) per bar, so
+        the averages match up to the relative tolerance.
+
+        Parameters
+        ----------
+        periods, mode
+            The arguments of batch.
+        tolerance : float
+            The tolerated relative error of the averages in the wilder mode.
+
+        Returns
+        -------
+        int
+            The number of preceding bars.
+        """
+        if mode == "simple":
+            return max(periods)
+        return max(period + decay_length(1.0 / period, tolerance) for period in periods)
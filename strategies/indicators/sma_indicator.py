@@ -0,0 +1,171 @@
+from collections import deque
+import numpy as np
+from .utils import Candle
+from .utils import to_array, rolling_sum
+from .bar_buffer import BarBuffer
+
+class SimpleMovingAverage:
+    """
+    Represents a Simple Moving Average Indicator.
+
+    The SMA of period N is the mean of the last N close prices. During the
+    first N - 1 bars it is the mean of all close prices seen so far.
+
+    The sum of the window is kept as a running sum: on every bar the new
+    close price is added and the one leaving the window is subtracted, so
+    an update costs O(number of periods) regardless of their lengths. The
+    leaving price is read from the bar buffer, which therefore keeps the
+    last max(periods) + 1 close prices. Once every N bars the sum of a
+    period is recalculated from the window, which bounds the drift of the
+    running sum at an amortized O(1) cost. The whole series can be
+    calculated at once with SimpleMovingAverage.batch.
+
+    Attributes
+    ----------
+    periods : list of integers
+        A list containing the periods to be tracked.
+    bars : BarBuffer
+        The buffer from which the close prices are read. It is either shared
+        with the strategy or owned by the indicator.
+    owns_bars : bool
+        Whether the buffer is owned by the indicator.
+    lookback : int
+        The number of bars needed by the indicator.
+    number_of_values : int
+        The number of close prices seen so far.
+    sums : dict
+        Contains pairs (period -> sum of the close prices in the window).
+    sma : dict
+        Contains pairs (period -> latest sma).
+    sma_history : dict
+        Contains pairs (period -> deque of sma-s).
+    """
+    def __init__(self, periods : list[int], max_history : int = None, bars : BarBuffer = None):
+        """
+        Initializes the SMA.
+
+        Parameters
+        ----------
+        periods : list of integers
+            A list containing the periods of SMA to be tracked.
+        max_history : int or None
+            The maximal number of values kept in sma_history per period.
+            If None, the whole history is kept.
+        bars : BarBuffer or None
+            A shared buffer with the bars. If None, the indicator keeps
+            its own buffer with the last lookback close prices.
+
+        Raises
+        ------
+        ValueError
+            If a period is not positive or the shared buffer is too short.
+        """
+        if min(periods) <= 0:
+            raise ValueError("The periods of the SMA must be positive")
+
+        self.periods = periods
+        self.number_of_values = 0
+
+        self.lookback = max(periods) + 1
+        self.owns_bars = bars is None
+        if self.owns_bars:
+            bars = BarBuffer(max_lookback=self.lookback, columns=("close",))
+        elif bars.max_lookback is not None and bars.max_lookback < self.lookback:
+            raise ValueError(f"The SMA needs a lookback of at least {self.lookback} bars")
+        self.bars = bars
+
+        self.sums = {period : 0.0 for period in self.periods}
+        self.sma = {period : None for period in self.periods}
+        self.sma_history = {period : deque(maxlen=max_history) for period in self.periods}
+
+    def _resum(self, period : int, closes):
+        """
+        Recalculates the sum of a period from the close prices.
+
+        This is done once every N bars and bounds the drift of the running sum.
+
+        Parameters
+        ----------
+        period : int
+            The period whose sum is recalculated.
+        closes : numpy.ndarray
+            The most recent close prices (at least N).
+
+        Returns
+        -------
+        None
+        """
+        self.sums[period] = sum(closes[-period:].tolist())
+
+    def update(self, candlestick : Candle = None):
+        """
+        Updates the SMA-s for all tracked periods.
+
+        Parameters
+        ----------
+        candlestick : Candle or None
+            The latest added candlestick. It is appended to the buffer.
+            If the buffer is shared, its owner appends the bar and
+            the update is called without a candlestick.
+
+        Returns
+        -------
+        None
+        """
+        if candlestick is not None:
+            self.bars.append_candle(candlestick)
+        self.number_of_values += 1
+        # Only the needed values are read from the view, so an update does
+        # not depend on the length of the periods.
+        closes = self.bars.get("close", min(self.lookback, self.number_of_values))
+        value = closes.item(-1)
+
+        for period in self.periods:
+            if self.number_of_values % period == 0:
+                self._resum(period, closes)
+            else:
+                self.sums[period] += value
+                if self.number_of_values > period:
+                    self.sums[period] -= closes.item(-period - 1)
+            new_sma = self.sums[period] / min(period, self.number_of_values)
+            self.sma[period] = new_sma
+            self.sma_history[period].append(new_sma)
+
+    @staticmethod
+    def batch(data, periods : list[int]):
+        """
+        Calculates the SMA-s for the whole series in one vectorized pass.
+
+        The result matches the one of feeding the bars to update() one by one
+        up to a relative tolerance of 1e-9.
+
+        Parameters
+        ----------
+        data : numpy.ndarray or pandas.DataFrame
+            Either the close prices or an OHLCV dataframe with a Close column.
+        periods : list of integers
+            A list containing the periods of SMA to be calculated.
+
+        Returns
+        -------
+        sma_history : dict
+            Contains pairs (period -> numpy.ndarray of sma-s).
+        """
+        closes = to_array(data, "Close")
+        sma_history = {}
+        for period in periods:
+            sma = np.empty(len(closes), dtype=np.float64)
+            warm_up_length = min(period - 1, len(closes))
+            sma[:warm_up_length] = np.cumsum(closes[:warm_up_length]) / np.arange(1, warm_up_length + 1)
+            sma[warm_up_length:] = rolling_sum(closes, period) / period
+            sma_history[period] = sma
+
+        return sma_history
+
+    @staticmethod
+    def batch_lookback(periods : list[int]):
+        """
+        Returns the number of bars before a position which batch needs to
+        calculate the values from that position on. The values are exact.
+        """
+        return max(periods)
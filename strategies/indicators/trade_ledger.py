@@ -0,0 +1,351 @@
+import numpy as np
+from .utils import Order
+
+class TradeLedger:
+    """
+    Represents a columnar record of all executed orders (fills).
+
+    Every column is kept in its own growable NumPy array (amortized
+    doubling), so recording a fill does not allocate a Python object and
+    the columns can be read or exported as zero-copy views.
+
+    The fills are matched into round trips per symbol with FIFO lots (see
+    get_round_trips). The matching and all trade statistics are computed
+    in a single vectorized pass over the columns.
+
+    Attributes
+    ----------
+    COLUMNS : tuple of str
+        The recorded columns:
+            1. symbol - the id of the symbol (see symbols).
+            2. order_index - the index of the executed order.
+            3. group - the id of the order group (e.g. the OCO pair) or -1.
+            4. side - 1 for a buy and -1 for a sell.
+            5. price - the execution price.
+            6. quantity - the executed quantity.
+            7. timestamp - the time of the bar of the execution.
+            8. bar_index - the index of the bar of the execution.
+    symbols : list of str
+        The recorded symbols, indexed by their id.
+    symbol_ids : dict
+        Contains pairs (symbol -> id).
+    number_of_fills : int
+        The number of recorded fills.
+    arrays : dict
+        Contains pairs (column -> underlying array).
+    """
+    COLUMNS = ("symbol", "order_index", "group", "side", "price", "quantity", "timestamp", "bar_index")
+    DTYPES = {"symbol" : np.int32, "order_index" : np.int64, "group" : np.int64, "side" : np.int8,
+              "price" : np.float64, "quantity" : np.float64, "timestamp" : "datetime64[ns]",
+              "bar_index" : np.int64}
+
+    def __init__(self, capacity : int = 256):
+        """
+        Initializes an empty ledger.
+
+        Parameters
+        ----------
+        capacity : int
+            The initial capacity of the growable arrays.
+        """
+        self.symbols = []
+        self.symbol_ids = {}
+        self.number_of_fills = 0
+        self.arrays = {column : np.empty(max(1, capacity), dtype=self.DTYPES[column])
+                       for column in self.COLUMNS}
+
+    def __len__(self):
+        """
+        Returns the number of recorded fills.
+        """
+        return self.number_of_fills
+
+    def _grow(self):
+        """
+        Doubles the capacity of the arrays.
+        """
+        for column in self.COLUMNS:
+            array = self.arrays[column]
+            new_array = np.empty(2 * len(array), dtype=array.dtype)
+            new_array[:self.number_of_fills] = array[:self.number_of_fills]
+            self.arrays[column] = new_array
+
+    def record(self, symbol : str, order : Order, price : float, timestamp = None,
+               bar_index : int = -1, group : int = -1):
+        """
+        Records the execution of an order.
+
+        Parameters
+        ----------
+        symbol : str
+            The symbol of the traded asset.
+        order : Order
+            The executed order.
+        price : float
+            The execution price.
+        timestamp : datetime or None
+            The time of the bar of the execution.
+        bar_index : int
+            The index of the bar of the execution.
+        group : int
+            The id of the order group of the order, or -1.
+
+        Returns
+        -------
+        None
+        """
+        if self.number_of_fills == len(self.arrays["price"]):
+            self._grow()
+        symbol_id = self.symbol_ids.get(symbol)
+        if symbol_id is None:
+            symbol_id = self.symbol_ids[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+
+        position = self.number_of_fills
+        arrays = self.arrays
+        arrays["symbol"][position] = symbol_id
+        arrays["order_index"][position] = order.order_index if order.order_index is not None else -1
+        arrays["group"][position] = group
+        arrays["side"][position] = 1 if order.side == "buy" else -1
+        arrays["price"][position] = price
+        arrays["quantity"][position] = order.quantity
+        arrays["timestamp"][position] = np.datetime64("NaT") if timestamp is None else \
+            np.datetime64(getattr(timestamp, "value", timestamp), "ns")
+        arrays["bar_index"][position] = bar_index
+        self.number_of_fills += 1
+
+    def get(self, column : str):
+        """
+        Returns a zero-copy view of a column.
+
+        Parameters
+        ----------
+        column : str
+            The requested column (see COLUMNS).
+
+        Returns
+        -------
+        numpy.ndarray
+            A view of the values of all fills. It stays valid until the next fill.
+        """
+        return self.arrays[column][:self.number_of_fills]
+
+    def to_numpy(self):
+        """
+        Exports the ledger as zero-copy views of its columns.
+
+        Returns
+        -------
+        columns : dict
+            Contains pairs (column -> numpy.ndarray).
+        """
+        return {column : self.get(column) for column in self.COLUMNS}
+
+    def save_npz(self, path : str):
+        """
+        Saves the columns and the symbols into an uncompressed .npz file.
+
+        Parameters
+        ----------
+        path : str
+            The path of the file.
+
+        Returns
+        -------
+        None
+        """
+        np.savez(path, symbols=np.array(self.symbols, dtype=str), **self.to_numpy())
+
+    def to_parquet(self, path : str):
+        """
+        Saves the ledger into a Parquet file.
+
+        The numeric columns are handed to pyarrow without copying. The
+        symbol column is written as a dictionary column of the symbols.
+
+        Parameters
+        ----------
+        path : str
+            The path of the file.
+
+        Raises
+        ------
+        ImportError
+            If pyarrow is not installed.
+
+        Returns
+        -------
+        None
+        """
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as error:
+            raise ImportError("Exporting the trade ledger to Parquet requires pyarrow") from error
+
+        columns = self.to_numpy()
+        table = {column : pa.array(values) for column, values in columns.items() if column != "symbol"}
+        table["symbol"] = pa.DictionaryArray.from_arrays(pa.array(columns["symbol"]),
+                                                         pa.array(self.symbols, type=pa.string()))
+        pq.write_table(pa.table(table), path)
+
+    def _match_side(self, positions : np.ndarray, signed_quantities : np.ndarray,
+                    symbol_starts : np.ndarray, direction : int, tolerance : float):
+        """
+        Matches the opening and closing quantities of one direction in FIFO order.
+
+        The part of a fill which moves the position away from zero in the
+        direction opens a lot, the part which moves it back closes lots.
+        The opened and the closed quantities of every symbol are laid out on
+        a common cumulative axis, so that with FIFO the unit closed at x
+        belongs to the lot opened at x. Every piece between two consecutive
+        interval ends is then matched with a single search.
+
+        Returns
+        -------
+        tuple of numpy.ndarray
+            The opening fills, the closing fills and the quantities of the matched pieces.
+        """
+        previous = positions - signed_quantities
+        moved = np.maximum(direction * positions, 0.0) - np.maximum(direction * previous, 0.0)
+        opened = np.maximum(moved, 0.0)
+        closed = np.maximum(-moved, 0.0)
+
+        # The closed quantities of a symbol start where its opened quantities start.
+        open_ends = np.cumsum(opened)
+        close_ends = np.cumsum(closed)
+        shifts = (open_ends - opened)[symbol_starts] - (close_ends - closed)[symbol_starts]
+        close_ends += np.repeat(shifts, np.diff(np.r_[symbol_starts, len(positions)]))
+
+        open_fills = np.flatnonzero(opened > tolerance)
+        close_fills = np.flatnonzero(closed > tolerance)
+        open_ends, close_ends = open_ends[open_fills], close_ends[close_fills]
+        open_starts = open_ends - opened[open_fills]
+        close_starts = close_ends - closed[close_fills]
+
+        bounds = np.unique(np.concatenate((open_starts, open_ends, close_starts, close_ends)))
+        middles = (bounds[:-1] + bounds[1:]) / 2
+        lengths = np.diff(bounds)
+        open_pieces = np.searchsorted(open_ends, middles)
+        close_pieces = np.searchsorted(close_ends, middles)
+        valid = (open_pieces < len(open_ends)) & (close_pieces < len(close_ends)) & (lengths > tolerance)
+        valid[valid] &= (open_starts[open_pieces[valid]] < middles[valid]) & \
+            (close_starts[close_pieces[valid]] < middles[valid])
+
+        return open_fills[open_pieces[valid]], close_fills[close_pieces[valid]], lengths[valid]
+
+    def get_round_trips(self, tolerance : float = 1e-9):
+        """
+        Matches the fills into round trips.
+
+        The fills of every symbol are netted into a signed position in
+        execution order and the closing quantities are matched with the open
+        lots first in, first out. A fill which flips the position both closes
+        the open lots and opens a new lot. A round trip is an opening fill
+        whose whole quantity has been closed (within the tolerance, relative
+        to the largest quantity). Partly closed lots are not returned.
+
+        Parameters
+        ----------
+        tolerance : float
+            The relative tolerance under which a quantity counts as zero.
+
+        Returns
+        -------
+        round_trips : dict
+            Contains pairs (column -> numpy.ndarray) with one value per
+            round trip, ordered by the opening fill:
+                1. fill - the index of the opening fill in the ledger.
+                2. symbol - the id of the symbol.
+                3. direction - 1 for a long and -1 for a short trip.
+                4. quantity - the quantity of the lot.
+                5. entry_bar, exit_bar - the bar indexes of the opening and the last closing fill.
+                6. entry_value - the value of the lot at the entry price.
+                7. pnl - the profit of the trip.
+                8. trade_return - the profit relative to the entry value.
+        """
+        columns = self.to_numpy()
+        rows = np.argsort(columns["symbol"], kind="stable")
+        symbols = columns["symbol"][rows]
+        prices = columns["price"][rows]
+        bars = columns["bar_index"][rows]
+        signed_quantities = columns["side"][rows] * columns["quantity"][rows]
+
+        # The position after every fill, restarted at the first fill of every symbol.
+        symbol_starts = np.flatnonzero(np.r_[len(symbols) > 0, symbols[1:] != symbols[:-1]])
+        positions = np.cumsum(signed_quantities)
+        positions -= np.repeat((positions - signed_quantities)[symbol_starts],
+                               np.diff(np.r_[symbol_starts, len(symbols)]))
+        scale = np.max(np.abs(signed_quantities), initial=0.0) * tolerance
+
+        entries, exits, quantities, directions = [], [], [], []
+        for direction in (1, -1):
+            opening, closing, pieces = self._match_side(positions, signed_quantities, symbol_starts,
+                                                        direction, scale)
+            entries.append(opening)
+            exits.append(closing)
+            quantities.append(pieces)
+            directions.append(np.full(len(pieces), direction, dtype=np.int8))
+        entries, exits = np.concatenate(entries), np.concatenate(exits)
+        quantities, directions = np.concatenate(quantities), np.concatenate(directions)
+
+        # The pieces of every lot are summed up by the opening fill.
+        lots, lot_ids = np.unique(entries, return_inverse=True)
+        pnl = np.bincount(lot_ids, weights=directions * quantities * (prices[exits] - prices[entries]),
+                          minlength=len(lots))
+        closed_quantities = np.bincount(lot_ids, weights=quantities, minlength=len(lots))
+        exit_bars = np.zeros(len(lots), dtype=np.int64)
+        np.maximum.at(exit_bars, lot_ids, bars[exits])
+        lot_directions = np.zeros(len(lots), dtype=np.int8)
+        lot_directions[lot_ids] = directions
+
+        lot_quantities = np.abs(signed_quantities[lots])
+        # A flipping fill opens only the part beyond zero.
+        flipped = np.sign(positions[lots] - signed_quantities[lots]) == -lot_directions
+        lot_quantities[flipped] = np.abs(positions[lots][flipped])
+        complete = closed_quantities >= lot_quantities - scale
+        lots, pnl, exit_bars = lots[complete], pnl[complete], exit_bars[complete]
+        lot_directions, lot_quantities = lot_directions[complete], lot_quantities[complete]
+
+        fills = rows[lots]
+        by_fill = np.argsort(fills, kind="stable")
+        entry_value = prices[lots] * lot_quantities
+        return {
+            "fill" : fills[by_fill],
+            "symbol" : symbols[lots][by_fill],
+            "direction" : lot_directions[by_fill],
+            "quantity" : lot_quantities[by_fill],
+            "entry_bar" : bars[lots][by_fill],
+            "exit_bar" : exit_bars[by_fill],
+            "entry_value" : entry_value[by_fill],
+            "pnl" : pnl[by_fill],
+            "trade_return" : (pnl / entry_value)[by_fill],
+        }
+
+    def get_stats(self):
+        """
+        Computes the trade statistics of the closed round trips.
+
+        Returns
+        -------
+        stats : dict
+            Contains the number of trades, the win rate (in percent), the
+            profit factor (gross profit / gross loss), the average trade
+            return (in percent) and the expectancy (the average profit per trade).
+        """
+        round_trips = self.get_round_trips()
+        pnl = round_trips["pnl"]
+        number_of_trades = len(pnl)
+        if number_of_trades == 0:
+            return {"number_of_trades" : 0, "win_rate" : 0.0, "profit_factor" : 0.0,
+                    "average_trade_return" : 0.0, "expectancy" : 0.0}
+
+        gross_profit = pnl[pnl > 0].sum()
+        gross_loss = -pnl[pnl < 0].sum()
+        return {
+            "number_of_trades" : number_of_trades,
+            "win_rate" : np.count_nonzero(pnl > 0) / number_of_trades * 100,
+            "profit_factor" : float(gross_profit / gross_loss) if gross_loss > 0 else float("inf"),
+            "average_trade_return" : float(round_trips["trade_return"].mean()) * 100,
+            "expectancy" : float(pnl.mean()),
+        }
@@ -1,4 +1,6 @@
 from datetime import datetime
+import math
+import numpy as np
 
 class Candle:
     """
@@ -66,10 +68,14 @@ class Order:
         The unique index of the order
     blocking_index: int
         A list with indexes of orders, whose execution, cancels or removes the current order
+    parent_index: int or None
+        The index of the entry order of a stop loss or take profit. If the entry is
+        cancelled (e.g. rejected for lack of cash), the order is cancelled as well.
     
     """
     def __init__(self, side: str, order_type: str, quantity: float, 
-                 price: float = None, stop_price: float = None, order_index: int = None, blocking_index: list[int] = None):
+                 price: float = None, stop_price: float = None, order_index: int = None, blocking_index: list[int] = None,
+                 parent_index: int = None):
         self.side = side
         self.order_type = order_type
         self.quantity = quantity
@@ -77,6 +83,7 @@ class Order:
         self.stop_price = stop_price
         self.order_index = order_index
         self.blocking_index = blocking_index
+        self.parent_index = parent_index
 
     @staticmethod
     def get_long_position(index: int, quantity: float, 
@@ -87,10 +94,10 @@ class Order:
                                 order_index=index, blocking_index=[index]))
         order_setup.append(Order(side="sell", order_type="stop", quantity=quantity,
                                 stop_price=stop_loss_price, order_index=index + 1,
-                                blocking_index=[index + 1, index + 2]))
+                                blocking_index=[index + 1, index + 2], parent_index=index))
         order_setup.append(Order(side="sell", order_type="limit", quantity=quantity,
                                 price = exit_price, order_index=index + 2,
-                                blocking_index=[index + 1, index + 2]))
+                                blocking_index=[index + 1, index + 2], parent_index=index))
         
         return order_setup
 
@@ -103,10 +110,10 @@ class Order:
                                  order_index=index, blocking_index=[index]))
         order_setup.append(Order(side="buy", order_type="stop", quantity=quantity,
                                 stop_price=stop_loss_price, order_index=index + 1, 
-                                blocking_index=[index + 1, index + 2]))
+                                blocking_index=[index + 1, index + 2], parent_index=index))
         order_setup.append(Order(side="buy", order_type="limit", quantity=quantity,
-                                price=exit_price, order_index=index + 1,
-                                blocking_index=[index + 1, index + 2]))
+                                price=exit_price, order_index=index + 2,
+                                blocking_index=[index + 1, index + 2], parent_index=index))
 
         return order_setup    
 
@@ -133,4 +140,194 @@ def newton_raphson(steps: int, function, derivative, initial_guess : float):
         new_guess = initial_guess - function(initial_guess) / derivative(initial_guess)
         initial_guess = new_guess
         steps -= 1
-    return initial_guess
\ No newline at end of file
+    return initial_guess
+
+def to_array(data, column : str = "Close"):
+    """
+    Converts the input of a batch calculation into a NumPy array.
+
+    Parameters
+    ----------
+    data : numpy.ndarray, pandas.DataFrame or dict
+        Either the values themselves, an OHLCV dataframe or pairs
+        (column -> numpy.ndarray) with lowercase column names, as returned
+        by engine.get_bar_arrays.
+    column : str
+        The column which is taken from a dataframe or a dict.
+
+    Returns
+    -------
+    numpy.ndarray
+        A contiguous array of floats.
+    """
+    if isinstance(data, dict):
+        data = data[column.lower()]
+    elif hasattr(data, "columns"):
+        data = data[column]
+    return np.ascontiguousarray(data, dtype=np.float64)
+
+def rolling_sum(values, window : int, block : int = 4096):
+    """
+    Calculates the sums of all windows of a given length.
+
+    The sums are differences of cumulative sums. The cumulative sums are
+    restarted every block, so the rounding error depends on the magnitude
+    of the values inside the block and not on the whole series. Sums of
+    integers are exact, so they are taken from a single cumulative sum.
+
+    Parameters
+    ----------
+    values : numpy.ndarray
+        The input series.
+    window : int
+        The length of the windows.
+    block : int
+        The number of windows calculated from one cumulative sum.
+
+    Returns
+    -------
+    numpy.ndarray
+        The sums, the i-th one being the sum of values[i:i + window].
+    """
+    number_of_windows = max(0, len(values) - window + 1)
+    if np.issubdtype(values.dtype, np.integer):
+        block = max(1, number_of_windows)
+    result = np.empty(number_of_windows, dtype=values.dtype)
+    for start in range(0, number_of_windows, block):
+        cumulative = np.cumsum(values[start:start + block + window - 1])
+        cumulative = np.concatenate((np.zeros(1, dtype=cumulative.dtype), cumulative))
+        result[start:start + block] = cumulative[window:] - cumulative[:-window]
+    return result
+
+def exponential_filter(values, alpha : float, initial : float):
+    """
+    A function implementing the recursion
+        y_t = y_(t-1) + alpha * (x_t - y_(t-1))
+    with y_(-1) = initial, using vectorized operations.
+
+    Inside a block of length B the recursion has the closed form
+        y_(s+j) = (1 - alpha) ** j * (y_s + alpha * sum_(k=1..j) x_(s+k) * (1 - alpha) ** (-k))
+    which is calculated with a cumulative sum. The blocks are short enough
+    that (1 - alpha) ** (-B) stays below 1e50, so only one Python iteration
+    is needed per block.
+
+    Parameters
+    ----------
+    values : numpy.ndarray
+        The input series x.
+    alpha : float
+        The smoothing factor in (0, 1].
+    initial : float
+        The value before the first element of the series.
+
+    Returns
+    -------
+    numpy.ndarray
+        The filtered series y.
+    """
+    decay = 1.0 - alpha
+    if decay <= 0:
+        return np.array(values, dtype=np.float64)
+
+    block = max(1, min(len(values), int(50 * math.log(10) / -math.log(decay))))
+    exponents = np.arange(1, block + 1)
+    powers = decay ** exponents
+    inverse_powers = decay ** -exponents
+
+    result = np.empty(len(values), dtype=np.float64)
+    previous = initial
+    for start in range(0, len(values), block):
+        chunk = values[start:start + block]
+        length = len(chunk)
+        sums = np.cumsum(chunk * inverse_powers[:length]) * alpha
+        result[start:start + length] = powers[:length] * (previous + sums)
+        previous = result[start + length - 1]
+
+    return result
+
+def decay_length(alpha : float, tolerance : float = 1e-12):
+    """
+    Returns the number of steps after which the influence of a value on
+    the recursion of exponential_filter falls below a tolerance.
+
+    Parameters
+    ----------
+    alpha : float
+        The smoothing factor in (0, 1].
+    tolerance : float
+        The remaining weight (1 - alpha) ** steps which is tolerated.
+
+    Returns
+    -------
+    int
+        The number of steps.
+    """
+    decay = 1.0 - alpha
+    if decay <= 0:
+        return 0
+    return math.ceil(math.log(tolerance) / math.log(decay))
+
+def first_below(values, starts, thresholds, direct_size : int = 1 << 18):
+    """
+    Finds for every query the first index i >= start with values[i] < threshold.
+
+    The minima of all aligned blocks of length 1, 2, 4, ... are precomputed
+    (2 * len(values) floats in total). Every query first climbs to the
+    smallest aligned block after its start which contains a smaller value
+    and then descends into it, so all queries are answered together in
+    O(log(len(values))) vectorized steps. Short series are compared with
+    all thresholds at once instead.
+
+    Parameters
+    ----------
+    values : numpy.ndarray
+        The searched series.
+    starts : numpy.ndarray
+        The first index checked by each query.
+    thresholds : numpy.ndarray
+        The threshold of each query.
+    direct_size : int
+        The maximal number of value and threshold pairs compared directly.
+
+    Returns
+    -------
+    numpy.ndarray
+        The found index of each query, or len(values) if there is none.
+    """
+    number_of_values = len(values)
+    starts = np.asarray(starts, dtype=np.int64)
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    if 0 < number_of_values * len(starts) <= direct_size:
+        # The flat indices of all values below the threshold, query after query.
+        hits = np.append(np.flatnonzero(values < thresholds[:, None]), number_of_values * len(starts))
+        row_starts = np.arange(0, number_of_values * len(starts), number_of_values)
+        found = hits[np.searchsorted(hits, row_starts + starts)] - row_starts
+        return np.minimum(found, number_of_values)
+
+    height = max(0, int(number_of_values - 1).bit_length())
+    levels = [np.full(1 << height, np.inf)]
+    levels[0][:number_of_values] = values
+    for _ in range(0, height):
+        levels.append(np.fmin(levels[-1][0::2], levels[-1][1::2]))
+
+    positions = starts.copy()
+    found_levels = np.full(len(positions), -1, dtype=np.int64)
+
+    # Climb: a query whose position is not aligned to the next level checks
+    # the block of the current level starting at it.
+    for level in range(0, height + 1):
+        if level < height:
+            queries = np.flatnonzero((found_levels < 0) & (((positions >> level) & 1) == 1))
+        else:
+            queries = np.flatnonzero((found_levels < 0) & (positions < (1 << height)))
+        hit = levels[level][positions[queries] >> level] < thresholds[queries]
+        found_levels[queries[hit]] = level
+        positions[queries[~hit]] += 1 << level
+
+    # Descend: stay in the left half if it contains a smaller value.
+    for level in range(height - 1, -1, -1):
+        queries = np.flatnonzero(found_levels > level)
+        miss = levels[level][positions[queries] >> level] >= thresholds[queries]
+        positions[queries[miss]] += 1 << level
+
+    return np.where(found_levels >= 0, positions, number_of_values)
@@ -1,72 +1,159 @@
-import pandas as pd
-from datetime import datetime
-from strategies.indicators.utils import Order
-from indicators.utils import Candle
-
-    
-class History:
-    def __init__(self, candlesticks: list[Candle], ma10 : list[float], ma20: list[float]):
-        self.candlesticks = candlesticks
-        self.ma10 = ma10
-        self.ma20 = ma20
-        self.number_indexed = 0
-
-
-    def update_ma(self):
-        data_length = len(self.candlesticks)
-
-        begin_traversal = max(data_length - 10, 0)
-        total_sum = 0.0
-        for i in range(begin_traversal, data_length):
-            total_sum += self.candlesticks[i].close_price
-
-        self.ma10.append(total_sum / (data_length - begin_traversal))
-
-        begin_traversal = max(data_length - 20, 0)
-        total_sum = 0.0
-        for i in range(begin_traversal, data_length):
-            total_sum += self.candlesticks[i].close_price
-
-        self.ma20.append(total_sum / (data_length - begin_traversal))
-
-    def check_signal(self):
-        if len(self.candlesticks) <= 20:
+from .indicators.utils import Candle
+from .indicators.utils import Order
+from .indicators.bar_buffer import BarBuffer
+from .indicators.registry import IndicatorRegistry
+from .indicators.sma_indicator import SimpleMovingAverage
+from .indicators.portfolio import Portfolio
+
+class MovingAverageCrossover:
+    """
+    This strategy enters long positions on a golden cross.
+
+    A golden cross happens when the fast SMA moves from below the slow SMA
+    to above it. Every entry is a market buy with a stop loss and a take
+    profit below and above the close price of the signal.
+
+    All state is kept on the instance, so several instances (e.g. with
+    different windows or for different tickers) can run in the same
+    process or in parallel. It has the same interface as Strategy and can
+    be used wherever a strategy is passed in.
+
+    Attributes
+    ----------
+    PARAMETERS : tuple of str
+        The names of the parameters of the constructor which can be swept.
+    registry : IndicatorRegistry
+        The registry which owns the bars and the indicators. It is either
+        shared with other strategies or owned by the strategy.
+    owns_registry : bool
+        Whether the registry is owned by the strategy.
+    bars : BarBuffer
+        A buffer containing the OHLCV stock data. It is shared with the indicators.
+    FAST_PERIOD : int
+        The period of the fast SMA.
+    SLOW_PERIOD : int
+        The period of the slow SMA.
+    fast_sma : SimpleMovingAverage
+        A class which calculates the fast SMA with a running sum.
+    slow_sma : SimpleMovingAverage
+        A class which calculates the slow SMA with a running sum.
+    STOP_LOSS : float
+        The distance of the stop loss from the entry price (as a fraction).
+    TAKE_PROFIT : float
+        The distance of the take profit from the entry price (as a fraction).
+    QUANTITY : float
+        The quantity bought on every entry.
+    number_of_orders : int
+        The number of orders sent by the strategy.
+    quiet : bool
+        If True, the strategy does not print its signals.
+    """
+    PARAMETERS = ("fast_period", "slow_period", "stop_loss", "take_profit", "quantity")
+
+    def __init__(self, max_lookback : int = None, quiet : bool = False,
+                 fast_period : int = 10, slow_period : int = 20,
+                 stop_loss : float = 0.2, take_profit : float = 0.2, quantity : float = 1,
+                 registry : IndicatorRegistry = None):
+        """
+        Initializes the strategy.
+
+        Parameters
+        ----------
+        max_lookback : int or None
+            The maximal number of bars kept in the shared bar buffer.
+            If None, the smallest lookback needed by the indicators is used.
+        quiet : bool
+            If True, the strategy does not print its signals.
+        fast_period : int
+            The period of the fast SMA.
+        slow_period : int
+            The period of the slow SMA.
+        stop_loss : float
+            The distance of the stop loss from the entry price (as a fraction).
+        take_profit : float
+            The distance of the take profit from the entry price (as a fraction).
+        quantity : float
+            The quantity bought on every entry.
+        registry : IndicatorRegistry or None
+            A registry shared with other strategies. Its owner appends the
+            bars and update() only updates the state of the strategy. If
+            None, the strategy keeps its own registry.
+
+        Raises
+        ------
+        ValueError
+            If the fast period is not shorter than the slow one or
+            max_lookback is shorter than the lookback of an indicator.
+        """
+        if not 0 < fast_period < slow_period:
+            raise ValueError("The fast period must be positive and shorter than the slow period")
+        self.FAST_PERIOD = fast_period
+        self.SLOW_PERIOD = slow_period
+        self.STOP_LOSS = stop_loss
+        self.TAKE_PROFIT = take_profit
+        self.QUANTITY = quantity
+        if max_lookback is None:
+            max_lookback = self.SLOW_PERIOD + 1
+
+        self.owns_registry = registry is None
+        if self.owns_registry:
+            registry = IndicatorRegistry(max_lookback=max_lookback, max_history=2)
+        else:
+            registry.require_lookback(max_lookback)
+        self.registry = registry
+        self.bars = registry.bars
+        self.fast_sma = registry.get(SimpleMovingAverage, [self.FAST_PERIOD])
+        self.slow_sma = registry.get(SimpleMovingAverage, [self.SLOW_PERIOD])
+        self.number_of_orders = 0
+        self.quiet = quiet
+
+    def update(self, candlestick : Candle):
+        """
+        Updates the indicators inside the strategy.
+
+        Parameters
+        ----------
+        candlestick : Candle
+            Latest recorded candlestick of the stock.
+
+        Returns
+        -------
+        None
+        """
+        if self.owns_registry:
+            self.registry.append_candle(candlestick)
+
+    def get_orders(self, portfolio : Portfolio):
+        """
+        A function which returns the orders of a golden cross.
+
+        The function can only give orders once both SMAs of the previous
+        bar cover the slow period.
+
+        Parameters
+        ----------
+        portfolio : Porfolio
+            A portfolio tracking the performance and active assets.
+
+        Returns
+        -------
+        list of Order
+            The entry with its stop loss and take profit, or an empty list.
+        """
+        if self.bars.number_of_bars <= self.SLOW_PERIOD:
             return []
-        
-
-        if self.ma10[-2] < self.ma20[-2] and self.ma10[-1] > self.ma20[-1]:
-            order_setup = []
-            order_setup.append(Order(side = "buy", order_type="market", quantity=1, 
-                                     order_index=self.number_indexed, 
-                                     blocking_index=[self.number_indexed])) 
-            order_setup.append(Order(side = "sell", order_type="stop", quantity=1,
-                                    stop_price = 0.8 * self.candlesticks[-1].close_price, 
-                                    order_index=self.number_indexed + 2,
-                                    blocking_index=[self.number_indexed + 1, self.number_indexed + 2]))
-            order_setup.append(Order(side = "sell", order_type="limit", quantity=1, 
-                                     price = 1.2 * self.candlesticks[-1].close_price,
-                                     order_index=self.number_indexed + 1,
-                                     blocking_index=[self.number_indexed + 1, self.number_indexed + 2]))
-
-            
-            
-            self.number_indexed += 3
-            return order_setup
-        
-        return []
-            
-    
-        
-    
-history = History([], [], [])
-
-def handle_candle(timestamp, open_price, high_price, low_price, close_price, volume):
-
-    current_candle = Candle(timestamp, open_price, high_price, low_price, close_price, volume)
-    history.candlesticks.append(current_candle)
-    history.update_ma()
-    return history.check_signal()
-
 
+        fast = self.fast_sma.sma_history[self.FAST_PERIOD]
+        slow = self.slow_sma.sma_history[self.SLOW_PERIOD]
+        if not (fast[-2] < slow[-2] and fast[-1] > slow[-1]):
+            return []
 
+        current_price = float(self.bars.get("close", 1)[0])
+        order_setup = Order.get_long_position(self.number_of_orders, quantity=self.QUANTITY,
+                                              stop_loss_price=(1 - self.STOP_LOSS)*current_price,
+                                              exit_price=(1 + self.TAKE_PROFIT)*current_price)
+        if not self.quiet:
+            print("Golden cross, enter long")
 
+        self.number_of_orders += len(order_setup)
+        return order_setup
@@ -1,20 +1,32 @@
 from .indicators.utils import Candle
+from .indicators.bar_buffer import BarBuffer
 from .indicators.ema_indicator import ExponentialMovingAverage
 from .indicators.rsi_indicator import RelativeStrengthIndex
 from .indicators.utils import Order
 from .indicators.portfolio import Portfolio
+from .indicators.registry import IndicatorRegistry
+from .indicators.utils import to_array, first_below
+import inspect
+import numpy as np
 
 class Strategy:
     """
-    This strategy will look to follow a trend. 
+    This strategy will look to follow a trend.
     Trend direction is determined based on whether
     the price action is above or below the EMA.
     Overbought and oversold zones will be avoided.
 
     Attributes
     ----------
-    candlesticks : list of Candle
-        A list containing the OHLC stock data.
+    PARAMETERS : tuple of str
+        The names of the parameters of the constructor which can be swept.
+    registry : IndicatorRegistry
+        The registry which owns the bars and the indicators. It is either
+        shared with other strategies or owned by the strategy.
+    owns_registry : bool
+        Whether the registry is owned by the strategy.
+    bars : BarBuffer
+        A buffer containing the OHLCV stock data. It is shared with the indicators.
     EMA_PERIOD : int
         Tracked EMA period.
     ema_indicator : ExponentialMovingAverage
@@ -23,17 +35,67 @@ class Strategy:
         Tracked RSI period.
     rsi_indicator : RelativeStrengthIndex
         A class which calculates the RSIs for tracked periods.
+    STOP_LOSS : float
+        The distance of the stop loss from the entry price (as a fraction).
+    TAKE_PROFIT : float
+        The distance of the take profit from the entry price (as a fraction).
     number_of_orders : int
         The number of orders sent by the strategy.
+    quiet : bool
+        If True, the strategy does not print its signals.
     """
+    PARAMETERS = ("ema_period", "rsi_period", "stop_loss", "take_profit")
 
-    def __init__(self):
-        self.candlesticks : list[Candle] = []
-        self.EMA_PERIOD = 14
-        self.ema_indicator = ExponentialMovingAverage([self.EMA_PERIOD])
-        self.RSI_PERIOD = 7
-        self.rsi_indicator = RelativeStrengthIndex([self.RSI_PERIOD]) 
+    def __init__(self, max_lookback : int = None, quiet : bool = False,
+                 ema_period : int = 14, rsi_period : int = 7,
+                 stop_loss : float = 0.1, take_profit : float = 0.1,
+                 registry : IndicatorRegistry = None):
+        """
+        Initializes the strategy.
+
+        Parameters
+        ----------
+        max_lookback : int or None
+            The maximal number of bars kept in the shared bar buffer.
+            If None, the smallest lookback needed by the indicators is used.
+        quiet : bool
+            If True, the strategy does not print its signals.
+        ema_period : int
+            Tracked EMA period.
+        rsi_period : int
+            Tracked RSI period.
+        stop_loss : float
+            The distance of the stop loss from the entry price (as a fraction).
+        take_profit : float
+            The distance of the take profit from the entry price (as a fraction).
+        registry : IndicatorRegistry or None
+            A registry shared with other strategies. Its owner appends the
+            bars and update() only updates the state of the strategy. If
+            None, the strategy keeps its own registry.
+
+        Raises
+        ------
+        ValueError
+            If max_lookback is shorter than the lookback of an indicator.
+        """
+        self.EMA_PERIOD = ema_period
+        self.RSI_PERIOD = rsi_period
+        self.STOP_LOSS = stop_loss
+        self.TAKE_PROFIT = take_profit
+        if max_lookback is None:
+            max_lookback = max(self.EMA_PERIOD, self.RSI_PERIOD + 2)
+
+        self.owns_registry = registry is None
+        if self.owns_registry:
+            registry = IndicatorRegistry(max_lookback=max_lookback, max_history=max_lookback)
+        else:
+            registry.require_lookback(max_lookback)
+        self.registry = registry
+        self.bars = registry.bars
+        self.ema_indicator = registry.get(ExponentialMovingAverage, [self.EMA_PERIOD])
+        self.rsi_indicator = registry.get(RelativeStrengthIndex, [self.RSI_PERIOD])
         self.number_of_orders = 0
+        self.quiet = quiet
 
     def update(self, candlestick : Candle):
         """
@@ -43,14 +105,13 @@ class Strategy:
         ----------
         candlestick : Candle
             Latest recorded candlestick of the stock.
-        
+
         Returns
         -------
-        None 
+        None
         """
-        self.candlesticks.append(candlestick)
-        self.ema_indicator.update(candlestick)
-        self.rsi_indicator.update(candlestick)
+        if self.owns_registry:
+            self.registry.append_candle(candlestick)
 
     def get_orders(self, portfolio : Portfolio):
         """
@@ -69,25 +130,376 @@ class Strategy:
         None
         """
 
-        if (self.EMA_PERIOD > len(self.candlesticks) or
-            self.RSI_PERIOD > len(self.candlesticks)):
+        if (self.EMA_PERIOD > self.bars.number_of_bars or
+            self.RSI_PERIOD > self.bars.number_of_bars):
             return []
-        current_price = self.candlesticks[-1].close_price
+        current_price = float(self.bars.get("close", 1)[0])
         order_setup = []
-        
+
         max_value = portfolio.MAX_RISK * portfolio.cash
 
         if (self.ema_indicator.ema_history[self.EMA_PERIOD][-1] < current_price and
             self.rsi_indicator.rsi_history[self.RSI_PERIOD][-1] < 70):
-            order_setup = Order.get_long_position(self.number_of_orders, quantity=max_value / self.candlesticks[-1].close_price,
-                                                  stop_loss_price=0.9*current_price, exit_price=1.1*current_price)
-            print("Enter long")
-            
+            order_setup = Order.get_long_position(self.number_of_orders, quantity=max_value / current_price,
+                                                  stop_loss_price=(1 - self.STOP_LOSS)*current_price,
+                                                  exit_price=(1 + self.TAKE_PROFIT)*current_price)
+            if not self.quiet:
+                print("Enter long")
+
         elif (self.ema_indicator.ema_history[self.EMA_PERIOD][-1] > current_price and
               self.rsi_indicator.rsi_history[self.RSI_PERIOD][-1] > 30):
-            order_setup = Order.get_short_position(self.number_of_orders, quantity=max_value / self.candlesticks[-1].close_price,
-                                                   stop_loss_price=1.1*current_price, exit_price=0.9*current_price)
-            print("Enter short")
-            
+            order_setup = Order.get_short_position(self.number_of_orders, quantity=max_value / current_price,
+                                                   stop_loss_price=(1 + self.STOP_LOSS)*current_price,
+                                                   exit_price=(1 - self.TAKE_PROFIT)*current_price)
+            if not self.quiet:
+                print("Enter short")
+
         self.number_of_orders += len(order_setup)
-        return order_setup
\ No newline at end of file
+        return order_setup
+
+    @staticmethod
+    def _find_exits(previous_lows, previous_highs, lows, highs, entries, stops, limits, is_long):
+        """
+        Finds the first bar at which the stop loss or the take profit of each position triggers.
+
+        The conditions are the same as in execute_orders: a stop triggers if
+        its price was crossed since the previous bar, a sell limit if
+        High > price and a buy limit if Low < price. If both trigger on the
+        same bar, the stop loss is executed.
+
+        Until a long stop triggers, the lows stay above it, so the first bar
+        with min(previous Low, Low) below the stop is the only candidate (and
+        symmetrically for short stops). Every exit is therefore a search for
+        the first value above or below a threshold, which is answered for all
+        positions at once by first_below. A candidate bar which does not meet
+        the exact condition (possible only for prices equal to the stop) is
+        searched again from the next bar.
+
+        Returns
+        -------
+        exit_bars : numpy.ndarray
+            The bar of the exit for each position (-1 if it is never closed).
+        exit_prices : numpy.ndarray
+            The execution price of the exit for each position.
+        """
+        number_of_bars = len(highs)
+        stop_bars = np.full(len(entries), number_of_bars, dtype=np.int64)
+        limit_bars = np.full(len(entries), number_of_bars, dtype=np.int64)
+
+        for side, searched, sign in ((is_long, np.fmin(previous_lows, lows), 1.0),
+                                     (~is_long, -np.fmax(previous_highs, highs), -1.0)):
+            positions = np.flatnonzero(side)
+            starts = entries[positions]
+            while len(positions) > 0:
+                bars = first_below(searched, starts, sign * stops[positions])
+                inside = bars < number_of_bars
+                checked = np.minimum(bars, number_of_bars - 1)
+                stop = stops[positions]
+                crossed = (((previous_lows[checked] < stop) & (highs[checked] > stop)) |
+                           ((previous_highs[checked] > stop) & (lows[checked] < stop)))
+                confirmed = ~inside | crossed
+                stop_bars[positions[confirmed]] = bars[confirmed]
+                positions = positions[~confirmed]
+                starts = bars[~confirmed] + 1
+
+        limit_bars[is_long] = first_below(-highs, entries[is_long], -limits[is_long])
+        limit_bars[~is_long] = first_below(lows, entries[~is_long], limits[~is_long])
+
+        exit_bars = np.minimum(stop_bars, limit_bars)
+        exit_prices = np.where(stop_bars <= limit_bars, stops, limits)
+        exit_bars[exit_bars == number_of_bars] = -1
+        return exit_bars, exit_prices
+
+    @classmethod
+    def screen_vectorized(cls, data, combinations : list[dict], initial_cash : float = 100000,
+                          max_risk : float = 0.02, tolerance : float = 1e-10,
+                          max_iterations : int = 100, chunk_size : int = 1 << 15):
+        """
+        Backtests many parameter combinations on a single ticker with array operations.
+
+        This is a screening mode which reproduces simulate() for every
+        combination without the order-by-order simulation:
+            1. The EMA and RSI are calculated once per distinct period with
+            their batch methods and give the long and short signals of every
+            combination for every bar at once.
+            2. Every signal enters at the open of the next bar and its stop loss
+            and take profit are searched for in the following bars. The
+            positions of all combinations are searched together.
+            3. The quantity of a position depends on the cash at the signal,
+            which depends on the earlier positions. The cash curves are found
+            by a fixed-point iteration, which starts from the initial cash and
+            reruns the cumulative sums until the cash changes by less than the
+            tolerance (relative). The cash is the initial cash plus the sum of
+            the flows, so the tolerance is never below the rounding error of
+            that sum. The system is triangular, so it converges.
+            The cash before the first changed signal is final, so every
+            iteration only reruns the sums after it.
+
+        The combinations share the NumPy calls, so the fixed cost per call is
+        spread over all of them. Every combination is a row of the matrices of
+        the iteration, which is rerun until the slowest row converges, and
+        large matrices do not fit in the cache anymore. The combinations are
+        therefore screened in chunks of at most chunk_size bars in total
+        (but at least one combination).
+
+        The results match the equity history of simulate() up to a relative
+        tolerance of 1e-9 of the initial cash (the sums are accumulated in a
+        different order).
+        simulate() rejects a buy order if there is not enough cash for it and
+        cancels the rest of its group, which depends on the whole path. This is
+        not reproduced: the equity of a combination with a rejected buy order
+        is NaN from the bar of that order on, and simulate() has to be used
+        for it instead.
+
+        Parameters
+        ----------
+        data : pandas.DataFrame or dict
+            A dataframe with Open, High, Low and Close columns, or pairs
+            (column -> numpy.ndarray) with the bars (see engine.get_bar_arrays).
+        combinations : list of dict
+            Contains one dictionary (parameter -> value) per combination, with
+            names from PARAMETERS (see sweep.parameter_grid). Missing
+            parameters take the default values of the constructor.
+        initial_cash : float
+            The initial cash of the portfolio.
+        max_risk : float
+            The maximal percentage of cash to be used in a trade.
+        tolerance : float
+            The relative change of the cash at which the iteration stops.
+        max_iterations : int
+            The maximal number of iterations.
+        chunk_size : int
+            The maximal number of combinations times bars screened together.
+
+        Raises
+        ------
+        ValueError
+            If a combination has an unknown parameter or the cash does not
+            converge.
+
+        Returns
+        -------
+        equity : numpy.ndarray
+            The total value of the portfolio at the close of every bar, one
+            row per combination.
+        """
+        opens = to_array(data, "Open")
+        highs = to_array(data, "High")
+        lows = to_array(data, "Low")
+        closes = to_array(data, "Close")
+        number_of_bars = len(closes)
+        number_of_combinations = len(combinations)
+
+        chunk = max(1, chunk_size // max(1, number_of_bars))
+        if number_of_combinations > chunk:
+            return np.concatenate([cls.screen_vectorized(data, combinations[start:start + chunk], initial_cash,
+                                                         max_risk, tolerance, max_iterations, chunk_size)
+                                   for start in range(0, number_of_combinations, chunk)])
+
+        defaults = inspect.signature(cls.__init__).parameters
+        parameters = {name : [] for name in cls.PARAMETERS}
+        for combination in combinations:
+            unknown = set(combination) - set(cls.PARAMETERS)
+            if unknown:
+                raise ValueError("Unknown strategy parameters: " + ", ".join(sorted(unknown)))
+            for name in cls.PARAMETERS:
+                parameters[name].append(combination.get(name, defaults[name].default))
+        ema_periods = np.array(parameters["ema_period"], dtype=np.int64)
+        rsi_periods = np.array(parameters["rsi_period"], dtype=np.int64)
+        stop_losses = np.array(parameters["stop_loss"], dtype=np.float64)
+        take_profits = np.array(parameters["take_profit"], dtype=np.float64)
+
+        # One row per distinct period, selected by the combinations.
+        distinct_ema_periods, ema_rows = np.unique(ema_periods, return_inverse=True)
+        distinct_rsi_periods, rsi_rows = np.unique(rsi_periods, return_inverse=True)
+        emas = ExponentialMovingAverage.batch(closes, distinct_ema_periods.tolist())
+        rsis = RelativeStrengthIndex.batch(closes, distinct_rsi_periods.tolist())
+        ema = np.array([emas[period] for period in distinct_ema_periods.tolist()]).reshape(-1, number_of_bars)
+        rsi = np.array([rsis[period] for period in distinct_rsi_periods.tolist()]).reshape(-1, number_of_bars)
+        ema = ema[ema_rows]
+        rsi = rsi[rsi_rows]
+
+        # A signal at bar t is only possible once enough bars are seen and
+        # its orders are only executed if there is a next bar.
+        can_trade = np.arange(0, number_of_bars) + 1 >= np.maximum(ema_periods, rsi_periods)[:, None]
+        can_trade[:, -1:] = False
+        long_signal = can_trade & (ema < closes) & (rsi < 70)
+        short_signal = can_trade & ~long_signal & (ema > closes) & (rsi > 30)
+
+        # The positions of all combinations, by combination and inside one by bar.
+        position_combinations, signals = np.nonzero(long_signal | short_signal)
+        number_of_positions = len(signals)
+        is_long = long_signal[position_combinations, signals]
+        direction = np.where(is_long, 1.0, -1.0)
+        entries = signals + 1
+        stop_loss = stop_losses[position_combinations]
+        take_profit = take_profits[position_combinations]
+        stops = np.where(is_long, 1 - stop_loss, 1 + stop_loss) * closes[signals]
+        limits = np.where(is_long, 1 + take_profit, 1 - take_profit) * closes[signals]
+
+        previous_lows = np.concatenate(([np.nan], lows[:-1]))
+        previous_highs = np.concatenate(([np.nan], highs[:-1]))
+        exit_bars, exit_prices = cls._find_exits(previous_lows, previous_highs, lows, highs,
+                                                 entries, stops, limits, is_long)
+        closed = exit_bars >= 0
+
+        # Cash flows per unit of quantity, as events in the order of execution:
+        # by combination, by bar and inside a bar by the priority of the order,
+        # i.e. by position. The cash at a signal is the sum of the events of its
+        # combination up to its bar. Events and signals are compared by one key.
+        event_positions = np.concatenate((np.arange(0, number_of_positions), np.flatnonzero(closed)))
+        event_keys = (position_combinations[event_positions] * (number_of_bars + 1) +
+                      np.concatenate((entries, exit_bars[closed])))
+        event_flows = np.concatenate((-direction * opens[entries], (direction * exit_prices)[closed]))
+        # Sorts by the key and then by the position in a single sort.
+        order = np.argsort(event_keys * number_of_positions + event_positions, kind="stable")
+        event_keys = event_keys[order]
+        event_positions = event_positions[order]
+        event_flows = event_flows[order]
+        event_combinations = position_combinations[event_positions]
+        event_bars = event_keys % (number_of_bars + 1)
+        events_before = np.searchsorted(event_keys, position_combinations * (number_of_bars + 1) + signals,
+                                        side="right")
+
+        # Every combination is a row of the matrices, so that the cumulative
+        # sums restart for every combination and a converged one is left out.
+        event_starts = np.searchsorted(event_keys, np.arange(0, number_of_combinations + 1) *
+                                       (number_of_bars + 1))
+        position_starts = np.searchsorted(position_combinations, np.arange(0, number_of_combinations + 1))
+        number_of_events = np.diff(event_starts)
+        number_of_signals = np.diff(position_starts)
+        event_columns = np.arange(0, len(event_keys)) - event_starts[event_combinations]
+        signal_columns = np.arange(0, number_of_positions) - position_starts[position_combinations]
+        scales = np.zeros((number_of_combinations, number_of_events.max(initial=0)))
+        # The columns after the last signal of a combination count all of its
+        # events, so that the events before the first changed signal are final.
+        before = np.repeat(number_of_events[:, None], number_of_signals.max(initial=0) + 1, axis=1)
+        # The cash flow of an event per unit of cash at its signal.
+        scales[event_combinations, event_columns] = max_risk * event_flows / closes[signals][event_positions]
+        before[position_combinations, signal_columns] = (events_before -
+                                                         event_starts[position_combinations])
+        # Flat indices into signal_cash and totals, which are faster to gather
+        # than pairs of row and column indices.
+        sources = np.repeat(np.arange(0, number_of_combinations) * before.shape[1], scales.shape[1]).reshape(scales.shape)
+        sources[event_combinations, event_columns] += signal_columns[event_positions]
+        cells_before = before + np.arange(0, number_of_combinations)[:, None] * (scales.shape[1] + 1)
+
+        signal_cash = np.full(before.shape, float(initial_cash))
+        totals = np.zeros((number_of_combinations, scales.shape[1] + 1))
+        first_changed = np.zeros(number_of_combinations, dtype=np.int64)
+        first_unchecked = np.zeros(number_of_combinations, dtype=np.int64)
+        rejected_bars = np.full(number_of_combinations, number_of_bars)
+        active = np.flatnonzero(number_of_events > 0)
+        # The cash is the initial cash plus the sum of the flows, so it is only
+        # known up to their rounding error when it is small.
+        rounding_error = 64 * np.finfo(np.float64).eps
+        relative_tolerance = tolerance + rounding_error
+        absolute_tolerance = 2 * rounding_error * initial_cash
+        number_of_iterations = 0
+        while len(active) > 0:
+            if number_of_iterations == max_iterations:
+                raise ValueError(f"The cash did not converge in {max_iterations} iterations")
+            number_of_iterations += 1
+
+            # The active rows as a slice if they are contiguous (always for a
+            # single combination), so that the matrices are indexed by views.
+            rows = slice(active[0], active[-1] + 1) if active[-1] - active[0] < len(active) else active
+
+            # The cash before the first changed signal does not change anymore,
+            # so the sums are only rerun from its first event.
+            first_signal = first_changed[rows].min()
+            first_event = before[active, first_changed[rows]].min()
+            flows = np.take(signal_cash, sources[rows, first_event:])
+            flows *= scales[rows, first_event:]
+            np.cumsum(flows, axis=1, out=flows)
+            flows += totals[rows, first_event:first_event + 1]
+            totals[rows, first_event + 1:] = flows
+            new_signal_cash = np.take(totals, cells_before[rows, first_signal:])
+            new_signal_cash += initial_cash
+            changes = np.subtract(signal_cash[rows, first_signal:], new_signal_cash)
+            np.abs(changes, out=changes)
+            signal_cash[rows, first_signal:] = new_signal_cash
+            np.abs(new_signal_cash, out=new_signal_cash)
+            new_signal_cash *= relative_tolerance
+            new_signal_cash += absolute_tolerance
+            changed = changes > new_signal_cash
+            if (first_changed[rows] > first_signal).any():
+                changed &= np.arange(first_signal, before.shape[1]) >= first_changed[rows, None]
+            first_changed[rows] = np.where(changed.any(axis=1), first_signal + changed.argmax(axis=1),
+                                           number_of_signals[rows])
+
+            # Only a buy order can leave the cash negative, so the first final
+            # event with a negative cash is a rejected order. The rest of such
+            # a combination is not solved.
+            final_events = before[active, first_changed[rows]]
+            first_unchecked_event = first_unchecked[rows].min()
+            negative = ((totals[rows, first_unchecked_event + 1:final_events.max() + 1] < -initial_cash) &
+                        (np.arange(first_unchecked_event, final_events.max()) < final_events[:, None]))
+            rejected = negative.any(axis=1)
+            if rejected.any():
+                rejected_bars[active[rejected]] = event_bars[event_starts[active[rejected]] + first_unchecked_event +
+                                                             negative[rejected].argmax(axis=1)]
+            first_unchecked[rows] = final_events
+            active = active[(first_changed[rows] < number_of_signals[rows]) & ~rejected]
+
+        signal_cash = signal_cash[position_combinations, signal_columns]
+        quantities = max_risk * signal_cash / closes[signals]
+        cash_flows = quantities[event_positions] * event_flows
+        cells = event_combinations * number_of_bars + event_bars
+        cash = initial_cash + np.cumsum(np.bincount(cells, cash_flows, minlength=number_of_combinations *
+                                                    number_of_bars).reshape(-1, number_of_bars), axis=1)
+        position_flows = quantities * direction
+        position_flows = (np.bincount(position_combinations * number_of_bars + entries, position_flows,
+                                      minlength=number_of_combinations * number_of_bars) -
+                          np.bincount((position_combinations * number_of_bars + exit_bars)[closed],
+                                      position_flows[closed],
+                                      minlength=number_of_combinations * number_of_bars))
+        equity = cash + np.cumsum(position_flows.reshape(-1, number_of_bars), axis=1) * closes
+
+        # The equity is unknown from the first rejected buy order on.
+        equity[np.arange(0, number_of_bars) >= rejected_bars[:, None]] = np.nan
+        return equity
+
+    def backtest_vectorized(self, data, initial_cash : float = 100000, max_risk : float = 0.02,
+                            tolerance : float = 1e-10, max_iterations : int = 100):
+        """
+        Backtests the strategy on a single ticker with array operations.
+
+        Runs screen_vectorized for the parameters of the strategy. The result
+        matches the equity history of simulate() up to a relative tolerance
+        of 1e-9.
+
+        Parameters
+        ----------
+        data : pandas.DataFrame or dict
+            A dataframe with Open, High, Low and Close columns, or pairs
+            (column -> numpy.ndarray) with the bars (see engine.get_bar_arrays).
+        initial_cash : float
+            The initial cash of the portfolio.
+        max_risk : float
+            The maximal percentage of cash to be used in a trade.
+        tolerance : float
+            The relative change of the cash at which the iteration stops.
+        max_iterations : int
+            The maximal number of iterations.
+
+        Raises
+        ------
+        ValueError
+            If a buy order would be rejected for lack of cash or the cash
+            does not converge.
+
+        Returns
+        -------
+        equity : numpy.ndarray
+            The total value of the portfolio at the close of every bar.
+        """
+        combination = {"ema_period" : self.EMA_PERIOD, "rsi_period" : self.RSI_PERIOD,
+                       "stop_loss" : self.STOP_LOSS, "take_profit" : self.TAKE_PROFIT}
+        equity = self.screen_vectorized(data, [combination], initial_cash, max_risk,
+                                        tolerance, max_iterations)[0]
+        rejected = np.flatnonzero(np.isnan(equity))
+        if len(rejected) > 0:
+            raise ValueError(f"The buy order at bar {rejected[0]} would be rejected "
+                             "for lack of cash, which is only supported by simulate()")
+        return equity
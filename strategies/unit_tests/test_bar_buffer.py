@@ -0,0 +1,58 @@
+import pytest
+import numpy as np
+from strategies.indicators.bar_buffer import BarBuffer
+from strategies.indicators.force_index import ForceIndex
+from strategies.indicators.ema_indicator import ExponentialMovingAverage
+from strategies.indicators.rsi_indicator import RelativeStrengthIndex
+from strategies.indicators.utils import Candle
+
+
+def test_ring_buffer_views():
+    bars = BarBuffer(max_lookback=3)
+    for i in range(0, 7):
+        bars.append(np.datetime64("2025-01-01") + i, open_price=i, high_price=i + 1,
+                    low_price=i - 1, close_price=i + 0.5, volume=100 * i)
+
+        assert len(bars) == min(i + 1, 3)
+        assert list(bars.close) == [j + 0.5 for j in range(max(0, i - 2), i + 1)]
+
+    assert bars.number_of_bars == 7
+    assert list(bars.get("volume", 2)) == [500, 600]
+    assert np.shares_memory(bars.close, bars.arrays["close"])
+    assert bars.get_candle().high_price == 7
+    with pytest.raises(ValueError):
+        bars.get("close", 4)
+
+
+def test_growable_buffer():
+    bars = BarBuffer(columns=("close",), capacity=2)
+    for i in range(0, 10):
+        bars.append(close_price=i)
+
+    assert len(bars) == 10
+    assert list(bars.close) == list(range(0, 10))
+
+
+def test_shared_buffer_indicators():
+    dummy_datetime = (2025, 10, 7, 2025, 11, 30, 0)
+    closes = [100.5, 100.6, 101.2, 98.5, 99.0, 102.3, 103.1, 101.7]
+    bars = BarBuffer(max_lookback=5, columns=("close", "volume"))
+    shared = [ExponentialMovingAverage([3], bars=bars), RelativeStrengthIndex([3], bars=bars),
+              ForceIndex(bars=bars)]
+    owned = [ExponentialMovingAverage([3]), RelativeStrengthIndex([3]), ForceIndex()]
+
+    for close in closes:
+        candle = Candle(dummy_datetime, open_price=close, high_price=close,
+                        low_price=close, close_price=close, volume=1000)
+        bars.append_candle(candle)
+        for indicator in shared:
+            indicator.update()
+        for indicator in owned:
+            indicator.update(candle)
+
+    assert list(shared[0].ema_history[3]) == list(owned[0].ema_history[3])
+    assert list(shared[1].rsi_history[3]) == list(owned[1].rsi_history[3])
+    assert shared[2].fi_history == owned[2].fi_history
+
+    with pytest.raises(ValueError):
+        RelativeStrengthIndex([5], bars=bars)
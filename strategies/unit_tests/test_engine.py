@@ -0,0 +1,212 @@
+import json
+import math
+import pytest
+import numpy as np
+import pandas as pd
+from engine import simulate, simulate_panel, simulate_feed, simulate_strategies, get_bar_arrays, execute_orders
+from bar_feed import BarFeed, ArrayFeed, CSVFeed, StoreFeed
+from market_data import MarketDataStore
+from profiler import Profiler
+from benchmarks.bench_import import measure_import
+from strategies.indicators.portfolio import Portfolio
+from strategies.indicators.order_book import OrderBook
+from strategies.indicators.utils import Candle, Order
+from benchmarks.synthetic import generate_ohlcv, generate_panel
+from strategies.strategy1 import Strategy
+from strategies.ma_crossover import MovingAverageCrossover
+
+
+def test_panel_matches_single_ticker():
+    data = generate_ohlcv(2000, ticker="AAA", seed=1)
+    single = simulate(data, "AAA", quiet=True)
+    panel = simulate_panel(data, quiet=True)
+
+    assert np.array_equal(panel.history, single.history)
+    assert panel.get_positions() == single.get_positions()
+
+
+def test_panel_shares_one_portfolio():
+    data = generate_panel(1000, ["AAA", "BBB", "CCC"], seed=5)
+    data.loc[data.index[100:200], (slice(None), "BBB")] = np.nan # BBB does not trade
+
+    portfolio = simulate_panel(data, ["AAA", "BBB", "CCC"], quiet=True)
+
+    assert len(portfolio.history) == 1000
+    positions = portfolio.get_positions()
+    assert set(positions) <= {"AAA", "BBB", "CCC"}
+    last_closes = data["Close"].iloc[-1]
+    holdings = sum(quantity * last_closes[symbol] for symbol, quantity in positions.items())
+    assert abs(portfolio.get_portfolio_value() - (portfolio.get_cash() + holdings)) < 10**-6
+
+
+def test_rejected_buy_cancels_its_bracket(capsys):
+    portfolio = Portfolio(initial_cash=500)
+    order_book = OrderBook()
+    order_book.extend(Order.get_long_position(0, quantity=10, stop_loss_price=50.0, exit_price=150.0))
+    previous_candle = Candle(None, 100.0, 101.0, 99.0, 100.0, 1000)
+    current_candle = Candle(None, 100.0, 160.0, 40.0, 100.0, 1000)
+
+    executed_orders = execute_orders("AAA", previous_candle, current_candle, order_book, portfolio, quiet=False)
+
+    # The stop loss and the take profit would be triggered, but are cancelled with the entry.
+    assert executed_orders == [] and len(order_book) == 0 and order_book.children == {}
+    assert portfolio.number_of_rejected == 1 and len(portfolio.trades) == 0
+    assert portfolio.cash == 500 and portfolio.get_positions() == {}
+    assert "Rejected buy" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("seed", [3, 7])
+def test_vectorized_backtest_matches_simulate(seed):
+    data = generate_ohlcv(5000, seed=seed)
+    portfolio = simulate(data, "SYN", quiet=True)
+    equity = Strategy(quiet=True).backtest_vectorized(data.xs("SYN", level=1, axis=1))
+
+    assert np.allclose(equity, portfolio.history, rtol=10**-9, atol=0)
+
+
+def test_vectorized_backtest_rejects_unaffordable_buys():
+    data = generate_ohlcv(2000, seed=3, volatility=0.002)
+
+    with pytest.raises(ValueError):
+        Strategy(quiet=True).backtest_vectorized(data.xs("SYN", level=1, axis=1))
+
+
+@pytest.mark.parametrize("seed, volatility", [(5, 0.02), (3, 0.002)])
+def test_vectorized_screen_matches_simulate(seed, volatility):
+    data = generate_ohlcv(1500, seed=seed, volatility=volatility)
+    bars = get_bar_arrays(data.xs("SYN", level=1, axis=1))
+    combinations = [{"ema_period" : ema_period, "rsi_period" : 7, "stop_loss" : stop_loss, "take_profit" : 0.2}
+                    for ema_period in [10, 30] for stop_loss in [0.05, 0.1]]
+    equity = Strategy.screen_vectorized(bars, combinations)
+
+    # One combination per chunk.
+    chunked = Strategy.screen_vectorized(bars, combinations, chunk_size=1500)
+    assert np.allclose(chunked, equity, rtol=10**-9, atol=0, equal_nan=True)
+    for row, combination in zip(equity, combinations):
+        history = np.array(simulate(data, "SYN", quiet=True, strategy=Strategy(quiet=True, **combination)).history)
+        # The equity is NaN from the bar of a rejected buy order on.
+        screened = ~np.isnan(row)
+        assert screened.all() or not screened[np.argmin(screened):].any()
+        assert np.allclose(row[screened], history[screened], rtol=10**-9, atol=0)
+
+    if volatility < 0.01:
+        assert np.isnan(equity).any()
+
+
+def test_feeds_match_simulate(tmp_path):
+    generate_ohlcv(3000, seed=2).to_csv(tmp_path / "SYN_data")
+    data = pd.read_csv(tmp_path / "SYN_data", header=[0, 1], index_col=0, parse_dates=True)
+    expected = simulate(data, "SYN", quiet=True)
+    store = MarketDataStore(root=str(tmp_path / "store"))
+    store.write("SYN", get_bar_arrays(data.xs("SYN", level=1, axis=1)), interval="1m")
+
+    feeds = [ArrayFeed(get_bar_arrays(data.xs("SYN", level=1, axis=1)), chunk_size=7),
+             CSVFeed(str(tmp_path / "SYN_data"), "SYN", chunk_size=1000),
+             StoreFeed(store, "SYN", interval="1m", chunk_size=256)]
+    for feed in feeds:
+        portfolio = simulate_feed(feed, "SYN", quiet=True, portfolio=Portfolio())
+        assert np.array_equal(portfolio.history, expected.history)
+        assert portfolio.get_positions() == expected.get_positions()
+
+
+def test_feed_must_implement_iter():
+    class IncompleteFeed(BarFeed):
+        pass
+
+    with pytest.raises(TypeError):
+        IncompleteFeed()
+
+
+def test_feed_keeps_bounded_history():
+    data = generate_ohlcv(3000, seed=2)
+    expected = simulate(data, "SYN", quiet=True)
+    bars = get_bar_arrays(data.xs("SYN", level=1, axis=1))
+    portfolio = simulate_feed(ArrayFeed(bars, chunk_size=100), "SYN", quiet=True)
+
+    assert portfolio.max_history == 10000
+    assert np.array_equal(portfolio.history, expected.history)
+    assert portfolio.get_volatility() == expected.get_volatility()
+
+    # A shorter history still reports the volatility of the whole run.
+    portfolio = simulate_feed(ArrayFeed(bars, chunk_size=100), "SYN", quiet=True,
+                              portfolio=Portfolio(max_history=14))
+    assert len(portfolio.history) == 14
+    assert np.array_equal(portfolio.history, expected.history[-14:])
+    assert portfolio.get_cagr() == expected.get_cagr()
+    assert math.isclose(portfolio.get_volatility(), expected.get_volatility(), rel_tol=10**-9)
+
+
+def test_profiled_run_matches_plain_run():
+    data = generate_ohlcv(1000, ticker="AAA", seed=4)
+    expected = simulate(data, "AAA", quiet=True)
+    profiler = Profiler()
+    strategy = Strategy(quiet=True)
+    order_book = OrderBook()
+    portfolio = simulate_feed(ArrayFeed(get_bar_arrays(data.xs("AAA", level=1, axis=1)), chunk_size=300),
+                              "AAA", quiet=True, order_book=order_book, strategy=strategy,
+                              portfolio=Portfolio(), profiler=profiler)
+
+    assert np.array_equal(portfolio.history, expected.history)
+    report = json.loads(profiler.to_json())
+    assert report["phases"]["strategy.update"]["calls"] == 1000
+    assert report["phases"]["indicator:ema_indicator"]["calls"] == 1000
+    assert report["phases"]["execute_orders"]["calls"] == 999
+    counters = report["counters"]
+    assert counters["bars"] == 1000
+    assert counters["orders_filled"] == len(portfolio.trades)
+    assert counters["orders_placed"] == strategy.number_of_orders
+    assert counters["orders_placed"] - counters["orders_filled"] - counters["orders_cancelled"] == \
+        len(order_book)
+    # The indicators are only wrapped during the run.
+    assert "update" not in vars(strategy.ema_indicator)
+
+
+def test_profiled_run_prints_the_same(capsys):
+    data = generate_ohlcv(50, ticker="AAA", seed=5)
+    simulate(data, "AAA")
+    expected = capsys.readouterr().out
+    profiler = Profiler()
+    simulate(data, "AAA", profiler=profiler)
+
+    assert capsys.readouterr().out == expected
+    assert profiler.phases["print"][1] == 100
+
+
+
+def test_headless_import_skips_plotting_and_network():
+    for module in ("engine", "sweep"):
+        _, loaded = measure_import(module, repeat=1)
+        assert loaded == []
+
+
+def test_multi_strategy_run_shares_indicators():
+    data = generate_ohlcv(2000, ticker="AAA", seed=9)
+    parameters = {
+        "ema14_rsi7" : {"ema_period" : 14, "rsi_period" : 7},
+        "ema14_rsi14" : {"ema_period" : 14, "rsi_period" : 14},
+        "ema20_rsi7" : {"ema_period" : 20, "rsi_period" : 7, "stop_loss" : 0.05},
+    }
+    instances = {}
+    strategies = {name : (lambda registry, name=name, values=values:
+                          instances.setdefault(name, Strategy(quiet=True, registry=registry, **values)))
+                  for name, values in parameters.items()}
+    strategies["crossover"] = lambda registry: MovingAverageCrossover(quiet=True, fast_period=5,
+                                                                      slow_period=14, registry=registry)
+
+    portfolios = simulate_strategies(data, "AAA", strategies, quiet=True)
+
+    # EMA(14), EMA(20), RSI(7), RSI(14) and the SMAs of 5 and 14 bars.
+    registry = instances["ema14_rsi7"].registry
+    assert len(registry) == 6
+    assert registry.bars.number_of_bars == 2000
+    assert instances["ema14_rsi14"].ema_indicator is instances["ema14_rsi7"].ema_indicator
+    assert instances["ema20_rsi7"].rsi_indicator is instances["ema14_rsi7"].rsi_indicator
+    with pytest.raises(ValueError):
+        registry.require_lookback(100) # the lookback is fixed after the first bar
+    for name, values in parameters.items():
+        expected = simulate(data, "AAA", quiet=True, strategy=Strategy(quiet=True, **values))
+        assert np.array_equal(portfolios[name].history, expected.history)
+    expected = simulate(data, "AAA", quiet=True,
+                        strategy=MovingAverageCrossover(quiet=True, fast_period=5, slow_period=14))
+    assert np.array_equal(portfolios["crossover"].history, expected.history)
+    assert len(portfolios["crossover"].trades) > 0
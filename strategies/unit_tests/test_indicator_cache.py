@@ -0,0 +1,150 @@
+import pytest
+import numpy as np
+from engine import get_bar_arrays
+from indicator_cache import IndicatorCache
+from strategies.indicators.ema_indicator import ExponentialMovingAverage
+from strategies.indicators.rsi_indicator import RelativeStrengthIndex
+from strategies.indicators.sma_indicator import SimpleMovingAverage
+from strategies.indicators.force_index import ForceIndex
+from benchmarks.synthetic import generate_ohlcv
+
+INDICATORS = [
+    (ExponentialMovingAverage, ([10, 200],), {}),
+    (ExponentialMovingAverage, ([14],), {"mode" : "window"}),
+    (RelativeStrengthIndex, ([7, 50],), {"mode" : "wilder"}),
+    (RelativeStrengthIndex, ([7],), {}),
+    (SimpleMovingAverage, ([5, 20],), {}),
+    (ForceIndex, (), {}),
+]
+
+
+def assert_same(result, expected):
+    if isinstance(expected, dict):
+        assert list(result) == list(expected)
+        for key in expected:
+            assert np.allclose(result[key], expected[key], rtol=10**-9, atol=10**-9)
+    else:
+        assert np.allclose(result, expected, rtol=10**-9, atol=0)
+
+
+def test_cache_hits_across_instances(tmp_path):
+    data = generate_ohlcv(5000, ticker="AAA", seed=1).xs("AAA", level=1, axis=1)
+    bars = get_bar_arrays(data)
+    cache = IndicatorCache(str(tmp_path))
+    for indicator_class, args, kwargs in INDICATORS:
+        assert_same(cache.get(indicator_class, bars, *args, **kwargs), indicator_class.batch(data, *args, **kwargs))
+    assert len(cache) == len(INDICATORS)
+
+    # A new instance reads the index and maps the stored values.
+    cache = IndicatorCache(str(tmp_path))
+    clock = cache.index["clock"]
+    result = cache.get(ExponentialMovingAverage, bars, (10, 200))
+    assert isinstance(result[10], np.memmap)
+    assert len(cache) == len(INDICATORS) and cache.index["clock"] == clock + 1
+
+    # Other parameters or other prices are other entries.
+    cache.get(ExponentialMovingAverage, bars, [10, 201])
+    bars["close"] = bars["close"] * 1.01
+    cache.get(ExponentialMovingAverage, bars, [10, 200])
+    assert len(cache) == len(INDICATORS) + 2
+
+
+def test_appended_bars_extend_the_entry(tmp_path):
+    data = generate_ohlcv(6000, ticker="AAA", seed=2).xs("AAA", level=1, axis=1)
+    cache = IndicatorCache(str(tmp_path))
+    for indicator_class, args, kwargs in INDICATORS:
+        cache.get(indicator_class, get_bar_arrays(data.iloc[:5000]), *args, **kwargs)
+
+    calls = []
+    for indicator_class, args, kwargs in INDICATORS:
+        batch = indicator_class.batch
+
+        def counted(frame, *batch_args, batch=batch, **batch_kwargs):
+            calls.append(len(frame))
+            return batch(frame, *batch_args, **batch_kwargs)
+        indicator_class.batch = counted
+        try:
+            result = cache.get(indicator_class, get_bar_arrays(data), *args, **kwargs)
+        finally:
+            indicator_class.batch = batch
+        assert_same(result, batch(data, *args, **kwargs))
+        assert calls[-1] == 1000 + indicator_class.batch_lookback(*args, **kwargs)
+
+    # The extended entries replace the shorter ones.
+    assert len(cache) == len(INDICATORS)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    bars = get_bar_arrays(generate_ohlcv(1000, ticker="AAA", seed=3).xs("AAA", level=1, axis=1))
+    cache = IndicatorCache(str(tmp_path), max_bytes=3 * 8000)
+    for period in [5, 10, 20]:
+        cache.get(SimpleMovingAverage, bars, [period])
+    cache.get(SimpleMovingAverage, bars, [5]) # 10 is now the least recently used
+    cache.get(SimpleMovingAverage, bars, [40])
+
+    periods = sorted(entry["keys"][0] for entry in cache.index["entries"].values())
+    assert periods == [5, 20, 40]
+    assert cache.get_size() <= cache.max_bytes
+    assert len(list(tmp_path.glob("*.npy"))) == 3
+
+    cache.clear()
+    assert len(cache) == 0 and not list(tmp_path.glob("*.npy"))
+
+
+def test_hits_write_the_index_lazily(tmp_path):
+    bars = get_bar_arrays(generate_ohlcv(1000, ticker="AAA", seed=4).xs("AAA", level=1, axis=1))
+    cache = IndicatorCache(str(tmp_path), hits_per_write=3)
+    cache.get(SimpleMovingAverage, bars, [5])
+    index = (tmp_path / "index.json").read_text()
+
+    cache.get(SimpleMovingAverage, bars, [5])
+    cache.get(SimpleMovingAverage, bars, [5])
+    assert (tmp_path / "index.json").read_text() == index
+    cache.flush()
+    assert IndicatorCache(str(tmp_path)).index == cache.index
+
+    for _ in range(3):
+        cache.get(SimpleMovingAverage, bars, [5])
+    assert IndicatorCache(str(tmp_path)).index == cache.index
+
+
+def test_missing_files_are_calculated_again(tmp_path):
+    data = generate_ohlcv(2000, ticker="AAA", seed=5).xs("AAA", level=1, axis=1)
+    cache = IndicatorCache(str(tmp_path))
+    cache.get(SimpleMovingAverage, get_bar_arrays(data.iloc[:1000]), [5, 20])
+    for path in tmp_path.glob("*.npy"):
+        path.unlink()
+
+    # The prefix is gone, so the whole series is calculated.
+    result = cache.get(SimpleMovingAverage, get_bar_arrays(data), [5, 20])
+    assert_same(result, SimpleMovingAverage.batch(data, [5, 20]))
+    assert len(cache) == 1 and len(list(tmp_path.glob("*.npy"))) == 1
+
+    for path in tmp_path.glob("*.npy"):
+        path.unlink()
+    result = cache.get(SimpleMovingAverage, get_bar_arrays(data), [5, 20])
+    assert_same(result, SimpleMovingAverage.batch(data, [5, 20]))
+    assert len(cache) == 1 and len(list(tmp_path.glob("*.npy"))) == 1
+
+
+def test_interrupted_writes_keep_the_index_valid(tmp_path, monkeypatch):
+    bars = get_bar_arrays(generate_ohlcv(1000, ticker="AAA", seed=6).xs("AAA", level=1, axis=1))
+    cache = IndicatorCache(str(tmp_path), max_bytes=2 * 8000)
+    for period in [5, 10]:
+        cache.get(SimpleMovingAverage, bars, [period])
+
+    def interrupted(*args, **kwargs):
+        raise OSError("interrupted")
+    monkeypatch.setattr("indicator_cache.json.dump", interrupted)
+    with pytest.raises(OSError):
+        cache.get(SimpleMovingAverage, bars, [20]) # evicts the entry of 5
+    monkeypatch.undo()
+
+    # The evicted file is only deleted after the index is written.
+    cache = IndicatorCache(str(tmp_path), max_bytes=2 * 8000)
+    for entry_id in cache.index["entries"]:
+        assert (tmp_path / (entry_id + ".npy")).exists()
+    assert_same(cache.get(SimpleMovingAverage, bars, [5]), SimpleMovingAverage.batch(bars["close"], [5]))
+
+    cache.clear()
+    assert not list(tmp_path.glob("*.npy*"))
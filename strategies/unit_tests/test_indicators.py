@@ -1,6 +1,12 @@
 import pytest
+import numpy as np
+import pandas as pd
 from strategies.indicators.force_index import ForceIndex
-from strategies.indicators.utils import Candle
+from strategies.indicators.ema_indicator import ExponentialMovingAverage
+from strategies.indicators.rsi_indicator import RelativeStrengthIndex
+from strategies.indicators.sma_indicator import SimpleMovingAverage
+from strategies.indicators.registry import IndicatorRegistry
+from strategies.indicators.utils import Candle, rolling_sum, first_below
 
 
 def test_force_index():
@@ -25,3 +31,175 @@ def test_force_index():
     diff = [answer[i] - fi.fi_history[i] for i in range(0, len(answer))]
     max_diff = max(diff)
     assert(max_diff < 10**-6)
+
+
+def test_exponential_moving_average_modes():
+    dummy_datetime = (2025, 10, 7, 2025, 11, 30, 0)
+    closes = [100.5, 100.6, 101.2, 98.5, 99.0, 102.3, 103.1, 101.7, 100.2, 104.4]
+    window_ema = ExponentialMovingAverage([3, 5], mode="window")
+    recursive_ema = ExponentialMovingAverage([3, 5])
+    bounded_ema = ExponentialMovingAverage([3, 5], max_history=2)
+
+    for close in closes:
+        candle = Candle(dummy_datetime, open_price=close, high_price=close,
+                        low_price=close, close_price=close, volume=1000)
+        window_ema.update(candle)
+        recursive_ema.update(candle)
+        bounded_ema.update(candle)
+
+    for period in [3, 5]:
+        # The warm-up reproduces the window calculation for the first N bars.
+        for i in range(0, period):
+            assert abs(window_ema.ema_history[period][i] - recursive_ema.ema_history[period][i]) < 10**-9
+
+        alpha = 2.0 / (period + 1)
+        expected = recursive_ema.ema_history[period][period - 1]
+        for i in range(period, len(closes)):
+            expected = expected + alpha * (closes[i] - expected)
+            assert abs(recursive_ema.ema_history[period][i] - expected) < 10**-9
+
+        assert list(bounded_ema.ema_history[period]) == list(recursive_ema.ema_history[period])[-2:]
+
+    assert recursive_ema.bars.max_lookback == 5
+    assert ExponentialMovingAverage([3, 5], warm_up=False).bars.max_lookback == 1
+
+
+def test_relative_strength_index_modes():
+    dummy_datetime = (2025, 10, 7, 2025, 11, 30, 0)
+    closes = [100.0, 100.0, 100.0, 101.5, 101.5, 103.0, 104.2, 104.2, 103.1, 102.0,
+              100.7, 100.7, 101.9, 99.4, 98.8, 99.9, 101.0, 101.0, 101.0, 101.0]
+    simple_rsi = RelativeStrengthIndex([2, 5])
+    wilder_rsi = RelativeStrengthIndex([2, 5], mode="wilder")
+
+    for close in closes:
+        candle = Candle(dummy_datetime, open_price=close, high_price=close,
+                        low_price=close, close_price=close, volume=1000)
+        simple_rsi.update(candle)
+        wilder_rsi.update(candle)
+
+    for period in [2, 5]:
+        # Rescans the last N deltas on every bar.
+        answer = []
+        for n in range(1, len(closes) + 1):
+            if n <= period:
+                answer.append(50)
+                continue
+            deltas = [closes[i] - closes[i - 1] for i in range(n - period, n)]
+            gains = sum(delta for delta in deltas if delta > 0)
+            losses = -sum(delta for delta in deltas if delta < 0)
+            if gains == 0 and losses == 0:
+                answer.append(50.0)
+            elif losses == 0:
+                answer.append(100.0)
+            else:
+                answer.append(100 - 100 / (1 + gains / losses))
+
+        diff = [abs(answer[i] - simple_rsi.rsi_history[period][i]) for i in range(0, len(answer))]
+        assert(max(diff) < 10**-9)
+
+        # Seeds the averages with the mean of the first N deltas and smooths them afterwards.
+        answer = [50] * period
+        deltas = [closes[i] - closes[i - 1] for i in range(1, len(closes))]
+        average_gain = sum(max(delta, 0.0) for delta in deltas[:period]) / period
+        average_loss = sum(max(-delta, 0.0) for delta in deltas[:period]) / period
+        for n in range(period, len(deltas) + 1):
+            if n > period:
+                average_gain = (average_gain * (period - 1) + max(deltas[n - 1], 0.0)) / period
+                average_loss = (average_loss * (period - 1) + max(-deltas[n - 1], 0.0)) / period
+            if average_gain == 0 and average_loss == 0:
+                answer.append(50.0)
+            elif average_loss == 0:
+                answer.append(100.0)
+            else:
+                answer.append(100 - 100 / (1 + average_gain / average_loss))
+
+        assert list(wilder_rsi.rsi_history[period]) == pytest.approx(answer, rel=0, abs=10**-9)
+        batch = RelativeStrengthIndex.batch(np.array(closes), [period], mode="wilder")[period]
+        assert list(batch) == pytest.approx(answer, rel=0, abs=10**-9)
+
+    assert simple_rsi.bars.max_lookback == 7
+    # The last four deltas are all zero: the Wilder averages only decay.
+    assert 0 < wilder_rsi.rsi_history[2][-1] < 100
+    assert simple_rsi.rsi_history[2][-1] == 50.0
+
+
+def test_simple_moving_average_resums_the_window():
+    # The running sum loses the digits of the small prices while the large
+    # ones are in the window. The sums are recalculated once every N bars.
+    closes = [1e12] * 20 + [1.1, 2.3, 0.7, 1.9, 3.1, 2.2, 0.4, 1.6, 2.8, 1.3, 0.9]
+    sma = SimpleMovingAverage([5])
+    for close in closes:
+        sma.update(Candle(None, open_price=close, high_price=close, low_price=close,
+                          close_price=close, volume=1000))
+
+    for i in range(25, len(closes)):
+        assert sma.sma_history[5][i] == pytest.approx(np.mean(closes[i - 4:i + 1]), rel=10**-12)
+
+
+def test_batch_matches_streaming():
+    rng = np.random.default_rng(7)
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 3000)))
+    closes[100:110] = closes[99] # a flat segment without gains or losses
+    volumes = rng.integers(1000, 5000, 3000).astype(float)
+    candles = [Candle(i, open_price=close, high_price=close, low_price=close,
+                      close_price=close, volume=volume) for i, (close, volume) in enumerate(zip(closes, volumes))]
+
+    for mode, warm_up in [("recursive", True), ("recursive", False), ("window", True)]:
+        ema = ExponentialMovingAverage([1, 2, 14, 200], mode=mode, warm_up=warm_up)
+        for candle in candles:
+            ema.update(candle)
+        batch = ExponentialMovingAverage.batch(closes, [1, 2, 14, 200], mode=mode, warm_up=warm_up)
+        for period in [1, 2, 14, 200]:
+            assert np.allclose(batch[period], list(ema.ema_history[period]), rtol=10**-9, atol=0)
+
+    for mode in ["simple", "wilder"]:
+        rsi = RelativeStrengthIndex([2, 7, 50], mode=mode)
+        for candle in candles:
+            rsi.update(candle)
+        batch = RelativeStrengthIndex.batch(closes, [2, 7, 50], mode=mode)
+        for period in [2, 7, 50]:
+            assert np.allclose(batch[period], list(rsi.rsi_history[period]), rtol=0, atol=10**-9)
+
+    sma = SimpleMovingAverage([1, 10, 20, 3001])
+    for candle in candles:
+        sma.update(candle)
+    batch = SimpleMovingAverage.batch(closes, [1, 10, 20, 3001])
+    for period in [1, 10, 20, 3001]:
+        expected = [closes[max(0, i + 1 - period):i + 1].mean() for i in range(len(closes))]
+        assert np.allclose(batch[period], expected, rtol=10**-9, atol=0)
+        assert np.allclose(list(sma.sma_history[period]), expected, rtol=10**-9, atol=0)
+
+    fi = ForceIndex()
+    for candle in candles:
+        fi.update(candle)
+    data = pd.DataFrame({"Close" : closes, "Volume" : volumes})
+    assert np.allclose(ForceIndex.batch(data), fi.fi_history, rtol=10**-9, atol=0)
+    assert np.allclose(ForceIndex.batch(closes, volumes), fi.fi_history, rtol=10**-9, atol=0)
+
+
+def test_array_helpers():
+    rng = np.random.default_rng(11)
+    # The values shrink by 20 orders of magnitude, so a single cumulative
+    # sum would lose all precision at the end of the series.
+    values = np.exp(np.linspace(0, -46, 20000)) * rng.random(20000)
+    expected = np.array([values[i:i + 7].sum() for i in range(0, len(values) - 6)])
+    assert np.allclose(rolling_sum(values, 7), expected, rtol=10**-9, atol=0)
+
+    values = rng.normal(size=1000)
+    starts = rng.integers(0, 1001, 300)
+    thresholds = rng.normal(size=300) - 2
+    expected = [next((i for i in range(start, 1000) if values[i] < threshold), 1000)
+                for start, threshold in zip(starts, thresholds)]
+    assert first_below(values, starts, thresholds).tolist() == expected
+    assert first_below(values, starts, thresholds, direct_size=0).tolist() == expected
+
+
+def test_registry_keys_bound_arguments():
+    registry = IndicatorRegistry()
+    registry.require_lookback(14)
+    ema = registry.get(ExponentialMovingAverage, [14])
+    assert registry.get(ExponentialMovingAverage, periods=[14]) is ema
+    assert registry.get(ExponentialMovingAverage, (14,), mode="recursive") is ema
+    assert registry.get(ExponentialMovingAverage, [14], mode="window") is not ema
+    assert registry.get(ForceIndex) is registry.get(ForceIndex)
+    assert len(registry) == 3
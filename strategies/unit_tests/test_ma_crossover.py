@@ -0,0 +1,82 @@
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from engine import simulate, simulate_panel
+from sweep import run_sweep
+from strategies.ma_crossover import MovingAverageCrossover
+from strategies.indicators.portfolio import Portfolio
+from strategies.indicators.utils import Candle
+from benchmarks.synthetic import generate_ohlcv, generate_panel
+
+
+def get_candles(number_of_bars, seed):
+    data = generate_ohlcv(number_of_bars, seed=seed).xs("SYN", level=1, axis=1)
+    return [Candle(timestamp, row[3], row[1], row[2], row[0], row[4])
+            for timestamp, row in zip(data.index.tolist(), data.to_numpy().tolist())]
+
+
+def get_reference_signals(candles, fast_period, slow_period):
+    # The calculation of the original module level History: both averages
+    # are summed again on every bar.
+    closes, fast, slow, signals = [], [], [], []
+    for i, candle in enumerate(candles):
+        closes.append(candle.close_price)
+        fast.append(sum(closes[-fast_period:]) / len(closes[-fast_period:]))
+        slow.append(sum(closes[-slow_period:]) / len(closes[-slow_period:]))
+        if len(closes) > slow_period and fast[-2] < slow[-2] and fast[-1] > slow[-1]:
+            signals.append(i)
+    return signals
+
+
+def get_signals(strategy, candles):
+    signals = []
+    for i, candle in enumerate(candles):
+        strategy.update(candle)
+        orders = strategy.get_orders(Portfolio())
+        if orders:
+            assert [order.side for order in orders] == ["buy", "sell", "sell"]
+            assert orders[1].stop_price == pytest.approx(0.8 * candle.close_price)
+            assert orders[2].price == pytest.approx(1.2 * candle.close_price)
+            signals.append(i)
+    return signals
+
+
+def test_crossover_matches_reference():
+    candles = get_candles(3000, seed=4)
+    signals = get_signals(MovingAverageCrossover(quiet=True), candles)
+    assert len(signals) > 10
+    assert signals == get_reference_signals(candles, 10, 20)
+
+    with pytest.raises(ValueError):
+        MovingAverageCrossover(fast_period=20, slow_period=10)
+
+
+def test_instances_run_concurrently():
+    candles = get_candles(3000, seed=6)
+    windows = [(5, 20), (10, 20), (10, 50), (20, 100)] * 2
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda window: get_signals(MovingAverageCrossover(None, True, *window), candles),
+                                windows))
+    for window, signals in zip(windows, results):
+        assert signals == get_reference_signals(candles, *window)
+
+
+def test_crossover_in_sweep_and_panel():
+    data = generate_ohlcv(500, ticker="AAA", seed=8)
+    grid = {"fast_period" : [5, 10], "slow_period" : [20, 30], "quantity" : [10]}
+    results = run_sweep(data, "AAA", grid, workers=2, strategy_class=MovingAverageCrossover)
+
+    assert len(results) == 4
+    for row in results.to_dict("records"):
+        portfolio = simulate(data, "AAA", quiet=True,
+                             strategy=MovingAverageCrossover(None, True, row["fast_period"], row["slow_period"],
+                                                             quantity=10))
+        assert row["final_value"] == portfolio.get_portfolio_value()
+    assert results["final_value"].nunique() > 1
+
+    panel_data = generate_panel(500, ["AAA", "BBB"], seed=8)
+    windows = {"AAA" : (5, 20), "BBB" : (10, 30)}
+    panel = simulate_panel(panel_data, quiet=True,
+                           strategy_factory=lambda ticker: MovingAverageCrossover(None, True, *windows[ticker]))
+    assert set(panel.get_positions()) <= {"AAA", "BBB"}
+    assert len(panel.trades) > 0
@@ -0,0 +1,135 @@
+import os
+import shutil
+import time
+import pytest
+import numpy as np
+import pandas as pd
+from engine import fetch_data, simulate
+from market_data import DataProvider, MarketDataStore, read_yfinance_csv, convert_csv_directory
+from benchmarks.synthetic import generate_ohlcv, SyntheticProvider
+
+
+class FakeProvider(DataProvider):
+    """
+    Serves synthetic daily bars and records the requested ranges.
+    """
+    def __init__(self):
+        self.requests = []
+        self.data = {}
+
+    def get_bars(self, ticker):
+        if ticker not in self.data:
+            data = generate_ohlcv(1000, ticker=ticker, seed=len(self.data)).xs(ticker, level=1, axis=1)
+            data.index = pd.date_range("2020-01-01", periods=1000, freq="D", name="Date")
+            self.data[ticker] = data
+        return self.data[ticker]
+
+    def fetch(self, ticker, start, end, interval="1d"):
+        self.requests.append((ticker, start, end))
+        data = self.get_bars(ticker)
+        return data[(data.index >= start) & (data.index < end)]
+
+
+def test_store_fetches_only_missing_ranges(tmp_path):
+    provider = FakeProvider()
+    store = MarketDataStore(root=str(tmp_path), provider=provider)
+
+    assert store.update("AAA", "2020-03-01", "2020-06-01") == 92
+    assert store.update("AAA", "2020-03-01", "2020-06-01") == 0
+    assert store.update("AAA", "2020-04-01", "2020-05-01") == 0
+    assert len(provider.requests) == 1
+
+    # The tail starts at the last stored bar, which is fetched again.
+    assert store.update("AAA", "2020-03-01", "2020-07-01") == 31
+    assert provider.requests[-1][1] == pd.Timestamp("2020-05-31")
+    assert store.update("AAA", "2020-01-15", "2020-07-01") == 46
+    assert provider.requests[-1][1:] == (pd.Timestamp("2020-01-15"), pd.Timestamp("2020-03-01"))
+
+    bars = store.read("AAA", start="2020-02-01", end="2020-06-15")
+    expected = provider.get_bars("AAA").loc["2020-02-01":"2020-06-14"]
+    assert isinstance(bars["close"], np.memmap)
+    assert (bars["timestamp"] == expected.index.to_numpy()).all()
+    assert (bars["close"] == expected["Close"].to_numpy()).all()
+    assert (bars["volume"] == expected["Volume"].to_numpy()).all()
+
+
+def test_fetch_data_uses_store(tmp_path):
+    provider = FakeProvider()
+    store = MarketDataStore(root=str(tmp_path), provider=provider)
+
+    data = fetch_data(["AAA", "BBB"], "2021-01-01", "2021-03-01", store=store)
+    again = fetch_data("AAA", "2021-01-01", "2021-03-01", store=MarketDataStore(root=str(tmp_path),
+                                                                                provider=provider))
+
+    assert len(provider.requests) == 2
+    assert list(data.columns.names) == ["Price", "Ticker"]
+    assert len(data) == 59
+    expected = provider.get_bars("BBB").loc["2021-01-01":"2021-02-28"]
+    assert (data.xs("BBB", level=1, axis=1)["Open"].to_numpy() == expected["Open"].to_numpy()).all()
+    assert again.equals(data[[("Close", "AAA"), ("High", "AAA"), ("Low", "AAA"),
+                              ("Open", "AAA"), ("Volume", "AAA")]])
+
+
+APPL_DATA = os.path.join(os.path.dirname(__file__), "..", "..", "data", "APPL_data")
+
+
+def test_csv_loader_matches_read_csv():
+    expected = pd.read_csv(APPL_DATA, header=[0, 1], index_col=0, parse_dates=True)
+    data = read_yfinance_csv(APPL_DATA, chunk_size=100)
+
+    assert list(data.columns) == list(expected.columns)
+    assert (data.index == expected.index).all()
+    assert (data.to_numpy() == expected.to_numpy(dtype=np.float64)).all()
+
+
+def test_converted_csv_feeds_simulate(tmp_path):
+    shutil.copy(APPL_DATA, tmp_path / "APPL_data")
+    (tmp_path / "notes.txt").write_text("not a data file")
+    store = MarketDataStore(root=str(tmp_path / "store"), provider=FakeProvider())
+
+    assert convert_csv_directory(str(tmp_path), store, chunk_size=100) == ["AAPL"]
+    expected = simulate(pd.read_csv(APPL_DATA, header=[0, 1], index_col=0, parse_dates=True),
+                        "AAPL", quiet=True)
+    portfolio = simulate(store.read("AAPL"), "AAPL", quiet=True)
+
+    assert np.array_equal(portfolio.history, expected.history)
+    assert portfolio.get_cagr() == expected.get_cagr()
+
+
+def test_update_many_fetches_concurrently(tmp_path):
+    provider = SyntheticProvider(latency=0.05)
+    store = MarketDataStore(root=str(tmp_path), provider=provider)
+    tickers = [f"T{i:02d}" for i in range(40)]
+
+    start = time.perf_counter()
+    fetched, failed = store.update_many(tickers, "2020-01-01", "2020-03-01", workers=10)
+    elapsed = time.perf_counter() - start
+
+    # Serially the injected latency alone would take 40 * 0.05 = 2 s.
+    assert elapsed < 1.0
+    assert failed == {}
+    assert fetched == {ticker : 60 for ticker in tickers}
+    expected = provider.fetch("T07", pd.Timestamp("2020-01-01"), pd.Timestamp("2020-03-01"))
+    assert (store.read("T07")["close"] == expected["Close"].to_numpy()).all()
+
+
+def test_update_many_retries_with_backoff(tmp_path):
+    provider = SyntheticProvider(failures=2)
+    store = MarketDataStore(root=str(tmp_path), provider=provider)
+
+    fetched, failed = store.update_many(["AAA", "BBB"], "2020-01-01", "2020-02-01", retries=1, backoff=0.01)
+    assert fetched == {} and set(failed) == {"AAA", "BBB"}
+    assert isinstance(failed["AAA"], ConnectionError)
+
+    fetched, failed = store.update_many(["AAA", "BBB"], "2020-01-01", "2020-02-01", retries=1, backoff=0.01)
+    assert fetched == {"AAA" : 31, "BBB" : 31} and failed == {}
+    assert len(provider.requests) == 6
+
+
+def test_provider_must_implement_fetch():
+    class IncompleteProvider(DataProvider):
+        pass
+
+    with pytest.raises(TypeError):
+        IncompleteProvider()
+    assert isinstance(FakeProvider(), DataProvider)
@@ -0,0 +1,148 @@
+import pytest
+import random
+from strategies.indicators.order_book import OrderBook
+from strategies.indicators.utils import Candle, Order
+
+
+def scan_orders(previous_candle, current_candle, orders_stack, executed_orders):
+    # The original execute_orders, which scans every pending order.
+    fills = []
+    for order in orders_stack:
+        if any(index in executed_orders for index in order.blocking_index):
+            executed_orders.add(order.order_index)
+            continue
+
+        executed = False
+        if order.order_type == "market":
+            execution_price = current_candle.open_price
+            executed = True
+        if order.order_type == "limit":
+            if ((order.side == "buy" and current_candle.low_price < order.price) or
+                (order.side == "sell" and current_candle.high_price > order.price)):
+                execution_price = order.price
+                executed = True
+        if order.order_type == "stop":
+            if ((previous_candle.low_price < order.stop_price < current_candle.high_price) or
+                (previous_candle.high_price > order.stop_price > current_candle.low_price)):
+                execution_price = order.stop_price
+                executed = True
+
+        if executed:
+            fills.append((order.order_index, execution_price))
+            executed_orders.add(order.order_index)
+
+    remaining_orders = [order for order in orders_stack
+                        if order.order_index not in executed_orders]
+    return remaining_orders, fills
+
+
+def get_candle(rng, price):
+    low = price * (1 - rng.random() * 0.05)
+    high = price * (1 + rng.random() * 0.05)
+    return Candle(None, open_price=price, high_price=high, low_price=low,
+                  close_price=rng.uniform(low, high), volume=1000)
+
+
+def test_order_book_matches_scan():
+    rng = random.Random(11)
+    order_book = OrderBook()
+    orders_stack = []
+    executed_orders = set()
+    number_of_orders = 0
+    previous_candle = get_candle(rng, 100.0)
+
+    for _ in range(0, 500):
+        current_candle = get_candle(rng, previous_candle.close_price)
+
+        fills = []
+        for priority, order, execution_price in order_book.get_triggered(previous_candle, current_candle):
+            if order_book.is_pending(priority):
+                order_book.fill(priority)
+                fills.append((order.order_index, execution_price))
+        orders_stack, expected_fills = scan_orders(previous_candle, current_candle,
+                                                   orders_stack, executed_orders)
+        assert fills == expected_fills
+
+        price = current_candle.close_price
+        if rng.random() < 0.5:
+            new_orders = Order.get_long_position(number_of_orders, 1, rng.uniform(0.9, 1.0) * price,
+                                                 rng.uniform(1.0, 1.1) * price)
+        else:
+            new_orders = Order.get_short_position(number_of_orders, 1, rng.uniform(1.0, 1.1) * price,
+                                                  rng.uniform(0.9, 1.0) * price)
+        if rng.random() < 0.3:
+            # An order which joins the group of the market order.
+            new_orders.append(Order(side="buy", order_type="limit", quantity=1,
+                                    price=rng.uniform(0.9, 1.1) * price, order_index=number_of_orders + 3,
+                                    blocking_index=[number_of_orders + 3, number_of_orders]))
+        number_of_orders += 4
+
+        order_book.extend(new_orders)
+        orders_stack.extend(new_orders)
+        # The book cancels blocked orders right away, the scan only when it reaches them.
+        remaining_indexes = [order.order_index for order in orders_stack]
+        assert set(order.order_index for order in order_book.get_orders()) <= set(remaining_indexes)
+        previous_candle = current_candle
+
+
+def test_group_is_cancelled_as_a_unit():
+    order_book = OrderBook()
+    order_book.extend(Order.get_long_position(0, 1, stop_loss_price=90.0, exit_price=110.0))
+    previous_candle = Candle(None, 100.0, 101.0, 99.0, 100.0, 1000)
+    current_candle = Candle(None, 100.0, 112.0, 99.0, 111.0, 1000)
+
+    triggered = order_book.get_triggered(previous_candle, current_candle)
+    assert [order.order_type for _, order, _ in triggered] == ["market", "limit"]
+    for priority, _, _ in triggered:
+        order_book.fill(priority)
+
+    assert len(order_book) == 0
+    assert order_book.stops == [] and order_book.blocked_by == {}
+    assert len(order_book.groups) == 0 and order_book.groups.index_to_group == {}
+    assert order_book.groups.number_of_filled == 2
+
+    with pytest.raises(ValueError):
+        order_book.add(Order(side="buy", order_type="trailing", quantity=1, order_index=5, blocking_index=[5]))
+
+
+def test_registry_frees_resolved_groups():
+    order_book = OrderBook()
+    previous_candle = Candle(None, 100.0, 101.0, 99.0, 100.0, 1000)
+    for i in range(0, 1000):
+        order_book.extend(Order.get_long_position(3 * i, 1, stop_loss_price=50.0, exit_price=150.0))
+        for priority, _, _ in order_book.get_triggered(previous_candle, previous_candle):
+            order_book.fill(priority)
+
+    # Only the stop loss / take profit groups are still open.
+    assert len(order_book.groups) == 1000
+    assert order_book.groups.number_of_filled == 1000
+    group = order_book.groups.groups[order_book.get_group_id(1)]
+    assert group.state == "open" and group.indexes == {1, 2}
+    assert order_book.get_group_id(2) == group.group_id and order_book.get_group_id(0) == -1
+
+    current_candle = Candle(None, 100.0, 151.0, 99.0, 150.5, 1000)
+    for priority, _, _ in order_book.get_triggered(previous_candle, current_candle):
+        if order_book.is_pending(priority):
+            order_book.fill(priority)
+
+    assert len(order_book) == 0
+    assert len(order_book.groups) == 0 and order_book.groups.index_to_group == {}
+    assert order_book.children == {}
+    assert order_book.groups.number_of_filled == 2000
+
+
+def test_cancellation_cascades():
+    order_book = OrderBook()
+    order_book.extend(Order.get_long_position(0, 1, stop_loss_price=90.0, exit_price=110.0))
+    # Blocked by the stop loss, which is cancelled when the take profit is executed.
+    order_book.add(Order(side="buy", order_type="limit", quantity=1, price=50.0,
+                         order_index=3, blocking_index=[3, 1]))
+    assert len(order_book.groups) == 2
+
+    previous_candle = Candle(None, 100.0, 101.0, 99.0, 100.0, 1000)
+    current_candle = Candle(None, 100.0, 112.0, 99.0, 111.0, 1000)
+    for priority, _, _ in order_book.get_triggered(previous_candle, current_candle):
+        order_book.fill(priority)
+
+    assert len(order_book) == 0 and len(order_book.groups) == 0
+    assert order_book.groups.number_of_filled == 2
@@ -0,0 +1,68 @@
+import math
+import statistics
+import numpy as np
+import pandas as pd
+from strategies.indicators.portfolio import Portfolio
+
+
+def test_history_is_a_growable_view():
+    portfolio = Portfolio(initial_cash=1000, capacity=2)
+    dates = pd.date_range("2024-01-01", periods=100, freq="D")
+    values = 1000 * np.exp(np.cumsum(np.random.default_rng(4).normal(0, 0.01, 100)))
+    for date, value in zip(dates, values):
+        portfolio.cash = value
+        portfolio.update_market_prices({}, date)
+
+    history = portfolio.get_history()
+    assert np.array_equal(history, values)
+    assert np.shares_memory(history, portfolio.values.arrays["close"])
+    assert (portfolio.dates == dates.to_numpy()).all()
+
+    returns = [values[i] / values[i - 1] - 1 for i in range(1, len(values))]
+    assert math.isclose(portfolio.get_volatility(), statistics.stdev(returns) * math.sqrt(252) * 100,
+                        rel_tol=10**-12)
+    assert math.isclose(portfolio.get_cagr(), ((values[-1] / 1000) ** (365.25 / 100) - 1) * 100,
+                        rel_tol=10**-12)
+
+
+def test_bounded_history_and_reserve():
+    portfolio = Portfolio(max_history=5)
+    portfolio.reserve(1000)
+    for day in range(1, 21):
+        portfolio.cash = 100000 + day
+        portfolio.update_market_prices({}, pd.Timestamp(2024, 1, day))
+
+    assert np.array_equal(portfolio.history, 100000 + np.arange(16, 21))
+    assert portfolio.start_date == pd.Timestamp(2024, 1, 1)
+
+    portfolio = Portfolio(capacity=1)
+    portfolio.reserve(1000)
+    assert len(portfolio.values.arrays["close"]) == 1000
+
+
+def test_online_metrics_match_history():
+    portfolio = Portfolio(initial_cash=1000, max_history=10)
+    dates = pd.date_range("2024-01-01", periods=500, freq="D")
+    values = 1000 * np.exp(np.cumsum(np.random.default_rng(5).normal(0, 0.01, 500)))
+    for date, value in zip(dates, values):
+        portfolio.cash = value
+        portfolio.update_market_prices({}, date)
+
+    metrics = portfolio.metrics
+    returns = values[1:] / values[:-1] - 1
+    peaks = np.maximum.accumulate(values)
+    max_drawdown = np.max(1 - values / peaks) * 100
+    cagr = ((values[-1] / 1000) ** (365.25 / 500) - 1) * 100
+    sharpe = returns.mean() / returns.std(ddof=1) * math.sqrt(252)
+    sortino = returns.mean() / math.sqrt(np.mean(np.minimum(returns, 0) ** 2)) * math.sqrt(252)
+
+    assert math.isclose(metrics.get_volatility(), returns.std(ddof=1) * math.sqrt(252) * 100, rel_tol=10**-9)
+    assert math.isclose(metrics.get_sharpe_ratio(), sharpe, rel_tol=10**-9)
+    assert math.isclose(metrics.get_sortino_ratio(), sortino, rel_tol=10**-9)
+    assert math.isclose(metrics.get_max_drawdown(), max_drawdown, rel_tol=10**-12)
+    assert math.isclose(metrics.get_cagr(), cagr, rel_tol=10**-12)
+    assert math.isclose(metrics.get_calmar_ratio(), cagr / max_drawdown, rel_tol=10**-12)
+    assert math.isclose(metrics.get_total_return(), (values[-1] / 1000 - 1) * 100, rel_tol=10**-12)
+    assert len(portfolio.history) == 10
+    # The bounded history only has the last values, so the volatility is read from the metrics.
+    assert math.isclose(portfolio.get_volatility(), returns.std(ddof=1) * math.sqrt(252) * 100, rel_tol=10**-9)
@@ -0,0 +1,79 @@
+import asyncio
+import numpy as np
+from engine import simulate, simulate_panel, get_bar_arrays
+from runtime import PaperTradingRuntime, ReplayFeed, ReplayServer, SocketFeed, merge_bars, encode_bar, decode_bar
+from strategies.indicators.portfolio import Portfolio
+from benchmarks.synthetic import generate_ohlcv, generate_panel
+
+
+def test_replay_matches_simulate():
+    data = generate_ohlcv(2000, ticker="AAA", seed=3)
+    expected = simulate(data, "AAA", quiet=True)
+
+    runtime = PaperTradingRuntime(portfolio=Portfolio())
+    bars = get_bar_arrays(data.xs("AAA", level=1, axis=1))
+    portfolio = asyncio.run(runtime.run(ReplayFeed({"AAA" : bars})))
+
+    assert np.array_equal(portfolio.history, expected.history)
+    assert portfolio.get_positions() == expected.get_positions()
+    assert runtime.get_latency_report()["bars"] == 2000
+
+
+def test_latencies_are_bounded():
+    data = generate_ohlcv(500, ticker="AAA", seed=4)
+    runtime = PaperTradingRuntime(max_latencies=100)
+    asyncio.run(runtime.run(ReplayFeed({"AAA" : get_bar_arrays(data.xs("AAA", level=1, axis=1))})))
+
+    assert len(runtime.latencies) == 100
+    report = runtime.get_latency_report()
+    assert report["bars"] == runtime.number_of_bars == 500
+    assert report["max_us"] == max(runtime.latencies) / 1000
+
+
+def test_socket_feed_matches_replay_feed():
+    data = generate_panel(500, ["AAA", "BBB", "CCC"], seed=7)
+    bars = {ticker : get_bar_arrays(data.xs(ticker, level=1, axis=1)) for ticker in ["AAA", "BBB", "CCC"]}
+    for bar in merge_bars(bars)[:10]:
+        ticker, candle = decode_bar(encode_bar(bar))
+        assert (ticker, candle.timestamp.value, candle.close_price) == (bar[0], bar[1], bar[5])
+
+    async def run_over_socket():
+        server = ReplayServer(bars)
+        host, port = await server.start()
+        runtime = PaperTradingRuntime(portfolio=Portfolio())
+        # Two connections are consumed concurrently, the second one by a separate runtime.
+        other = PaperTradingRuntime(portfolio=Portfolio())
+        await asyncio.gather(runtime.run(SocketFeed(host, port)), other.run(SocketFeed(host, port)))
+        await server.stop()
+        return runtime, other
+
+    runtime, other = asyncio.run(run_over_socket())
+    replay = PaperTradingRuntime(portfolio=Portfolio())
+    asyncio.run(replay.run(ReplayFeed(bars)))
+
+    assert len(runtime.strategies) == 3
+    panel = simulate_panel(data, quiet=True)
+    assert np.allclose(replay.portfolio.history, panel.history, rtol=0, atol=1e-6)
+    assert replay.portfolio.get_positions() == panel.get_positions()
+    assert np.array_equal(runtime.portfolio.history, replay.portfolio.history)
+    assert np.array_equal(other.portfolio.history, replay.portfolio.history)
+    report = runtime.get_latency_report()
+    assert report["bars"] == 1500
+    assert 0 < report["p50_us"] <= report["p99_us"] <= report["max_us"]
+
+
+def test_many_symbols_with_messages(capsys):
+    tickers = [f"T{i:03}" for i in range(100)]
+    data = generate_panel(100, tickers, seed=11)
+    feeds = [ReplayFeed({ticker : get_bar_arrays(data.xs(ticker, level=1, axis=1))}) for ticker in tickers[:50]]
+    feeds.append(ReplayFeed({ticker : get_bar_arrays(data.xs(ticker, level=1, axis=1)) for ticker in tickers[50:]}))
+
+    runtime = PaperTradingRuntime(quiet=False)
+    asyncio.run(runtime.run(*feeds))
+
+    assert len(runtime.strategies) == 100
+    assert runtime.get_latency_report()["bars"] == 10000
+    lines = capsys.readouterr().out.splitlines()
+    rejections = [line for line in lines if "rejected" in line]
+    assert len(lines) - len(rejections) == len(runtime.portfolio.trades)
+    assert sum(int(line.split(": ")[1].split()[0]) for line in rejections) == runtime.portfolio.number_of_rejected
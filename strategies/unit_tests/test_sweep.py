@@ -0,0 +1,45 @@
+import pytest
+from engine import simulate
+import sweep
+from sweep import parameter_grid, run_sweep
+from strategies.strategy1 import Strategy
+from strategies.indicators.portfolio import Portfolio
+from benchmarks.synthetic import generate_ohlcv
+
+
+def test_parameter_grid():
+    grid = parameter_grid({"ema_period" : [10, 20], "max_risk" : [0.01, 0.02, 0.03]})
+    assert len(grid) == 6
+    assert grid[0] == {"ema_period" : 10, "max_risk" : 0.01}
+
+
+def test_sweep_matches_simulate():
+    data = generate_ohlcv(500, ticker="AAA", seed=2)
+    grid = {"ema_period" : [10, 20], "stop_loss" : [0.05], "max_risk" : [0.01, 0.02]}
+    results = run_sweep(data, "AAA", grid, workers=2, chunk_size=2)
+
+    assert len(results) == 4
+    for row in results.to_dict("records"):
+        portfolio = simulate(data, "AAA", quiet=True,
+                             strategy=Strategy(quiet=True, ema_period=row["ema_period"],
+                                               stop_loss=row["stop_loss"]),
+                             portfolio=Portfolio(max_risk=row["max_risk"]))
+        assert row["final_value"] == portfolio.get_portfolio_value()
+        assert row["cagr"] == portfolio.get_cagr()
+        assert row["volatility"] == portfolio.get_volatility()
+
+    with pytest.raises(ValueError):
+        run_sweep(data, "AAA", {"leverage" : [2]})
+
+
+def test_worker_handle_is_closed():
+    data = generate_ohlcv(100, seed=1).xs("SYN", level=1, axis=1)
+    block = sweep._share_bars(data)
+    try:
+        sweep._attach_bars(block.name, len(data), "SYN")
+        handle = sweep._worker_bars["block"]
+        sweep._detach_bars()
+        assert sweep._worker_bars is None and handle.buf is None
+    finally:
+        block.close()
+        block.unlink()
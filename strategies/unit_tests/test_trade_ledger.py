@@ -0,0 +1,78 @@
+import math
+from collections import deque
+import numpy as np
+import pandas as pd
+from engine import simulate
+from strategies.indicators.utils import Order
+from strategies.indicators.trade_ledger import TradeLedger
+from benchmarks.synthetic import generate_ohlcv
+
+
+def match_fifo(fills):
+    """
+    Matches the fills with a queue of open lots per symbol.
+    """
+    lots = {}
+    trips = {}
+    for fill, (symbol, side, price, quantity) in enumerate(fills):
+        queue = lots.setdefault(symbol, deque())
+        remaining = quantity
+        while remaining > 1e-12 and queue and queue[0][1] != side:
+            lot = queue[0]
+            matched = min(remaining, lot[3])
+            trips[lot[0]][1] += lot[1] * matched * (price - lot[2])
+            lot[3] -= matched
+            remaining -= matched
+            if lot[3] <= 1e-12:
+                trips[lot[0]][0] = True
+                queue.popleft()
+        if remaining > 1e-12:
+            queue.append([fill, side, price, remaining])
+            trips[fill] = [False, 0.0]
+    return {fill : pnl for fill, (closed, pnl) in trips.items() if closed}
+
+
+def test_round_trips_match_fifo_queue():
+    rng = np.random.default_rng(6)
+    ledger = TradeLedger(capacity=1)
+    fills = []
+    for bar in range(2000):
+        symbol = ["AAA", "BBB", "CCC"][rng.integers(3)]
+        side = 1 if rng.random() < 0.5 else -1
+        quantity = float(rng.integers(1, 6))
+        price = float(rng.uniform(90, 110))
+        ledger.record(symbol, Order("buy" if side == 1 else "sell", "market", quantity, order_index=bar),
+                      price, pd.Timestamp("2024-01-01") + pd.Timedelta(minutes=bar), bar)
+        fills.append((symbol, side, price, quantity))
+
+    expected = match_fifo(fills)
+    round_trips = ledger.get_round_trips()
+    assert list(round_trips["fill"]) == sorted(expected)
+    assert np.allclose(round_trips["pnl"], [expected[fill] for fill in sorted(expected)], rtol=0, atol=1e-8)
+    assert np.array_equal(ledger.get("bar_index"), np.arange(2000))
+
+    stats = ledger.get_stats()
+    pnl = np.array(list(expected.values()))
+    assert stats["number_of_trades"] == len(expected)
+    assert math.isclose(stats["win_rate"], np.mean(pnl > 0) * 100)
+    assert math.isclose(stats["profit_factor"], pnl[pnl > 0].sum() / -pnl[pnl < 0].sum(), rel_tol=10**-9)
+    assert math.isclose(stats["expectancy"], pnl.mean(), rel_tol=10**-9)
+
+
+def test_simulate_records_fills(tmp_path):
+    data = generate_ohlcv(500, ticker="AAA", seed=2)
+    portfolio = simulate(data, "AAA", quiet=True)
+    trades = portfolio.trades
+
+    assert len(trades) > 0
+    assert trades.symbols == ["AAA"]
+    timestamps = data.index.to_numpy()
+    assert (trades.get("timestamp") == timestamps[trades.get("bar_index")]).all()
+    # The cash changes only through the fills.
+    cash_flows = -trades.get("side") * trades.get("price") * trades.get("quantity")
+    assert math.isclose(portfolio.cash, 100000 + cash_flows.sum(), rel_tol=10**-12)
+
+    trades.save_npz(tmp_path / "trades.npz")
+    with np.load(tmp_path / "trades.npz") as saved:
+        assert np.array_equal(saved["price"], trades.get("price"))
+        assert list(saved["symbols"]) == ["AAA"]
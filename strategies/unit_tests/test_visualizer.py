@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+from visualizer import Visualizer, downsample_ohlc
+from strategies.indicators.rsi_indicator import RelativeStrengthIndex
+from benchmarks.synthetic import generate_ohlcv
+
+
+def test_downsample_preserves_ohlc_shape():
+    data = generate_ohlcv(10001, seed=3).xs("SYN", level=1, axis=1)
+    bars, ends = downsample_ohlc(data, 1000)
+
+    assert len(bars) == 910
+    assert bars["Open"].iloc[0] == data["Open"].iloc[0]
+    assert bars["Close"].iloc[-1] == data["Close"].iloc[-1]
+    assert bars["High"].max() == data["High"].max()
+    assert bars["Low"].min() == data["Low"].min()
+    assert bars["Volume"].sum() == data["Volume"].sum()
+    assert (bars.index == data.index[np.r_[0, ends[:-1] + 1]]).all()
+    assert downsample_ohlc(data.iloc[:50], 1000)[0].equals(data.iloc[:50][["Open", "High", "Low", "Close", "Volume"]])
+
+
+def test_plot_renders_headless(tmp_path):
+    data = generate_ohlcv(5000, seed=1).xs("SYN", level=1, axis=1)
+    visualizer = Visualizer(data, "SYN")
+    visualizer.add_overlay("RSI 7", RelativeStrengthIndex.batch(data, [7])[7])
+    with pytest.raises(ValueError):
+        visualizer.add_overlay("short", np.zeros(10))
+
+    for name in ("chart.png", "chart.svg"):
+        visualizer.plot(str(tmp_path / name), width=6, height=3, dpi=50)
+    assert (tmp_path / "chart.png").read_bytes().startswith(b"\x89PNG")
+    assert b"<svg" in (tmp_path / "chart.svg").read_bytes()[:1000]
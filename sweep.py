@@ -0,0 +1,181 @@
+import itertools
+import multiprocessing
+from multiprocessing import shared_memory, util
+import numpy as np
+import pandas as pd
+from engine import get_bar_arrays, run_bars
+from strategies.strategy1 import Strategy
+from strategies.indicators.portfolio import Portfolio
+from strategies.indicators.order_book import OrderBook
+
+STRATEGY_PARAMETERS = Strategy.PARAMETERS
+PORTFOLIO_PARAMETERS = ("initial_cash", "max_risk")
+COLUMNS = ("timestamp", "open", "high", "low", "close", "volume")
+
+# The bars of the worker process, attached once by _attach_bars.
+_worker_bars = None
+
+def parameter_grid(grid : dict):
+    """
+    Builds all combinations of the parameters in a grid.
+
+    Parameters
+    ----------
+    grid : dict
+        Contains pairs (parameter -> list of values).
+
+    Returns
+    -------
+    list of dict
+        Contains one dictionary (parameter -> value) per combination.
+    """
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+def _share_bars(data):
+    """
+    Copies the bars of a single ticker once into shared memory.
+
+    The timestamps are stored as int64 nanoseconds and the OHLCV values as
+    float64, each in its own row of a (6, bars) block.
+
+    Returns
+    -------
+    block : SharedMemory
+        The shared memory block. It has to be closed and unlinked by the caller.
+    """
+    bars = get_bar_arrays(data)
+    number_of_bars = len(bars["close"])
+    block = shared_memory.SharedMemory(create=True, size=max(1, 8 * len(COLUMNS) * number_of_bars))
+    for row, column in enumerate(COLUMNS):
+        dtype = np.int64 if column == "timestamp" else np.float64
+        values = bars[column].astype("datetime64[ns]").view(np.int64) if column == "timestamp" else bars[column]
+        np.ndarray(number_of_bars, dtype=dtype, buffer=block.buf, offset=8 * row * number_of_bars)[:] = values
+    return block
+
+def _attach_bars(name : str, number_of_bars : int, ticker : str, strategy_class : type = Strategy):
+    """
+    Attaches a worker process to the shared bars. Used as the pool initializer.
+
+    The handle is closed by _detach_bars when the worker exits. The pool
+    workers leave through os._exit, which skips atexit, so it is registered
+    as a multiprocessing finalizer.
+    """
+    global _worker_bars
+    block = shared_memory.SharedMemory(name=name)
+    util.Finalize(None, _detach_bars, exitpriority=0)
+    bars = {"block" : block, "ticker" : ticker, "strategy_class" : strategy_class}
+    for row, column in enumerate(COLUMNS):
+        dtype = np.int64 if column == "timestamp" else np.float64
+        bars[column] = np.ndarray(number_of_bars, dtype=dtype, buffer=block.buf,
+                                  offset=8 * row * number_of_bars)
+    bars["timestamp"] = bars["timestamp"].view("datetime64[ns]")
+    _worker_bars = bars
+
+def _detach_bars():
+    """
+    Releases the views of the shared bars and closes the handle of the worker process.
+    """
+    global _worker_bars
+    if _worker_bars is not None:
+        block = _worker_bars["block"]
+        _worker_bars = None
+        block.close()
+
+def run_backtest(bars : dict, ticker : str, parameters : dict, strategy_class : type = Strategy):
+    """
+    Runs a single quiet backtest for one set of parameters.
+
+    Parameters
+    ----------
+    bars : dict
+        Contains pairs (column -> numpy.ndarray) with the bars of the ticker.
+    ticker : str
+        The ticker symbol of the traded asset.
+    parameters : dict
+        The strategy and portfolio parameters (see the PARAMETERS of the
+        strategy class and PORTFOLIO_PARAMETERS).
+    strategy_class : type
+        The class of the strategy, e.g. Strategy or MovingAverageCrossover.
+
+    Returns
+    -------
+    result : dict
+        The parameters together with the final value, CAGR, volatility and
+        the risk-adjusted metrics (see PerformanceMetrics).
+    """
+    strategy = strategy_class(quiet=True, **{name : value for name, value in parameters.items()
+                                             if name in strategy_class.PARAMETERS})
+    portfolio = Portfolio(**{name : value for name, value in parameters.items()
+                             if name in PORTFOLIO_PARAMETERS})
+    run_bars(ticker, bars["timestamp"], bars["open"].tolist(), bars["high"].tolist(),
+             bars["low"].tolist(), bars["close"].tolist(), bars["volume"].tolist(),
+             strategy, portfolio, OrderBook(), quiet=True)
+
+    result = dict(parameters)
+    result["final_value"] = portfolio.get_portfolio_value()
+    result["cagr"] = portfolio.get_cagr()
+    result["volatility"] = portfolio.get_volatility()
+    result["sharpe_ratio"] = portfolio.metrics.get_sharpe_ratio()
+    result["sortino_ratio"] = portfolio.metrics.get_sortino_ratio()
+    result["max_drawdown"] = portfolio.metrics.get_max_drawdown()
+    result["calmar_ratio"] = portfolio.metrics.get_calmar_ratio()
+    return result
+
+def _run_task(parameters : dict):
+    return run_backtest(_worker_bars, _worker_bars["ticker"], parameters, _worker_bars["strategy_class"])
+
+def run_sweep(full_data, ticker : str, grid : dict, workers : int = None, chunk_size : int = 1,
+              strategy_class : type = Strategy):
+    """
+    Runs a backtest for every combination of parameters in a process pool.
+
+    The bars are placed in shared memory once and every worker attaches to
+    them when it starts, so the price data is not pickled for each task.
+
+    Parameters
+    ----------
+    full_data : pandas.DataFrame
+        Multilevel dataframe containing the OPHC candles for multiple stocks.
+    ticker : str
+        A string containing the ticker symbol for a specific stock.
+    grid : dict
+        Contains pairs (parameter -> list of values). The supported
+        parameters are the PARAMETERS of the strategy class and PORTFOLIO_PARAMETERS.
+    workers : int or None
+        The number of worker processes. If None, the number of CPUs.
+    chunk_size : int
+        The number of parameter sets sent to a worker at once.
+    strategy_class : type
+        The class of the strategy, e.g. Strategy or MovingAverageCrossover.
+        It is created with quiet=True and its parameters from the grid.
+
+    Raises
+    ------
+    ValueError
+        If the grid contains an unsupported parameter.
+
+    Returns
+    -------
+    results : pandas.DataFrame
+        One row per parameter set with the parameters and the results of run_backtest.
+    """
+    for name in grid:
+        if name not in strategy_class.PARAMETERS + PORTFOLIO_PARAMETERS:
+            raise ValueError("Unsupported sweep parameter: " + str(name))
+
+    data = full_data.xs(ticker, level=1, axis=1)
+    combinations = parameter_grid(grid)
+    block = _share_bars(data)
+    try:
+        with multiprocessing.Pool(processes=workers, initializer=_attach_bars,
+                                  initargs=(block.name, len(data), ticker, strategy_class)) as pool:
+            results = list(pool.imap(_run_task, combinations, chunksize=chunk_size))
+            # The workers exit normally and close their handles (terminate would kill them).
+            pool.close()
+            pool.join()
+    finally:
+        block.close()
+        block.unlink()
+
+    return pd.DataFrame(results)
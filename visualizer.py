@@ -1,14 +1,66 @@
-from strategies.indicators.utils import Candle
+import math
 import pandas as pd
-import mplfinance as mpf
 from strategies import ExponentialMovingAverage
 import numpy as np
-import matplotlib.pyplot as plt
+
+def downsample_ohlc(data : pd.DataFrame, max_bars : int):
+    """
+    Aggregates consecutive bars, so that at most max_bars bars remain.
+
+    The bars are split into buckets of equal length. Every bucket becomes
+    one bar with the open of its first bar, the highest high, the lowest
+    low, the close of its last bar and the total volume, so the range and
+    the direction of the price action are preserved.
+
+    Parameters
+    ----------
+    data : pandas.DataFrame
+        A dataframe with Open, High, Low, Close and Volume columns.
+    max_bars : int
+        The maximal number of bars after the aggregation.
+
+    Raises
+    ------
+    ValueError
+        If max_bars is not positive.
+
+    Returns
+    -------
+    bars : pandas.DataFrame
+        The aggregated bars, indexed by the time of the first bar of each bucket.
+    ends : numpy.ndarray
+        The position of the last bar of each bucket in the original data.
+    """
+    if max_bars <= 0:
+        raise ValueError("The number of bars after downsampling must be positive")
+    number_of_bars = len(data)
+    if number_of_bars <= max_bars:
+        return data[["Open", "High", "Low", "Close", "Volume"]], np.arange(number_of_bars)
+
+    bucket = math.ceil(number_of_bars / max_bars)
+    starts = np.arange(0, number_of_bars, bucket)
+    ends = np.r_[starts[1:], number_of_bars] - 1
+    bars = pd.DataFrame({
+        "Open" : data["Open"].to_numpy(dtype="float64")[starts],
+        "High" : np.maximum.reduceat(data["High"].to_numpy(dtype="float64"), starts),
+        "Low" : np.minimum.reduceat(data["Low"].to_numpy(dtype="float64"), starts),
+        "Close" : data["Close"].to_numpy(dtype="float64")[ends],
+        "Volume" : np.add.reduceat(data["Volume"].to_numpy(dtype="float64"), starts),
+    }, index=data.index[starts])
+    return bars, ends
 
 class Visualizer:
     """
     A class used to visualize market data and indicators.
 
+    The indicators are calculated in batch over all bars. Long series are
+    downsampled to the pixel budget of the figure (see downsample_ohlc)
+    before they are drawn, and the overlays are sampled at the last bar of
+    every aggregated bar.
+
+    matplotlib and mplfinance are imported only when a plot is made, so
+    importing the visualizer does not load them.
+
     Attributes
     ----------
     data : pandas.DataFrame
@@ -17,18 +69,47 @@ class Visualizer:
         The stock whose data will be visualized.
     ema_periods : list of integers
         The periods of EMA that will be tracked.
+    overlays : dict
+        Contains pairs (label -> array of floats aligned with the bars) of
+        additional lines, e.g. the batch values of other indicators.
     """
     def __init__(self, data : pd.DataFrame, ticker : str):
         self.data = data
         self.ticker = ticker
         self.ema_periods = [10, 20]
+        self.overlays = {}
+
+    def add_overlay(self, label : str, values):
+        """
+        Adds a line drawn over the candles.
+
+        Parameters
+        ----------
+        label : str
+            The label of the line in the legend.
+        values : sequence of floats
+            One value per bar of the data.
+
+        Raises
+        ------
+        ValueError
+            If the number of values does not match the number of bars.
+
+        Returns
+        -------
+        None
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) != len(self.data):
+            raise ValueError(f"The overlay has {len(values)} values, but there are {len(self.data)} bars")
+        self.overlays[label] = values
 
     def get_exponential_moving_average(self):
         """
         A function which calculates the EMA for the tracked periods.
 
-        We make use of the ExponentialMovingAverage class and feed it the
-        market data.
+        We make use of the batch calculation of the ExponentialMovingAverage
+        class, which processes the whole market data at once.
 
         Parameters
         ----------
@@ -36,49 +117,45 @@ class Visualizer:
 
         Returns
         ema_history : dictonary
-            Contains pairs (period -> list of floats) representing the EMA for different periods.
+            Contains pairs (period -> array of floats) representing the EMA for different periods.
         """
-        ema_indicator = ExponentialMovingAverage(self.ema_periods) # default periods
-        for i in range(0, len(self.data)):
-            ema_indicator.update(candlestick=Candle(
-                timestamp=self.data.index[i],
-                open_price=self.data.iloc[i]["Open"],
-                high_price=self.data.iloc[i]["High"],
-                low_price=self.data.iloc[i]["Low"],
-                close_price=self.data.iloc[i]["Close"],
-                volume=self.data.iloc[i]["Volume"]))
-        
-
-        return ema_indicator.ema_history
-  
-    def get_exponential_lines(self):
+        return ExponentialMovingAverage.batch(self.data, self.ema_periods)
+
+    def get_overlay_lines(self, positions : np.ndarray):
         """
-        A function that gives additional plots for the EMAs.
+        A function that gives additional plots for the EMAs and the overlays.
 
         Parameters
         ----------
-        None
+        positions : numpy.ndarray
+            The positions of the bars at which the lines are sampled.
 
         Returns
         colors : list
-            Contains the used colors for the EMA lines.
+            Contains the used colors for the lines.
+        labels : list of str
+            Contains the labels of the lines.
         ap : list of plots
-            Contains the plot layers for each EMA line.
+            Contains the plot layers for each line.
         """
-        ap = []
-        ema_history = self.get_exponential_moving_average() 
-        n_emas = len(ema_history)
-        cmap = plt.cm.get_cmap('tab20')
-        colors = []
-        for i, period in enumerate(self.ema_periods):
-            ema = pd.Series(ema_history[period])
-            color = cmap(i / n_emas)
+        import matplotlib
+        import mplfinance as mpf
+
+        lines = {f"EMA {period}" : ema for period, ema in self.get_exponential_moving_average().items()}
+        lines.update(self.overlays)
+        cmap = matplotlib.colormaps["tab20"]
+        colors, labels, ap = [], [], []
+        for i, (label, values) in enumerate(lines.items()):
+            color = cmap(i / len(lines))
             colors.append(color)
-            ap.append(mpf.make_addplot(ema, color=color, width=1.0, linestyle='-', secondary_y=False))
+            labels.append(label)
+            ap.append(mpf.make_addplot(values[positions], color=color, width=1.0, linestyle='-',
+                                       secondary_y=False))
 
-        return colors, ap
+        return colors, labels, ap
 
-    def plot(self):
+    def plot(self, path : str = None, max_bars : int = None, width : float = 12,
+             height : float = 6, dpi : int = 100):
         """
         A function that plots the market data with indicators.
 
@@ -86,33 +163,52 @@ class Visualizer:
 
         Parameters
         ----------
-        None
+        path : str or None
+            The file to which the figure is rendered, e.g. "chart.png" or
+            "chart.svg". The format follows the extension and no display is
+            needed. If None, the figure is shown.
+        max_bars : int or None
+            The maximal number of drawn candles. If None, one candle per two
+            pixels of the width of the figure.
+        width, height : float
+            The size of the figure in inches.
+        dpi : int
+            The resolution of the figure in pixels per inch.
 
         Returns
         -------
         None
         """
-        self.data = self.data[["Open", "High", "Low", "Close", "Volume"]]
-        self.data.index.name = None
+        import matplotlib.pyplot as plt
+        import mplfinance as mpf
+
+        if max_bars is None:
+            max_bars = max(1, int(width * dpi) // 2)
+        bars, positions = downsample_ohlc(self.data, max_bars)
+        bars.index.name = None
 
-        ema_colors, ap = self.get_exponential_lines()      
+        colors, labels, ap = self.get_overlay_lines(positions)
 
         fig, axlist = mpf.plot(
-            self.data, 
-            type="candle", 
-            style="yahoo", 
-            volume=False, 
+            bars,
+            type="candle",
+            style="yahoo",
+            volume=False,
             title=self.ticker,
             addplot=ap,
+            figsize=(width, height),
+            warn_too_much_data=max_bars + 1,
             returnfig=True
         )
 
         ax = axlist[0]
-        for i, period in enumerate(self.ema_periods):
-            ax.plot([], [], color=ema_colors[i], label=f"EMA {period}")
-        
-        ax.legend(loc="upper left")
-
-        plt.show()
+        for color, label in zip(colors, labels):
+            ax.plot([], [], color=color, label=label)
 
+        ax.legend(loc="upper left")
 
+        if path is None:
+            plt.show()
+        else:
+            fig.savefig(path, dpi=dpi)
+            plt.close(fig)